@@ -0,0 +1,201 @@
+"""Batch article generation from a keyword list.
+
+Each keyword goes through research -> pick -> article -> image with the local
+``root_agent``. Finished items are written to ``--output_dir`` as they
+complete and recorded in a checkpoint file, so re-running the same command
+after a crash only processes the remaining keywords.
+
+    python batch.py --keywords=keywords.txt --workers=4 \
+        --rpm=gemini-2.5-pro=60 --rpm=imagen-3.0-generate-002=20
+"""
+
+import asyncio
+import json
+import os
+import re
+import statistics
+import time
+
+from absl import app, flags
+from dotenv import load_dotenv
+from google.adk.artifacts import InMemoryArtifactService
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from blog_writer_agents.agent import IMAGE_FILE_NAME, root_agent
+from blog_writer_agents.rate_limit import parse_limits, set_model_rpm
+from blog_writer_agents.state_offload import load_session_value
+
+FLAGS = flags.FLAGS
+flags.DEFINE_string("keywords", None, "File with one keyword per line.")
+flags.DEFINE_string("output_dir", "batch_output", "Directory for articles and the checkpoint.")
+flags.DEFINE_integer("workers", 2, "Number of keywords processed concurrently.")
+flags.DEFINE_multi_string("rpm", [], "Per-model rate limit as model=requests_per_minute.")
+flags.DEFINE_integer("pick", 1, "Which research idea (1-based) to turn into an article.")
+flags.DEFINE_bool("image", True, "Generate an eye-catch image for each article.")
+flags.mark_flag_as_required("keywords")
+
+APP_NAME = "blog_writer_batch"
+USER_ID = "batch"
+CHECKPOINT_FILE = "checkpoint.jsonl"
+
+RESEARCH_MESSAGE = "「{keyword}」をテーマにしたブログ記事のアイデアをリサーチしてください。"
+ARTICLE_MESSAGE = "{pick}番目のアイデアでブログ記事を作成してください。確認は不要です。"
+IMAGE_MESSAGE = "この記事のアイキャッチ画像を生成してください。確認は不要です。"
+
+
+def slugify(keyword: str) -> str:
+    slug = re.sub(r"[^\w-]+", "-", keyword).strip("-")
+    return slug[:60] or "keyword"
+
+
+def load_checkpoint(path: str) -> dict[str, dict]:
+    """Return the last recorded entry per keyword."""
+    entries = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    entries[entry["keyword"]] = entry
+    return entries
+
+
+class BatchRunner:
+    def __init__(self, output_dir: str, pick: int, with_image: bool):
+        self.output_dir = output_dir
+        self.pick = pick
+        self.with_image = with_image
+        self.session_service = InMemorySessionService()
+        self.artifact_service = InMemoryArtifactService()
+        self.runner = Runner(
+            app_name=APP_NAME,
+            agent=root_agent,
+            session_service=self.session_service,
+            artifact_service=self.artifact_service,
+        )
+        self.checkpoint_path = os.path.join(output_dir, CHECKPOINT_FILE)
+
+    async def _turn(self, session_id: str, message: str) -> tuple[str, float]:
+        start = time.perf_counter()
+        texts = []
+        async for event in self.runner.run_async(
+            user_id=USER_ID,
+            session_id=session_id,
+            new_message=types.Content(role="user", parts=[types.Part.from_text(text=message)]),
+        ):
+            if event.partial or not event.content or not event.content.parts:
+                continue
+            for part in event.content.parts:
+                if part.text and not part.thought and not part.text.startswith("data:image"):
+                    texts.append(part.text)
+        return "\n".join(texts), time.perf_counter() - start
+
+    async def process(self, index: int, keyword: str) -> dict:
+        session = await self.session_service.create_session(app_name=APP_NAME, user_id=USER_ID)
+        try:
+            return await self._process(session.id, index, keyword)
+        finally:
+            # 成功・失敗にかかわらず、処理したセッションはメモリから解放する
+            await self.session_service.delete_session(app_name=APP_NAME, user_id=USER_ID, session_id=session.id)
+
+    async def _process(self, session_id: str, index: int, keyword: str) -> dict:
+        stages = {}
+        _, stages["research"] = await self._turn(session_id, RESEARCH_MESSAGE.format(keyword=keyword))
+        _, stages["article"] = await self._turn(session_id, ARTICLE_MESSAGE.format(pick=self.pick))
+        if self.with_image:
+            _, stages["image"] = await self._turn(session_id, IMAGE_MESSAGE)
+
+        session = await self.session_service.get_session(
+            app_name=APP_NAME, user_id=USER_ID, session_id=session_id
+        )
+        article = await load_session_value(self.artifact_service, session, "blog_editor_output")
+        if not article:
+            # コーディネーターの返答だけでは記事として扱わず、次回の実行で再試行する
+            return {"keyword": keyword, "status": "failed", "error": "blog_editor_output is missing",
+                    "stages": stages}
+        item_dir = os.path.join(self.output_dir, f"{index:03d}-{slugify(keyword)}")
+        os.makedirs(item_dir, exist_ok=True)
+        ideas = await load_session_value(self.artifact_service, session, "researcher_agent_output", "")
+        with open(os.path.join(item_dir, "ideas.md"), "w", encoding="utf-8") as f:
+            f.write(ideas)
+        with open(os.path.join(item_dir, "article.md"), "w", encoding="utf-8") as f:
+            f.write(article)
+        image = await self.artifact_service.load_artifact(
+            app_name=APP_NAME, user_id=USER_ID, session_id=session_id, filename=IMAGE_FILE_NAME
+        )
+        if image and image.inline_data:
+            with open(os.path.join(item_dir, IMAGE_FILE_NAME), "wb") as f:
+                f.write(image.inline_data.data)
+        return {"keyword": keyword, "status": "done", "dir": item_dir,
+                "has_image": bool(image), "stages": stages}
+
+    def record(self, entry: dict) -> None:
+        with open(self.checkpoint_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    async def run(self, keywords: list[str], workers: int) -> list[dict]:
+        os.makedirs(self.output_dir, exist_ok=True)
+        done = {k for k, e in load_checkpoint(self.checkpoint_path).items() if e["status"] == "done"}
+        queue: asyncio.Queue = asyncio.Queue()
+        for index, keyword in enumerate(keywords):
+            if keyword in done:
+                print(f"skip (checkpointed): {keyword}")
+            else:
+                queue.put_nowait((index, keyword))
+
+        results = []
+
+        async def worker() -> None:
+            while not queue.empty():
+                index, keyword = queue.get_nowait()
+                start = time.perf_counter()
+                try:
+                    entry = await self.process(index, keyword)
+                except Exception as e:
+                    entry = {"keyword": keyword, "status": "failed", "error": str(e)}
+                entry["seconds"] = round(time.perf_counter() - start, 3)
+                self.record(entry)
+                results.append(entry)
+                print(f"{entry['status']}: {keyword} ({entry['seconds']}s)")
+
+        await asyncio.gather(*(worker() for _ in range(max(1, workers))))
+        return results
+
+
+def report(results: list[dict], wall_seconds: float) -> None:
+    done = [r for r in results if r["status"] == "done"]
+    print(f"\nProcessed {len(results)} keywords in {wall_seconds:.1f}s "
+          f"({len(done)} done, {len(results) - len(done)} failed)")
+    if wall_seconds > 0:
+        print(f"Throughput: {len(done) / (wall_seconds / 60):.2f} articles/minute")
+    for stage in ("research", "article", "image"):
+        values = [r["stages"][stage] for r in done if stage in r["stages"]]
+        if not values:
+            continue
+        print(f"  {stage:<8} mean {statistics.mean(values):7.2f}s  "
+              f"p50 {statistics.median(values):7.2f}s  max {max(values):7.2f}s")
+
+
+def main(argv: list[str]) -> None:
+    del argv  # unused
+    load_dotenv()
+
+    for spec in FLAGS.rpm:
+        for model, rpm in parse_limits(spec).items():
+            set_model_rpm(model, rpm)
+
+    with open(FLAGS.keywords, encoding="utf-8") as f:
+        keywords = list(dict.fromkeys(line.strip() for line in f if line.strip()))
+
+    batch = BatchRunner(FLAGS.output_dir, FLAGS.pick, FLAGS.image)
+    start = time.perf_counter()
+    results = asyncio.run(batch.run(keywords, FLAGS.workers))
+    report(results, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    app.run(main)
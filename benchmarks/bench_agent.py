@@ -0,0 +1,149 @@
+"""End-to-end offline benchmark of ``root_agent`` with stub LLM and Imagen.
+
+Runs the research -> article -> image scenario for ``--sessions`` sessions
+against deterministic fakes and reports turn latency, time spent in the
+coordinator and researcher callbacks, event payload sizes and peak traced
+memory per session. Results are printed as JSON; ``--output`` also appends
+them to a JSON-lines file so runs can be compared across commits.
+
+    python -m benchmarks.bench_agent --sessions 5 --llm-latency 0.05 --output bench.jsonl
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from collections import defaultdict
+
+from .harness import FakeBackends, make_runner, researcher_agent, root_agent, run_session
+
+TIMED_CALLBACKS = ("filter_image_data_from_history", "callback_load_artifact", "grounding_metadata_callback")
+
+
+def _timed(func, timings: dict):
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                timings[func.__name__].append(time.perf_counter() - start)
+    else:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timings[func.__name__].append(time.perf_counter() - start)
+    return wrapper
+
+
+def instrument_callbacks(timings: dict) -> None:
+    """Wrap the callbacks in ``TIMED_CALLBACKS`` on the agents with timers."""
+    for agent in (root_agent, researcher_agent):
+        for attr in ("before_model_callback", "after_model_callback"):
+            value = getattr(agent, attr)
+            if isinstance(value, list):
+                setattr(agent, attr, [
+                    _timed(cb, timings) if cb.__name__ in TIMED_CALLBACKS else cb for cb in value
+                ])
+            elif value is not None and value.__name__ in TIMED_CALLBACKS:
+                setattr(agent, attr, _timed(value, timings))
+
+
+def summarize(values: list[float], scale: float = 1000, unit: str = "ms") -> dict:
+    """Count, mean, p50, p95 and max of ``values`` multiplied by ``scale``."""
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    return {
+        "count": len(values),
+        f"mean_{unit}": round(statistics.mean(values) * scale, 3),
+        f"p50_{unit}": round(ordered[len(ordered) // 2] * scale, 3),
+        f"p95_{unit}": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * scale, 3),
+        f"max_{unit}": round(ordered[-1] * scale, 3),
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def run(args) -> dict:
+    timings = defaultdict(list)
+    backends = FakeBackends(
+        llm_latency=args.llm_latency, image_latency=args.image_latency,
+        article_chars=args.article_chars, ideas=args.ideas, image_size=args.image_size,
+    ).install()
+    instrument_callbacks(timings)
+    runner = make_runner()
+
+    turn_seconds = defaultdict(list)
+    event_bytes = []
+    for i in range(args.sessions):
+        for index, turn in enumerate(await run_session(runner, f"user{i}")):
+            turn_seconds[index].append(turn["seconds"])
+            event_bytes.append(turn["event_bytes"])
+
+    peaks = []
+    if args.memory_sessions:
+        tracemalloc.start()
+        for i in range(args.memory_sessions):
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+            await run_session(runner, f"memory{i}")
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - base)
+        tracemalloc.stop()
+
+    return {
+        "benchmark": "agent_e2e",
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "timestamp": time.time(),
+        "params": vars(args),
+        "turn_latency": {f"turn{index + 1}": summarize(values) for index, values in turn_seconds.items()},
+        "callbacks": {name: summarize(timings.get(name, [])) for name in TIMED_CALLBACKS},
+        "event_size_per_turn": summarize(event_bytes, scale=1 / 1024, unit="kb"),
+        "peak_memory_per_session_kb": {
+            "mean": round(statistics.mean(peaks) / 1024, 1) if peaks else None,
+            "max": round(max(peaks) / 1024, 1) if peaks else None,
+        },
+        "backend_calls": backends.call_counts(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=5)
+    parser.add_argument("--memory-sessions", type=int, default=2,
+                        help="Extra sessions run under tracemalloc to measure peak memory.")
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--image-latency", type=float, default=0.2)
+    parser.add_argument("--article-chars", type=int, default=8000)
+    parser.add_argument("--ideas", type=int, default=12)
+    parser.add_argument("--image-size", type=int, default=1024)
+    parser.add_argument("--output", help="Append the JSON result to this JSON-lines file.")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    line = json.dumps(result, ensure_ascii=False)
+    print(line)
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+if __name__ == "__main__":
+    main()
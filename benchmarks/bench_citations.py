@@ -0,0 +1,82 @@
+"""Micro-benchmark for researcher citation injection.
+
+Builds synthetic grounding metadata with hundreds of supports and compares the
+offset-indexed ``inject_citations`` against the previous line-by-line
+``str.replace`` implementation.
+
+    python -m benchmarks.bench_citations --supports 500 --chunks 40
+"""
+
+import argparse
+import json
+import random
+import timeit
+from types import SimpleNamespace
+
+from blog_writer_agents.sub_agents.researcher.citations import inject_citations
+
+
+def make_grounding(num_supports: int, num_chunks: int, seed: int = 0):
+    """Return ``(text, supports, chunks)`` resembling a grounded idea list."""
+    rng = random.Random(seed)
+    chunks = [
+        SimpleNamespace(web=SimpleNamespace(uri=f"https://example.com/{i}", title=f"出典{i}"))
+        for i in range(num_chunks)
+    ]
+    lines = []
+    supports = []
+    offset = 0
+    for i in range(num_supports):
+        sentence = f"{i + 1}. 最新トレンド「キーワード{i}」を深掘りするブログ記事のアイデアです。"
+        encoded = sentence.encode('utf-8')
+        supports.append(SimpleNamespace(
+            segment=SimpleNamespace(
+                text=sentence, start_index=offset, end_index=offset + len(encoded), part_index=0
+            ),
+            grounding_chunk_indices=rng.sample(range(num_chunks), k=min(3, num_chunks)),
+        ))
+        lines.append(sentence)
+        offset += len(encoded) + 1  # "\n"
+    return "\n".join(lines), supports, chunks
+
+
+def legacy_inject(text, supports, chunks):
+    """The pre-offset implementation, kept for comparison."""
+    references = {}
+    for i, chunk in enumerate(chunks):
+        web = getattr(chunk, 'web', None)
+        if web and web.uri and web.title:
+            references[web.uri] = {"index": i + 1, "title": web.title, "uri": web.uri}
+    modified_text = ""
+    for line in text.split("\n"):
+        modified_line = line
+        for support in supports:
+            segment_text = support.segment.text
+            if segment_text and segment_text in line:
+                for chunk_index in support.grounding_chunk_indices:
+                    ref = references.get(chunks[chunk_index].web.uri)
+                    if ref:
+                        ref_tag = f"[{ref['index']}. {ref['title']}]({ref['uri']})"
+                        modified_line = modified_line.replace(segment_text, f"{segment_text} {ref_tag}")
+        modified_text += f"{modified_line}\n"
+    return modified_text
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--supports", type=int, default=500)
+    parser.add_argument("--chunks", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    text, supports, chunks = make_grounding(args.supports, args.chunks)
+    results = {"supports": args.supports, "chunks": args.chunks, "text_bytes": len(text.encode('utf-8'))}
+    for name, func in (("offset_index", inject_citations), ("legacy", legacy_inject)):
+        seconds = min(timeit.repeat(lambda: func(text, supports, chunks), number=1, repeat=args.repeat))
+        results[f"{name}_ms"] = round(seconds * 1000, 3)
+    results["speedup"] = round(results["legacy_ms"] / results["offset_index_ms"], 1)
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Article latency of the single-pass and the sectioned blog editor.
+
+Runs the editor alone against ``FakeLlm`` whose latency grows with the
+length of each response (``--chars-per-second``), comparing one generation
+of the whole article with the outline + concurrent sections of
+``SECTIONED_EDITOR``.
+
+    python -m benchmarks.bench_editor --article-chars 6000 --sections 6 --chars-per-second 2000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from blog_writer_agents.sub_agents.blog_editor.sectioned import build_sectioned_editor
+
+from .harness import FakeBackends, blog_editor_agent
+
+REQUEST = "次のテーマでブログ記事を作成してください。\n\nテーマ: 初心者向けキャンプ道具の選び方"
+
+
+async def run_editor(agent, runs: int) -> list[dict]:
+    runner = Runner(app_name="bench_editor", agent=agent, session_service=InMemorySessionService())
+    results = []
+    for _ in range(runs):
+        session = await runner.session_service.create_session(app_name="bench_editor", user_id="bench")
+        start = time.perf_counter()
+        async for _event in runner.run_async(
+            user_id="bench", session_id=session.id,
+            new_message=types.Content(role="user", parts=[types.Part.from_text(text=REQUEST)]),
+        ):
+            pass
+        seconds = time.perf_counter() - start
+        session = await runner.session_service.get_session(
+            app_name="bench_editor", user_id="bench", session_id=session.id
+        )
+        results.append({"seconds": seconds, "chars": len(session.state.get("blog_editor_output", ""))})
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--article-chars", type=int, default=6000)
+    parser.add_argument("--sections", type=int, default=6)
+    parser.add_argument("--chars-per-second", type=float, default=2000)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    backends = FakeBackends(
+        llm_latency=args.llm_latency, article_chars=args.article_chars,
+        sections=args.sections, chars_per_second=args.chars_per_second,
+    ).install()
+    sectioned = build_sectioned_editor(blog_editor_agent)
+    sectioned.concurrency = args.concurrency
+    for mode, agent in (("single", blog_editor_agent), ("sectioned", sectioned)):
+        results = asyncio.run(run_editor(agent, args.runs))
+        print(json.dumps({
+            "mode": mode,
+            "article_chars": args.article_chars,
+            "sections": args.sections,
+            "chars_per_second": args.chars_per_second,
+            "concurrency": args.concurrency if mode == "sectioned" else 1,
+            "mean_s": round(sum(r["seconds"] for r in results) / len(results), 3),
+            "max_s": round(max(r["seconds"] for r in results), 3),
+            "output_chars": results[-1]["chars"],
+        }))
+    print(json.dumps({"backend_calls": backends.call_counts()}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Concurrent sessions through the call gateway with quota errors and RPM limits.
+
+Every session runs the research → article → image scenario against fakes
+that fail ``--error-rate`` of their calls with a 429 quota error, while
+``--rpm`` limits each model. The run is repeated with request coalescing
+off and on, reporting failed sessions, backend calls, retries and the time
+spent queueing for the rate limit from ``gateway.stats()``.
+
+    python -m benchmarks.bench_gateway --sessions 8 --error-rate 0.2 --rpm 600
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+from blog_writer_agents.gateway import gateway
+from blog_writer_agents.rate_limit import set_model_rpm
+
+from .harness import FakeBackends, make_runner, run_session
+
+
+async def run(sessions: int) -> dict:
+    runner = make_runner()
+
+    async def one(i: int) -> bool:
+        try:
+            await run_session(runner, f"user{i}")
+        except Exception as e:
+            print(json.dumps({"session": i, "error": str(e)[:200]}))
+            return False
+        return True
+
+    start = time.perf_counter()
+    succeeded = await asyncio.gather(*(one(i) for i in range(sessions)))
+    return {"wall_s": round(time.perf_counter() - start, 3), "failed_sessions": succeeded.count(False)}
+
+
+def _summary(stats: dict) -> dict:
+    return {
+        model: {name: round(value, 3) for name, value in sorted(values.items())}
+        for model, values in sorted(stats.items())
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--error-rate", type=float, default=0.2)
+    parser.add_argument("--rpm", type=float, default=600, help="requests per minute for every model; 0 for no limit")
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--image-latency", type=float, default=0.2)
+    parser.add_argument("--max-retries", type=int, default=4)
+    parser.add_argument("--backoff-base", type=float, default=0.05)
+    args = parser.parse_args()
+
+    backends = FakeBackends(
+        llm_latency=args.llm_latency, image_latency=args.image_latency, error_rate=args.error_rate,
+    ).install()
+    # 再試行のたびに出る警告で結果が読みにくくならないようにする
+    logging.getLogger().setLevel(logging.ERROR)
+    models = {llm.model for llm in backends.llms.values()} | {"imagen-3.0-generate-002"}
+    gateway.max_retries = args.max_retries
+    gateway.backoff_base = args.backoff_base
+    gateway.backoff_max = args.backoff_base * 16
+
+    for coalesce in (False, True):
+        # 計測ごとにトークンバケットを作り直し、前の計測の消費を持ち越さない
+        for model in models:
+            set_model_rpm(model, args.rpm)
+        gateway.coalesce_enabled = coalesce
+        gateway.reset()
+        before = backends.call_counts()
+        result = asyncio.run(run(args.sessions))
+        after = backends.call_counts()
+        print(json.dumps({
+            "coalesce": coalesce,
+            "sessions": args.sessions,
+            "error_rate": args.error_rate,
+            "rpm": args.rpm,
+            **result,
+            "backend_calls": {role: after[role] - before[role] for role in after if after[role] - before[role]},
+            "gateway": _summary(gateway.stats()),
+        }, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Concurrency benchmark for the ``generate_image`` tool against a fake client.
+
+Runs ``--sessions`` concurrent tool calls through the shared client pool.
+With a non-blocking client the wall time stays close to one round-trip.
+
+    python -m benchmarks.bench_generate_image --sessions 8 --latency 0.5
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import time
+
+from blog_writer_agents.genai_client import reset_clients, set_client
+from blog_writer_agents.tools.generate_image import generate_image
+from blog_writer_agents.transcode import transcode_executor
+
+from .fakes import FakeGenAIClient, FakeToolContext
+
+
+async def run(sessions: int) -> list[float]:
+    async def one(i: int) -> float:
+        start = time.perf_counter()
+        # 同じプロンプトはゲートウェイで 1 回の呼び出しにまとめられるため、セッションごとに変える
+        result = await generate_image(f"a watercolor city skyline #{i}", FakeToolContext())
+        assert result["status"] == "success", result
+        return time.perf_counter() - start
+
+    return await asyncio.gather(*(one(i) for i in range(sessions)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    client = FakeGenAIClient(latency=args.latency)
+    set_client(client)
+    # 変換用ワーカーの起動は 1 プロセスにつき 1 回だけなので計測から除く
+    concurrent.futures.wait(transcode_executor.prestart())
+    try:
+        start = time.perf_counter()
+        latencies = asyncio.run(run(args.sessions))
+        wall = time.perf_counter() - start
+    finally:
+        reset_clients()
+    print(json.dumps({
+        "sessions": args.sessions,
+        "backend_latency_s": args.latency,
+        "wall_s": round(wall, 3),
+        "max_session_s": round(max(latencies), 3),
+        "serialized_s": round(args.latency * args.sessions, 3),
+        "backend_calls": client.calls,
+    }))
+
+
+if __name__ == "__main__":
+    main()
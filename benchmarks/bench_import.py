@@ -0,0 +1,90 @@
+"""Import-time profile of the agent package and the Streamlit UI.
+
+Each target is imported in a fresh interpreter with ``python -X importtime``
+(best of ``--repeat`` runs) and the total import time plus the slowest
+modules by cumulative time are reported, so cold start on Agent Engine and
+Streamlit can be tracked across commits.
+
+    python -m benchmarks.bench_import --repeat 3 --top 10 --output bench.jsonl
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+
+from .bench_agent import git_revision
+
+# 計測対象: Agent Engine が読み込むエージェント、UI のリモートモードで読み込むモジュール
+TARGETS = {
+    "package": "import blog_writer_agents",
+    "root_agent": "from blog_writer_agents import root_agent",
+    "ui_support": "import ui_support",
+    "ui_remote_deps": "import ui_support, vertexai, vertexai.agent_engines",
+    "ui_local_deps": "import ui_support, vertexai.preview.reasoning_engines; from blog_writer_agents import root_agent",
+}
+
+
+def profile(statement: str) -> tuple[float, dict[str, float]]:
+    """Return ``(total_seconds, {module: cumulative_seconds})`` for ``statement``."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True, text=True, check=True,
+    ).stderr
+    total = 0.0
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        seconds = int(cumulative) / 1e6
+        modules[name.strip()] = seconds
+        # インデントのないモジュールがトップレベルの import
+        if not name[1:].startswith(" "):
+            total += seconds
+    return total, modules
+
+
+def run(args) -> dict:
+    results = {}
+    for target, statement in TARGETS.items():
+        if args.targets and target not in args.targets:
+            continue
+        runs = [profile(statement) for _ in range(args.repeat)]
+        total, modules = min(runs, key=lambda r: r[0])
+        slowest = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:args.top]
+        results[target] = {
+            "total_ms": round(total * 1000, 1),
+            "modules": len(modules),
+            "slowest_ms": {name: round(seconds * 1000, 1) for name, seconds in slowest},
+        }
+    return {
+        "benchmark": "import_time",
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "timestamp": time.time(),
+        "params": vars(args),
+        "targets": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--targets", nargs="*", choices=list(TARGETS), help="Defaults to every target.")
+    parser.add_argument("--output", help="Append the JSON result to this JSON-lines file.")
+    args = parser.parse_args()
+
+    result = run(args)
+    line = json.dumps(result, ensure_ascii=False)
+    print(line)
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""Load test of a local ``AdkApp`` with a ramp of concurrent users.
+
+Drives the research -> article -> image scenario through ``create_session``
+and ``stream_query`` of an ``AdkApp`` whose models and Imagen are the local
+fakes, the same way Agent Engine serves concurrent requests: every user is a
+thread and every query runs on its own event loop. For each concurrency level
+it reports p50/p95/p99 turn latency, time to the first event, throughput,
+the event-loop lag seen by the queries and RSS per live session, then names
+the knee: the last level before throughput stops growing or p95 latency
+exceeds ``--knee-latency-factor`` times that of the first level.
+
+    python -m benchmarks.bench_load --levels 1,2,4,8,16 --sessions-per-user 2 --output load.jsonl
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import logging
+import os
+import resource
+import threading
+import time
+from collections import defaultdict
+
+import vertexai
+
+from blog_writer_agents import get_root_agent
+from blog_writer_agents.adk_app import BlogWriterApp
+from blog_writer_agents.artifact_refs import build_artifact_service
+from blog_writer_agents.gateway import gateway
+
+from .bench_agent import git_revision
+from .harness import SCENARIO, FakeBackends
+
+LAG_INTERVAL = 0.01
+
+
+class LagProbe:
+    """Samples how late a short sleep wakes up on every query's event loop."""
+
+    def __init__(self):
+        self.samples: list[float] = []
+        self._started: set[int] = set()
+        self._lock = threading.Lock()
+
+    async def _probe(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(LAG_INTERVAL)
+            self.samples.append(time.perf_counter() - start - LAG_INTERVAL)
+
+    def before_agent_callback(self, callback_context) -> None:
+        # AdkApp はクエリごとに asyncio.run するため、ループごとに 1 つだけ起動する。
+        # ループの終了時に取り消されるので止める必要はない
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if id(loop) in self._started:
+                return None
+            self._started.add(id(loop))
+        task = loop.create_task(self._probe())
+        task.add_done_callback(lambda _: self._forget(loop))
+        return None
+
+    def _forget(self, loop) -> None:
+        with self._lock:
+            self._started.discard(id(loop))
+
+    def install(self, agent) -> None:
+        callbacks = agent.before_agent_callback
+        if callbacks is None:
+            callbacks = []
+        elif not isinstance(callbacks, list):
+            callbacks = [callbacks]
+        agent.before_agent_callback = [self.before_agent_callback, *callbacks]
+
+    def take(self) -> list[float]:
+        samples, self.samples = self.samples, []
+        return samples
+
+
+def rss_bytes() -> int:
+    """Current resident set size; falls back to the peak where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def percentiles(values: list[float], scale: float = 1000) -> dict:
+    """p50/p95/p99 and max of ``values`` in milliseconds (nearest rank)."""
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def rank(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))] * scale, 1)
+
+    return {
+        "count": len(values),
+        "p50_ms": rank(0.50),
+        "p95_ms": rank(0.95),
+        "p99_ms": rank(0.99),
+        "max_ms": round(ordered[-1] * scale, 1),
+    }
+
+
+def run_user(app, user_id: str, sessions: int, turns: list) -> int:
+    """Run ``sessions`` scenario sessions for one user; returns the number of failed turns."""
+    errors = 0
+    for _ in range(sessions):
+        session = app.create_session(user_id=user_id)
+        for index, message in enumerate(SCENARIO):
+            start = time.perf_counter()
+            first = None
+            try:
+                for _event in app.stream_query(message=message, user_id=user_id, session_id=session.id):
+                    if first is None:
+                        first = time.perf_counter() - start
+            except Exception as e:
+                logging.error(f"{user_id} turn {index + 1} failed: {e}")
+                errors += 1
+                break
+            turns.append({"turn": index, "seconds": time.perf_counter() - start, "first_event": first})
+    return errors
+
+
+def run_level(app, concurrency: int, sessions_per_user: int, level: int) -> dict:
+    turns: list[dict] = []
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+        errors = sum(pool.map(
+            lambda i: run_user(app, f"load{level}-user{i}", sessions_per_user, turns), range(concurrency)
+        ))
+    wall = time.perf_counter() - start
+    by_turn = defaultdict(list)
+    for turn in turns:
+        by_turn[turn["turn"]].append(turn["seconds"])
+    return {
+        "concurrency": concurrency,
+        "sessions": concurrency * sessions_per_user,
+        "turns": len(turns),
+        "errors": errors,
+        "wall_s": round(wall, 3),
+        "throughput_turns_per_s": round(len(turns) / wall, 3),
+        "turn_latency": percentiles([t["seconds"] for t in turns]),
+        "turn_latency_by_turn": {f"turn{i + 1}": percentiles(v) for i, v in sorted(by_turn.items())},
+        "first_event": percentiles([t["first_event"] for t in turns if t["first_event"] is not None]),
+    }
+
+
+def find_knee(levels: list[dict], min_gain: float, latency_factor: float) -> dict:
+    """The last level before throughput stops growing by ``min_gain`` or p95 exceeds ``latency_factor``x."""
+    base_p95 = levels[0]["turn_latency"].get("p95_ms", 0)
+    for previous, current in zip(levels, levels[1:]):
+        gain = current["throughput_turns_per_s"] / max(previous["throughput_turns_per_s"], 1e-9) - 1
+        p95 = current["turn_latency"].get("p95_ms", 0)
+        if gain < min_gain:
+            reason = f"throughput {gain:+.0%} at {current['concurrency']} users"
+        elif base_p95 and p95 > base_p95 * latency_factor:
+            reason = f"p95 latency {p95 / base_p95:.1f}x at {current['concurrency']} users"
+        else:
+            continue
+        return {"concurrency": previous["concurrency"], "reason": reason}
+    return {"concurrency": None, "reason": "not reached; raise --levels"}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--levels", default="1,2,4,8,16", help="Comma-separated numbers of concurrent users.")
+    parser.add_argument("--sessions-per-user", type=int, default=2)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--image-latency", type=float, default=0.2)
+    parser.add_argument("--article-chars", type=int, default=8000)
+    parser.add_argument("--image-size", type=int, default=1024)
+    parser.add_argument("--coalesce", action="store_true",
+                        help="Keep gateway coalescing on (the stubs send identical requests for every user).")
+    parser.add_argument("--knee-min-gain", type=float, default=0.1)
+    parser.add_argument("--knee-latency-factor", type=float, default=2.0)
+    parser.add_argument("--output", help="Append the JSON results to this JSON-lines file.")
+    args = parser.parse_args()
+
+    vertexai.init(project="bench-project", location="us-central1")
+    root_agent = get_root_agent()
+    app = BlogWriterApp(agent=root_agent, artifact_service_builder=build_artifact_service)
+    # set_up が GOOGLE_CLOUD_PROJECT を設定するため、スタブはその後に差し込む
+    app.set_up()
+    backends = FakeBackends(
+        llm_latency=args.llm_latency, image_latency=args.image_latency,
+        article_chars=args.article_chars, image_size=args.image_size,
+    ).install()
+    # 実際には利用者ごとに内容が異なるため、同じ内容の呼び出しをまとめずに負荷をかける
+    gateway.coalesce_enabled = args.coalesce
+    probe = LagProbe()
+    probe.install(root_agent)
+
+    # 初回のみのインポートや初期化を計測から除く
+    run_user(app, "warmup", 1, [])
+    probe.take()
+    rss_base = rss_bytes()
+    live_sessions = 0
+
+    results = []
+    for level, concurrency in enumerate(int(c) for c in args.levels.split(",")):
+        before = backends.call_counts()
+        result = run_level(app, concurrency, args.sessions_per_user, level)
+        after = backends.call_counts()
+        live_sessions += result["sessions"]
+        rss = rss_bytes()
+        lag = probe.take()
+        result.update({
+            "benchmark": "agent_load",
+            "revision": git_revision(),
+            "loop_lag": percentiles(lag),
+            "rss_mb": round(rss / 2 ** 20, 1),
+            # InMemorySessionService はセッションを保持し続けるため、生きているセッション数で割る
+            "rss_per_session_kb": round((rss - rss_base) / 1024 / live_sessions, 1),
+            "backend_calls": {role: after[role] - before[role] for role in after if after[role] - before[role]},
+        })
+        results.append(result)
+        print(json.dumps(result, ensure_ascii=False))
+        if args.output:
+            with open(args.output, "a", encoding="utf-8") as f:
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+    print(json.dumps({"knee": find_knee(results, args.knee_min_gain, args.knee_latency_factor)}, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
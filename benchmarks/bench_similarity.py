@@ -0,0 +1,107 @@
+"""Checks that short keywords find a previously written article in the similarity index.
+
+Writes one article through the offline ``root_agent`` (research 「キャンプ」 →
+article) so the coordinator's callbacks index it, optionally adds
+``--articles`` unrelated entries for the same user, then looks the article up
+the way a user would ask again: a bare keyword, a quoted one, a keyword with
+an extra term and the original request. Another user's lookup must find
+nothing. Reports whether each query matched and the lookup latency, and exits
+with status 1 if any expectation fails.
+
+    python -m benchmarks.bench_similarity --articles 2000
+    STREAMING_EDITOR=true python -m benchmarks.bench_similarity  # editor reached through transfer_to_agent
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SIMILARITY_INDEX_ENABLED", "true")
+os.environ.setdefault(
+    "SIMILARITY_INDEX_PATH", os.path.join(tempfile.mkdtemp(prefix="bench_similarity"), "index.sqlite3")
+)
+
+from blog_writer_agents.similarity import similarity_index  # noqa: E402
+
+from .bench_agent import git_revision  # noqa: E402
+from .harness import APP_NAME, SCENARIO, FakeBackends, make_runner, run_turn  # noqa: E402
+
+USER_ID = "bench"
+# (クエリ, 書いた記事が見つかるべきか)
+QUERIES = [
+    ("キャンプ", True),
+    ("「キャンプ」", True),
+    ("キャンプ 初心者", True),
+    (SCENARIO[0], True),
+    ("家庭菜園", False),
+]
+
+
+async def write_article() -> str:
+    runner = make_runner()
+    session = await runner.session_service.create_session(app_name=APP_NAME, user_id=USER_ID)
+    for message in SCENARIO[:2]:
+        await run_turn(runner, USER_ID, session.id, message)
+    return session.id
+
+
+def lookup(user_id: str, query: str, repeat: int) -> tuple[list[dict], float]:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        matches = similarity_index.query(user_id, query, exclude_session_id="bench-lookup")
+    return matches, (time.perf_counter() - start) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--articles", type=int, default=500, help="Unrelated articles indexed for the same user.")
+    parser.add_argument("--repeat", type=int, default=20, help="Lookups per query for the latency.")
+    parser.add_argument("--output", help="Append the JSON result to this JSON-lines file.")
+    args = parser.parse_args()
+
+    FakeBackends().install()
+    session_id = asyncio.run(write_article())
+    for i in range(args.articles):
+        similarity_index.add(
+            USER_ID, f"filler-{i}", f"テーマ{i} 話題{i % 37}", f"{i}番目の話題を深掘りするアイデア",
+            f"# 記事{i}\n" + f"本文{i}の段落です。" * 50, [],
+        )
+
+    checks = []
+    for query, expected in QUERIES:
+        matches, seconds = lookup(USER_ID, query, args.repeat)
+        found = next((m for m in matches if m["keyword"] == "キャンプ"), None)
+        checks.append({
+            "query": query[:40], "expected": expected, "found": found is not None,
+            "similarity": found["similarity"] if found else None,
+            "matched_on": found["matched_on"] if found else None,
+            "lookup_ms": round(seconds * 1000, 3),
+        })
+    # 別の利用者からは見えない
+    others, _ = lookup("someone-else", "キャンプ", 1)
+    checks.append({"query": "キャンプ (other user)", "expected": False, "found": bool(others)})
+
+    result = {
+        "benchmark": "similarity_lookup",
+        "revision": git_revision(),
+        "params": vars(args),
+        "streaming_editor": os.getenv("STREAMING_EDITOR", "false"),
+        "indexed_session": session_id,
+        "index": similarity_index.stats(),
+        "checks": checks,
+        "passed": all(check["found"] == check["expected"] for check in checks),
+    }
+    print(json.dumps(result, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result, ensure_ascii=False) + "\n")
+    if not result["passed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Per-session latency of concurrent image turns with each transcoding mode.
+
+Every session converts its own PNG into the thumbnail data URI that
+``callback_load_artifact`` attaches to a response, while a probe task
+measures how long the event loop is stalled. ``inline`` is the old
+behaviour (Pillow work inside the ``async`` callback); ``thread`` and
+``process`` use ``TranscodeExecutor``.
+
+    python -m benchmarks.bench_transcode --sessions 8 --image-size 2048
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from blog_writer_agents.thumbnails import encode_thumbnail
+from blog_writer_agents.transcode import TRANSCODE_MAX_PENDING, TRANSCODE_WORKERS, TranscodeExecutor
+
+from .fakes import make_png
+
+MODES = ("inline", "thread", "process")
+
+
+async def _probe_lag(stop: asyncio.Event, interval: float = 0.005) -> float:
+    """Largest delay of a ``interval``-second sleep while the sessions run."""
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+
+async def run(mode: str, images: list[bytes], workers: int, max_pending: int) -> dict:
+    executor = None if mode == "inline" else TranscodeExecutor(mode, workers, max_pending)
+    if executor is not None:
+        # プロセスの起動時間を計測に含めないよう、ワーカーの数だけ先に実行しておく
+        await asyncio.gather(*(executor.run(encode_thumbnail, images[0]) for _ in range(workers)))
+
+    async def one(image: bytes) -> float:
+        # 全セッションが同時にターンを始めたとして、開始からの時間を測る
+        if executor is None:
+            encode_thumbnail(image)
+        else:
+            await executor.run(encode_thumbnail, image)
+        return time.perf_counter() - start
+
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_probe_lag(stop))
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(one(image) for image in images))
+    wall = time.perf_counter() - start
+    stop.set()
+    max_lag = await probe
+    stats = executor.stats() if executor is not None else {}
+    if executor is not None:
+        executor.shutdown()
+
+    latencies = sorted(latencies)
+    return {
+        "mode": mode,
+        "sessions": len(images),
+        "wall_s": round(wall, 3),
+        "p50_session_s": round(statistics.median(latencies), 3),
+        "p95_session_s": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3),
+        "max_session_s": round(latencies[-1], 3),
+        "max_loop_lag_s": round(max_lag, 3),
+        "max_queue_wait_s": stats.get("max_queue_wait_s", 0.0),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--image-size", type=int, default=2048)
+    parser.add_argument("--workers", type=int, default=TRANSCODE_WORKERS)
+    parser.add_argument("--max-pending", type=int, default=TRANSCODE_MAX_PENDING)
+    parser.add_argument("--modes", default=",".join(MODES))
+    args = parser.parse_args()
+
+    # セッションごとに別の画像を使い、サムネイルのキャッシュが効かない状況を再現する
+    images = [make_png(args.image_size, args.image_size) for _ in range(args.sessions)]
+    for mode in args.modes.split(","):
+        print(json.dumps(asyncio.run(run(mode, images, args.workers, args.max_pending))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Replay benchmark for the Streamlit streaming renderer.
+
+Replays an event stream recorded with ``UI_RECORD_EVENTS`` (or a synthetic
+SSE article stream) through the legacy ``+=``/repaint-every-event loop and
+through ``StreamRenderer``, with a paint function whose cost is linear in
+the rendered text, like markdown rendering.
+
+    python -m benchmarks.bench_ui_render --article-kb 40
+    python -m benchmarks.bench_ui_render --events events.jsonl
+"""
+
+import argparse
+import json
+import time
+
+from ui_support import StreamRenderer, load_events
+
+
+def synthetic_events(article_kb: int, chunk_chars: int = 40) -> list[dict]:
+    """SSE-style partial events for an article, followed by the final event."""
+    article = ("## 見出し\n本文のサンプルテキストです。" * (article_kb * 1024 // 60 + 1))[:article_kb * 1024]
+    events = [
+        {"author": "blog_editor_agent", "partial": True,
+         "content": {"parts": [{"text": article[i:i + chunk_chars]}]}}
+        for i in range(0, len(article), chunk_chars)
+    ]
+    events.append({"author": "blog_editor_agent", "content": {"parts": [{"text": article}]}})
+    return events
+
+
+class Painter:
+    def __init__(self):
+        self.calls = 0
+        self.chars = 0
+
+    def __call__(self, text: str) -> None:
+        # markdown レンダリングの代わりに全文を走査する
+        self.calls += 1
+        self.chars += len(text.encode("utf-8"))
+
+
+def legacy_replay(events: list[dict], paint) -> str:
+    full_response = ""
+    partial_text = ""
+    for event in events:
+        str(event)  # the old loop logged str(event) for every event
+        for part in event["content"]["parts"]:
+            if "text" in part:
+                if part["text"].startswith("data:image"):
+                    continue
+                elif event.get("partial", False):
+                    partial_text += part["text"]
+                else:
+                    partial_text = ""
+                    full_response += part["text"] + " "
+                paint(full_response + partial_text + "▌")
+    full_response += partial_text
+    paint(full_response)
+    return full_response
+
+
+def renderer_replay(events: list[dict], paint, fps: float) -> str:
+    renderer = StreamRenderer(paint=paint, show_image=lambda uri: None, max_fps=fps)
+    for event in events:
+        renderer.handle_event(event)
+    return renderer.finish()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", help="JSON-lines file recorded with UI_RECORD_EVENTS")
+    parser.add_argument("--article-kb", type=int, default=40)
+    parser.add_argument("--fps", type=float, default=8.0)
+    args = parser.parse_args()
+
+    events = load_events(args.events) if args.events else synthetic_events(args.article_kb)
+    results = {"events": len(events)}
+    outputs = {}
+    for name, replay in (("legacy", legacy_replay),
+                         ("renderer", lambda e, p: renderer_replay(e, p, args.fps))):
+        painter = Painter()
+        start = time.perf_counter()
+        outputs[name] = replay(events, painter)
+        results[f"{name}_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        results[f"{name}_paints"] = painter.calls
+        results[f"{name}_painted_bytes"] = painter.chars
+    results["same_output"] = outputs["legacy"] == outputs["renderer"]
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""Local fakes for the Vertex AI backends used by the agents."""
+
+import asyncio
+import json
+import random
+import time
+from io import BytesIO
+from types import SimpleNamespace
+from typing import AsyncGenerator
+
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.genai import errors, types
+from PIL import Image
+
+
+# 失敗の注入は実行ごとに同じ結果になるよう固定のシードで行う
+_rng = random.Random(0)
+
+
+def quota_error() -> errors.ClientError:
+    """The error Vertex AI returns when the per-minute quota is exhausted."""
+    return errors.ClientError(429, {"error": {
+        "code": 429, "message": "Resource exhausted. Please try again later.", "status": "RESOURCE_EXHAUSTED",
+    }})
+
+
+def maybe_fail(error_rate: float) -> None:
+    """Raise ``quota_error()`` with probability ``error_rate``."""
+    if error_rate and _rng.random() < error_rate:
+        raise quota_error()
+
+
+def make_png(width: int = 1024, height: int = 1024) -> bytes:
+    """Return a PNG with some noise so it doesn't compress to nothing."""
+    img = Image.effect_noise((width, height), 64).convert('RGB')
+    buffer = BytesIO()
+    img.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class _FakeModels:
+    def __init__(self, owner: "FakeGenAIClient"):
+        self._owner = owner
+
+    def _response(self, config) -> SimpleNamespace:
+        number = (config or {}).get("number_of_images", 1)
+        self._owner.calls += 1
+        maybe_fail(self._owner.error_rate)
+        return SimpleNamespace(generated_images=[
+            SimpleNamespace(image=SimpleNamespace(image_bytes=self._owner.image_bytes))
+            for _ in range(number)
+        ])
+
+    def generate_images(self, *, model, prompt, config=None):
+        time.sleep(self._owner.latency)
+        return self._response(config)
+
+
+class _FakeAsyncModels(_FakeModels):
+    async def generate_images(self, *, model, prompt, config=None):
+        await asyncio.sleep(self._owner.latency)
+        return self._response(config)
+
+
+class FakeGenAIClient:
+    """Mimics ``google.genai.Client`` image generation with fixed latency.
+
+    A share ``error_rate`` of the calls fails with a 429 quota error.
+    """
+
+    def __init__(self, latency: float = 0.5, image_bytes: bytes = None, error_rate: float = 0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.image_bytes = image_bytes if image_bytes is not None else make_png(256, 256)
+        self.calls = 0
+        self.models = _FakeModels(self)
+        self.aio = SimpleNamespace(models=_FakeAsyncModels(self))
+
+
+class FakeToolContext:
+    """Stores artifacts in memory, standing in for ``ToolContext``."""
+
+    def __init__(self):
+        self.artifacts: dict[str, list] = {}
+        self.state: dict = {}
+        self.agent_name = "blog_coordinator"
+
+    async def save_artifact(self, filename, artifact) -> int:
+        versions = self.artifacts.setdefault(filename, [])
+        versions.append(artifact)
+        return len(versions) - 1
+
+    async def load_artifact(self, filename, version=None):
+        versions = self.artifacts.get(filename)
+        if not versions:
+            return None
+        return versions[-1 if version is None else version]
+
+
+def _last_content(llm_request: LlmRequest):
+    return llm_request.contents[-1] if llm_request.contents else None
+
+
+class FakeLlm(BaseLlm):
+    """Deterministic stand-in for Gemini, scripted per agent role.
+
+    ``role`` is ``coordinator``, ``researcher`` or ``editor``. The
+    coordinator picks a tool from keywords in the user's message
+    (リサーチ / 画像 / 修正 / 記事, using ``revise_article`` for 修正 and
+    ``create_article_and_image`` for 記事 when they are offered) and summarizes tool results; the researcher
+    returns ``ideas`` grounded ideas with synthetic grounding metadata; the
+    editor returns an article of ``article_chars`` characters. For the
+    sectioned editor, ``outline`` returns ``sections`` headings, ``section``
+    one heading's share of ``article_chars`` and ``frame`` the introduction
+    and CTA. For revisions, ``planner`` picks the first section and
+    ``rewriter`` returns a short replacement for it. Each call sleeps ``latency`` seconds, plus the response length
+    divided by ``chars_per_second`` when that is set, to mimic decoding time;
+    a share ``error_rate`` of the calls then fails with a 429 quota error.
+    """
+
+    role: str
+    latency: float = 0.05
+    ideas: int = 12
+    article_chars: int = 8000
+    sections: int = 6
+    chars_per_second: float = 0.0
+    error_rate: float = 0.0
+    calls: int = 0
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        self.calls += 1
+        response = getattr(self, f"_{self.role}")(llm_request)
+        delay = self.latency
+        if self.chars_per_second:
+            delay += sum(len(p.text or "") for p in response.content.parts) / self.chars_per_second
+        await asyncio.sleep(delay)
+        maybe_fail(self.error_rate)
+        # 文字数からおおよそのトークン数を埋めて計測値を出せるようにする
+        response.usage_metadata = types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=sum(len(c.model_dump_json(exclude_none=True)) for c in llm_request.contents) // 4,
+            candidates_token_count=len(response.content.model_dump_json(exclude_none=True)) // 4,
+        )
+        yield response
+
+    def _coordinator(self, llm_request: LlmRequest) -> LlmResponse:
+        last = _last_content(llm_request)
+        parts = last.parts if last and last.parts else []
+        responses = [p.function_response for p in parts if p.function_response]
+        if responses:
+            text = f"{responses[0].name} の結果をお伝えします。" + "内容の要約です。" * 20
+            return LlmResponse(content=types.Content(role="model", parts=[types.Part.from_text(text=text)]))
+
+        message = " ".join(p.text for p in parts if p.text)
+        if "リサーチ" in message:
+            call = types.Part.from_function_call(name="researcher_agent", args={"request": message})
+        elif "画像" in message:
+            call = types.Part.from_function_call(
+                name="generate_image", args={"prompt": "A bright, minimal eye-catch illustration"}
+            )
+        elif "修正" in message and "revise_article" in llm_request.tools_dict:
+            call = types.Part.from_function_call(name="revise_article", args={"instruction": message})
+        elif "記事" in message and "create_article_and_image" in llm_request.tools_dict:
+            call = types.Part.from_function_call(name="create_article_and_image", args={
+                "article_request": message, "image_prompt": "A bright, minimal eye-catch illustration",
+            })
+        elif "記事" in message and "blog_editor_agent" not in llm_request.tools_dict:
+            # STREAMING_EDITOR では編集者に委譲する
+            call = types.Part.from_function_call(name="transfer_to_agent", args={"agent_name": "blog_editor_agent"})
+        elif "記事" in message:
+            call = types.Part.from_function_call(name="blog_editor_agent", args={"request": message})
+        else:
+            return LlmResponse(content=types.Content(
+                role="model", parts=[types.Part.from_text(text="承知しました。")]
+            ))
+        return LlmResponse(content=types.Content(role="model", parts=[call]))
+
+    def _researcher(self, llm_request: LlmRequest) -> LlmResponse:
+        chunks = [
+            types.GroundingChunk(web=types.GroundingChunkWeb(uri=f"https://example.com/{i}", title=f"出典{i}"))
+            for i in range(8)
+        ]
+        lines, supports, offset = [], [], 0
+        for i in range(self.ideas):
+            line = f"{i + 1}. 話題のトピック{i}を深掘りする記事のアイデア"
+            encoded = len(line.encode("utf-8"))
+            supports.append(types.GroundingSupport(
+                segment=types.Segment(start_index=offset, end_index=offset + encoded, text=line),
+                grounding_chunk_indices=[i % len(chunks), (i + 3) % len(chunks)],
+            ))
+            lines.append(line)
+            offset += encoded + 1
+        return LlmResponse(
+            content=types.Content(role="model", parts=[types.Part.from_text(text="\n".join(lines))]),
+            grounding_metadata=types.GroundingMetadata(grounding_chunks=chunks, grounding_supports=supports),
+        )
+
+    def _editor(self, llm_request: LlmRequest) -> LlmResponse:
+        body = ("## 見出し\nブログ記事の本文です。読者の関心を引く内容を書きます。\n" * (self.article_chars // 30 + 1))
+        return _text_response("# タイトル\n" + body[:self.article_chars])
+
+    def _outline(self, llm_request: LlmRequest) -> LlmResponse:
+        return _text_response(json.dumps({
+            "title": "タイトル",
+            "style_brief": "初心者向けに、です・ます調で親しみやすく書く。",
+            "sections": [{"heading": f"見出し{i}", "key_point": f"要点{i}"} for i in range(1, self.sections + 1)],
+            "cta": "関連記事を読んでもらう",
+        }, ensure_ascii=False))
+
+    def _section(self, llm_request: LlmRequest) -> LlmResponse:
+        chars = self.article_chars // self.sections
+        body = "見出しの本文です。読者の関心を引く内容を書きます。\n" * (chars // 25 + 1)
+        return _text_response(body[:chars])
+
+    def _frame(self, llm_request: LlmRequest) -> LlmResponse:
+        return _text_response(json.dumps({
+            "introduction": "導入文です。" * 20,
+            "call_to_action": "## まとめ\n" + "ぜひ試してみてください。" * 10,
+        }, ensure_ascii=False))
+
+    def _planner(self, llm_request: LlmRequest) -> LlmResponse:
+        return _text_response(json.dumps({"edits": [{"section_id": 0, "directive": "導入を短くする"}]},
+                                         ensure_ascii=False))
+
+    def _rewriter(self, llm_request: LlmRequest) -> LlmResponse:
+        return _text_response("# タイトル\n\n短くした導入文です。")
+
+
+def _text_response(text: str) -> LlmResponse:
+    return LlmResponse(content=types.Content(role="model", parts=[types.Part.from_text(text=text)]))
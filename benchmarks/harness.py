@@ -0,0 +1,115 @@
+"""Wires ``root_agent`` to the local fakes so it can run fully offline."""
+
+import concurrent.futures
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+
+# オフライン計測ではリサーチ結果キャッシュを既定で無効にする
+os.environ.setdefault("RESEARCH_CACHE_ENABLED", "false")
+
+from google.adk.artifacts import InMemoryArtifactService  # noqa: E402
+from google.adk.runners import Runner  # noqa: E402
+from google.adk.sessions import InMemorySessionService  # noqa: E402
+from google.genai import types  # noqa: E402
+
+from blog_writer_agents.agent import root_agent  # noqa: E402
+from blog_writer_agents.gateway import gateway_llm  # noqa: E402
+from blog_writer_agents.genai_client import set_client  # noqa: E402
+from blog_writer_agents.sub_agents.article_reviser import (  # noqa: E402
+    revision_planner_agent, section_rewriter_agent,
+)
+from blog_writer_agents.sub_agents.blog_editor.agent import blog_editor_agent  # noqa: E402
+from blog_writer_agents.sub_agents.blog_editor.sectioned import (  # noqa: E402
+    article_frame_writer, article_outline_agent, article_section_writer,
+)
+from blog_writer_agents.sub_agents.researcher import researcher_agent  # noqa: E402
+from blog_writer_agents.transcode import transcode_executor  # noqa: E402
+
+from .fakes import FakeGenAIClient, FakeLlm, make_png  # noqa: E402
+
+APP_NAME = "blog_writer_bench"
+
+# 1 セッションで実行する会話（リサーチ → 記事作成 → アイキャッチ生成）
+SCENARIO = [
+    "「キャンプ」をテーマにしたブログ記事のアイデアをリサーチしてください。",
+    "1番目のアイデアでブログ記事を作成してください。",
+    "この記事のアイキャッチ画像を生成してください。",
+]
+
+
+@dataclass
+class FakeBackends:
+    llm_latency: float = 0.05
+    image_latency: float = 0.2
+    article_chars: int = 8000
+    ideas: int = 12
+    image_size: int = 1024
+    sections: int = 6
+    chars_per_second: float = 0.0
+    error_rate: float = 0.0
+    llms: dict = field(default_factory=dict)
+    image_client: FakeGenAIClient = None
+
+    def install(self) -> "FakeBackends":
+        """Point every agent and the image tool at the fakes."""
+        # サブエージェントの INFO ログが計測結果に混ざらないようにする
+        logging.getLogger().setLevel(logging.WARNING)
+        # SECTIONED_EDITOR の場合も、単一生成の編集者は代替として使われる
+        for role, agent in (("coordinator", root_agent), ("researcher", researcher_agent),
+                            ("editor", blog_editor_agent), ("outline", article_outline_agent),
+                            ("section", article_section_writer), ("frame", article_frame_writer),
+                            ("planner", revision_planner_agent), ("rewriter", section_rewriter_agent)):
+            llm = FakeLlm(model=agent.canonical_model.model, role=role, latency=self.llm_latency,
+                          ideas=self.ideas, article_chars=self.article_chars, sections=self.sections,
+                          chars_per_second=self.chars_per_second, error_rate=self.error_rate)
+            # 本番と同じく呼び出しの集約・レート制限・再試行を通す
+            agent.model = gateway_llm(llm)
+            self.llms[role] = llm
+        self.image_client = FakeGenAIClient(
+            latency=self.image_latency, image_bytes=make_png(self.image_size, self.image_size),
+            error_rate=self.error_rate,
+        )
+        set_client(self.image_client)
+        # 変換用ワーカーの起動は 1 プロセスにつき 1 回だけなので、最初のセッションの計測に含めない
+        concurrent.futures.wait(transcode_executor.prestart())
+        return self
+
+    def call_counts(self) -> dict:
+        counts = {role: llm.calls for role, llm in self.llms.items()}
+        counts["imagen"] = self.image_client.calls if self.image_client else 0
+        return counts
+
+
+def make_runner() -> Runner:
+    return Runner(
+        app_name=APP_NAME,
+        agent=root_agent,
+        session_service=InMemorySessionService(),
+        artifact_service=InMemoryArtifactService(),
+    )
+
+
+async def run_turn(runner: Runner, user_id: str, session_id: str, message: str) -> tuple[float, int, int]:
+    """Run one user turn; returns ``(seconds, events, event_bytes)``."""
+    start = time.perf_counter()
+    events = 0
+    event_bytes = 0
+    async for event in runner.run_async(
+        user_id=user_id,
+        session_id=session_id,
+        new_message=types.Content(role="user", parts=[types.Part.from_text(text=message)]),
+    ):
+        events += 1
+        event_bytes += len(event.model_dump_json(exclude_none=True))
+    return time.perf_counter() - start, events, event_bytes
+
+
+async def run_session(runner: Runner, user_id: str, scenario: list[str] = SCENARIO) -> list[dict]:
+    session = await runner.session_service.create_session(app_name=APP_NAME, user_id=user_id)
+    turns = []
+    for message in scenario:
+        seconds, events, event_bytes = await run_turn(runner, user_id, session.id, message)
+        turns.append({"seconds": seconds, "events": events, "event_bytes": event_bytes})
+    return turns
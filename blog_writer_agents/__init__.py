@@ -1,5 +1,37 @@
-"""Public exports for the blog writer package."""
+"""Public exports for the blog writer package.
 
-from .agent import root_agent
+``root_agent`` is imported on first access so that lightweight modules such as
+``blog_writer_agents.artifact_refs`` can be used without loading ADK, the
+sub-agents and the image tooling. Accessing ``root_agent`` loads ADK (most of
+the import time) and the coordinator; the tools of features that are switched
+off (``PARALLEL_ARTICLE_IMAGE``, ``PATCH_REVISIONS``, ``SPECULATIVE_DRAFTS``,
+``SIMILARITY_INDEX_ENABLED``) are not imported. ``ROOT_AGENT`` selects which
+agent it is: ``coordinator`` (default, interactive) or ``workflow`` (fixed
+pipeline).
+"""
 
-__all__ = ["root_agent"]
+import importlib
+import os
+from typing import Optional
+
+__all__ = ["root_agent", "get_root_agent"]
+
+ROOT_AGENTS = {
+    "coordinator": (".agent", "root_agent"),
+    "workflow": (".workflow", "workflow_agent"),
+}
+
+
+def get_root_agent(kind: Optional[str] = None):
+    """Return the ``coordinator`` or ``workflow`` root agent."""
+    kind = kind or os.getenv("ROOT_AGENT", "coordinator")
+    if kind not in ROOT_AGENTS:
+        raise ValueError(f"Unknown ROOT_AGENT: {kind!r} (choose from {', '.join(ROOT_AGENTS)})")
+    module, attr = ROOT_AGENTS[kind]
+    return getattr(importlib.import_module(module, __name__), attr)
+
+
+def __getattr__(name):
+    if name == "root_agent":
+        return get_root_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
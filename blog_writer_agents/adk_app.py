@@ -0,0 +1,47 @@
+"""``AdkApp`` template that accepts a serializable ``run_config``.
+
+Agent Engine receives the keyword arguments of ``stream_query`` as JSON, so a
+remote client can only send ``run_config`` as a dict, while ``Runner.run``
+expects a ``RunConfig``. ``BlogWriterApp`` validates the dict into a
+``RunConfig`` before handing it to the runner, so ``STREAMING_EDITOR`` clients
+get SSE streaming from both the local app and Agent Engine.
+"""
+
+from typing import Any, Optional
+
+from vertexai.preview import reasoning_engines
+
+
+def _with_run_config(kwargs: dict) -> dict:
+    run_config = kwargs.get("run_config")
+    if isinstance(run_config, dict):
+        from google.adk.agents.run_config import RunConfig
+
+        kwargs["run_config"] = RunConfig.model_validate(run_config)
+    return kwargs
+
+
+class BlogWriterApp(reasoning_engines.AdkApp):
+    """``AdkApp`` whose query methods accept ``run_config`` as a dict."""
+
+    def clone(self):
+        import copy
+
+        return BlogWriterApp(
+            agent=copy.deepcopy(self._tmpl_attrs.get("agent")),
+            enable_tracing=self._tmpl_attrs.get("enable_tracing"),
+            session_service_builder=self._tmpl_attrs.get("session_service_builder"),
+            artifact_service_builder=self._tmpl_attrs.get("artifact_service_builder"),
+            env_vars=self._tmpl_attrs.get("env_vars"),
+        )
+
+    def stream_query(self, *, message: Any, user_id: str, session_id: Optional[str] = None, **kwargs):
+        yield from super().stream_query(
+            message=message, user_id=user_id, session_id=session_id, **_with_run_config(kwargs)
+        )
+
+    async def async_stream_query(self, *, message: Any, user_id: str, session_id: Optional[str] = None, **kwargs):
+        async for event in super().async_stream_query(
+            message=message, user_id=user_id, session_id=session_id, **_with_run_config(kwargs)
+        ):
+            yield event
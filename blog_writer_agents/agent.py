@@ -1,10 +1,7 @@
 """ルートエージェント"""
 
 import copy
-import base64
 import os
-from io import BytesIO
-from PIL import Image
 import logging
 
 from google.adk.agents import LlmAgent
@@ -13,8 +10,19 @@ from dotenv import load_dotenv
 
 from .sub_agents.researcher import researcher_agent
 from .sub_agents.blog_editor import blog_editor_agent
-from .tools.generate_image import generate_image
+from .tools.generate_image import generate_image, select_image
 from .tools.get_current_datetime import get_current_datetime
+from .artifact_refs import ARTIFACT_REF_PREFIX, IMAGE_TRANSPORT, make_artifact_ref
+from .history import compact_history
+from .gateway import gateway_llm
+from .research_cache import CachedAgentTool, research_cache
+from .routing import record_route_latency, route_model_call
+from .similarity import SIMILARITY_INDEX_ENABLED, index_article, remember_research_request
+from .state_offload import end_tool_call, mark_tool_call, offload_tool_state
+from .speculation import SPECULATIVE_DRAFTS, cancel_speculation_on_choice, start_speculation
+from .telemetry import end_model_span, end_tool_span, start_model_span, start_tool_span, traced_callback
+from .thumbnails import artifact_name, content_hash, encode_thumbnail, thumbnail_cache, to_data_uri
+from .transcode import transcode
 from google.adk.tools import load_artifacts
 from google.genai.types import Part
 from google.adk.agents.callback_context import CallbackContext
@@ -28,6 +36,16 @@ logging.basicConfig(level=logging.ERROR)
 
 MODEL = "gemini-2.5-pro"
 IMAGE_FILE_NAME = os.getenv("IMAGE_FILE_NAME", "image.png")
+# 画像生成時に作成済みのサムネイル
+THUMBNAIL_FILE_NAME = artifact_name(IMAGE_FILE_NAME, rendition="thumb")
+# true の場合、記事はブログ編集者サブエージェントへの委譲でストリーミング出力する
+STREAMING_EDITOR = os.getenv("STREAMING_EDITOR", "false").lower() == "true"
+# true の場合、テーマ決定後に記事作成と画像生成を並行して行う（ストリーミング出力とは併用しない）
+PARALLEL_ARTICLE_IMAGE = (
+    os.getenv("PARALLEL_ARTICLE_IMAGE", "false").lower() == "true" and not STREAMING_EDITOR
+)
+# true の場合、作成済みの記事の修正は変更が必要なセクションだけを書き換える
+PATCH_REVISIONS = os.getenv("PATCH_REVISIONS", "false").lower() == "true"
 
 BLOG_COORDINATOR_PROMPT = """
 マーケティングとコンテンツ戦略の専門家です。あなたの目的は、ユーザーが魅力的なブログ記事を作成し、多くの反響を得られるようにサポートすることです。
@@ -43,6 +61,8 @@ BLOG_COORDINATOR_PROMPT = """
 * **入力内容：** ユーザーにブログのテーマやキーワード（例：旅行、ガジェット、育児など）を尋ねてください。
 * **実行内容：** そのキーワードを使ってリサーチャーサブエージェントを呼び出してください。
   ユーザーにフレッシュな情報を提供するために、`get_current_datetime` ツールを使用して現在の日付と時刻を取得し、リサーチャーサブエージェントに渡してください。
+  リサーチャーへの依頼では、キーワードを「」で囲んでください（例：「キャンプ」）。
+  同じキーワードのリサーチ結果はしばらく再利用されます。ユーザーが最新の情報で調べ直すよう求めた場合は、`refresh` を true にして呼び出してください。
 * **期待される出力：** リサーチャーサブエージェントは、少なくとも10個の鮮度の高いブログ記事のアイデアを生成しリストアップします。
 * **注意点：** ユーザーが選んだテーマに基づいて、ブログ記事のアイデアを提案してください。例えば、旅行なら「世界の絶景スポット」や「バックパッカーの旅のコツ」など。
   ユニークで読者の関心を引くような、ブランド性の高い名前を提案してください。
@@ -69,6 +89,8 @@ BLOG_COORDINATOR_PROMPT = """
 * **注意点：** アイキャッチ画像は、ブログ記事の内容を視覚的に表現し、読者の興味を引くものでなければなりません。
   ブランドカラーやフォントを使用して、一貫したブランドイメージを保つようにしてください。
   画像生成ツールに提供するプロンプトは英語に翻訳し、Imagenモデルのベストプラクティスに沿った形にすること。
+  画像生成ツールは複数の候補画像を一度に生成し、1 番目の候補を選択した状態にします。
+  ユーザーが別の候補を希望した場合は、再生成せずに `select_image` ツールで候補番号を指定して切り替えてください。
 
 ---
 
@@ -77,7 +99,52 @@ BLOG_COORDINATOR_PROMPT = """
 ユーザーが迷わず進めるように、それぞれのステップで丁寧にサブエージェントに委任する背景と意図も説明してください。
 """
 
+STREAMING_EDITOR_PROMPT = """
+### ステップ 2 の実行方法（ストリーミングモード）
+
+ステップ 2 では `transfer_to_agent` ツールで `blog_editor_agent` に処理を委譲してください。
+記事本文は `blog_editor_agent` が直接ユーザーに出力するため、あなたが記事の全文を繰り返し出力する必要はありません。
+委譲の前に、選ばれたテーマと記事作成の方針を簡潔に伝えてください。
+"""
+
+PARALLEL_ARTICLE_IMAGE_PROMPT = """
+### ステップ 2 と 3 の実行方法（並行モード）
+
+アイキャッチ画像は記事の完成を待たず、選ばれたテーマとブランドイメージだけで決められます。
+ユーザーがテーマを選んだら、ステップ 2 と 3 を `create_article_and_image` ツールで同時に実行してください。
+`article_request` には選ばれたテーマと記事作成の方針を、`image_prompt` にはステップ 3 の注意点に沿った英語の画像生成プロンプトを指定します。
+結果を受け取ったら記事の全文を提示し、アイキャッチ画像の候補が生成されたことを伝えてください。
+status が partial の場合は記事の全文を提示したうえで、画像の生成に失敗したこと（`image_error`）を伝え、`generate_image` ツールで画像だけを作り直してください。
+記事だけ、または画像だけを作り直す場合は、従来どおり個別のサブエージェントやツールを使ってください。
+"""
+
+PATCH_REVISIONS_PROMPT = """
+### 作成済みの記事の修正
+
+記事の作成後にユーザーが一部の修正（導入を短くする、CTA を変える、特定の見出しを書き直すなど）を求めた場合は、
+ブログ編集者で記事全体を作り直すのではなく、ユーザーの修正依頼をそのまま `revise_article` ツールに渡してください。
+結果の `changes` に含まれる書き換えられたセクションだけを提示し、記事の全文は繰り返さないでください。
+テーマや構成を大きく変える依頼の場合は、通常どおりステップ 2 を実行してください。
+"""
 
+SIMILAR_ARTICLES_PROMPT = """
+### 過去の記事の再利用
+
+ステップ 1 でキーワードを受け取ったら、リサーチの前に `find_similar_articles` ツールでそのキーワードを検索してください。
+似た過去の記事（matches）が見つかった場合は、アイデアと抜粋、出典をユーザーに示し、再利用するか新しくリサーチするかを尋ねてください。
+再利用する場合は `reuse_article` ツールで記事を読み込んで提示し、必要に応じてステップ 2 の修正やステップ 3 に進んでください。
+"""
+
+SPECULATIVE_DRAFTS_PROMPT = """
+### 先行して作成された下書き
+
+リサーチ結果の上位のアイデアについては、ユーザーが選ぶ前から記事の下書きがバックグラウンドで作成されています。
+ユーザーがアイデアを番号で選んだら、ステップ 2 の前にまず `use_draft` ツールをその番号で呼び出してください。
+status が success の場合は返された記事をそのまま提示し、not_available の場合は通常どおりステップ 2 を実行してください。
+"""
+
+
+@traced_callback
 async def filter_image_data_from_history(
     callback_context: CallbackContext,
     llm_request: LlmRequest
@@ -91,8 +158,8 @@ async def filter_image_data_from_history(
                 filtered_parts = []
                 for part in content.parts:
                     if hasattr(part, 'text') and part.text:
-                        # data:imageで始まる画像データを除外
-                        if part.text.startswith('data:image'):
+                        # data:imageで始まる画像データや成果物参照を除外
+                        if part.text.startswith(('data:image', ARTIFACT_REF_PREFIX)):
                             continue
                         # 前回までの <artifact> タグを除去
                         part.text = part.text.replace(
@@ -112,6 +179,82 @@ async def filter_image_data_from_history(
     return None
 
 
+def _latest_artifact_version(session, filename: str) -> Optional[int]:
+    """セッションのイベント履歴から成果物の最新バージョンを取得する"""
+    for event in reversed(session.events):
+        delta = event.actions.artifact_delta if event.actions else None
+        if delta and filename in delta:
+            return delta[filename]
+    return None
+
+
+async def _load_data_uri(
+    callback_context: CallbackContext,
+    filename: str,
+    encode,
+    in_executor: bool = False
+) -> Optional[str]:
+    """成果物を data URI に変換して取得する
+
+    (セッション, ファイル名, バージョン) をキーにキャッシュし、成果物が
+    更新されていなければ読み込みや変換を行わずに返す。
+    """
+    session_id = callback_context._invocation_context.session.id
+    version = _latest_artifact_version(
+        callback_context._invocation_context.session, filename
+    )
+    if version is not None:
+        cached = thumbnail_cache.get((session_id, filename, version))
+        if cached:
+            return cached
+
+    artifact = await callback_context.load_artifact(filename=filename, version=version)
+    if not artifact:
+        return None
+
+    data = artifact.inline_data.data
+    if version is None:
+        # バージョン不明の場合は内容のハッシュをキーにする
+        key = (session_id, filename, content_hash(data))
+        cached = thumbnail_cache.get(key)
+        if cached:
+            return cached
+    else:
+        key = (session_id, filename, version)
+
+    # 変換は CPU を使うため、イベントループを止めないようプロセスプールで行う
+    mime_string = await transcode(encode, data) if in_executor else encode(data)
+    thumbnail_cache.put(key, mime_string)
+    return mime_string
+
+
+def _artifact_ref(callback_context: CallbackContext) -> Optional[str]:
+    """画像データの代わりにクライアントへ送る成果物参照を作成する"""
+    ctx = callback_context._invocation_context
+    for filename, mime_type in ((THUMBNAIL_FILE_NAME, "image/jpeg"), (IMAGE_FILE_NAME, "image/png")):
+        version = _latest_artifact_version(ctx.session, filename)
+        if version is not None:
+            return make_artifact_ref(
+                ctx.app_name, ctx.user_id, ctx.session.id, filename, version, mime_type
+            )
+    return None
+
+
+async def load_thumbnail(callback_context: CallbackContext) -> Optional[str]:
+    """画像成果物のサムネイル(data URI または成果物参照)を取得する"""
+    if IMAGE_TRANSPORT == "reference":
+        ref = _artifact_ref(callback_context)
+        if ref:
+            return ref
+    session = callback_context._invocation_context.session
+    if _latest_artifact_version(session, THUMBNAIL_FILE_NAME) is not None:
+        # 生成時に作成済みの JPEG サムネイルをそのまま使う
+        return await _load_data_uri(callback_context, THUMBNAIL_FILE_NAME, to_data_uri)
+    # Convert PNG to JPEG to reduce data size
+    return await _load_data_uri(callback_context, IMAGE_FILE_NAME, encode_thumbnail, in_executor=True)
+
+
+@traced_callback
 async def callback_load_artifact(
     callback_context: CallbackContext,
     llm_response: LlmResponse
@@ -120,6 +263,13 @@ async def callback_load_artifact(
     try:
         if not (llm_response.content and llm_response.content.parts):
             return llm_response
+        # ストリーミング中の部分応答には画像を付けず、最終応答にのみ付ける
+        if llm_response.partial:
+            return llm_response
+        if not any(part.text for part in llm_response.content.parts):
+            return llm_response
+
+        mime_string = await load_thumbnail(callback_context)
 
         parts_new = []
         for part in copy.deepcopy(llm_response.content.parts):
@@ -127,22 +277,12 @@ async def callback_load_artifact(
             if not part.text:
                 continue
 
-            image_artifact = await callback_context.load_artifact(filename=IMAGE_FILE_NAME)
-            if not image_artifact:
+            if not mime_string:
                 part.text = part.text.replace(
                     f'<artifact>{IMAGE_FILE_NAME}</artifact>',
                     f'<artifact>_none_{IMAGE_FILE_NAME}</artifact>'
                 )
-                parts_new[-1] = part
-            # Convert PNG to JPEG to reduce data size
-            image_bytes = image_artifact.inline_data.data
-            img = Image.open(BytesIO(image_bytes)).convert('RGB')
-            img = img.resize((500, int(img.height * (500 / img.width))))
-            jpg_buffer = BytesIO()
-            img.save(jpg_buffer, 'JPEG', quality=70)
-            jpg_binary = jpg_buffer.getvalue()
-            base64_encoded = base64.b64encode(jpg_binary).decode('utf-8')
-            mime_string = f'data:image/jpeg;base64,{base64_encoded}'
+                continue
             parts_new.append(Part.from_text(text=mime_string))
 
         llm_response_new = copy.deepcopy(llm_response)
@@ -154,9 +294,20 @@ async def callback_load_artifact(
         return llm_response
 
 
+# 無効な機能のツール（とそのサブエージェントやインデックス）は読み込まない
+if PARALLEL_ARTICLE_IMAGE:
+    from .tools.create_article_and_image import create_article_and_image
+if PATCH_REVISIONS:
+    from .tools.revise_article import revise_article
+if SPECULATIVE_DRAFTS:
+    from .tools.use_draft import use_draft
+if SIMILARITY_INDEX_ENABLED:
+    from .tools.similar_articles import find_similar_articles, reuse_article
+
+
 blog_coordinator = LlmAgent(
     name="blog_coordinator",
-    model=MODEL,
+    model=gateway_llm(MODEL),
     planner=BuiltInPlanner(
         thinking_config=types.ThinkingConfig(
             thinking_budget=1024,
@@ -169,17 +320,33 @@ blog_coordinator = LlmAgent(
         "サブエージェントを呼び出して、ブログ記事のテーマ決定、記事作成、アイキャッチデザインを行います。"
         "各ステップでは、ユーザーに必要な情報を尋ね、サブエージェントに適切な入力を提供します。"
     ),
-    instruction=BLOG_COORDINATOR_PROMPT,
+    instruction=(
+        BLOG_COORDINATOR_PROMPT
+        + (STREAMING_EDITOR_PROMPT if STREAMING_EDITOR else "")
+        + (PARALLEL_ARTICLE_IMAGE_PROMPT if PARALLEL_ARTICLE_IMAGE else "")
+        + (PATCH_REVISIONS_PROMPT if PATCH_REVISIONS else "")
+        + (SIMILAR_ARTICLES_PROMPT if SIMILARITY_INDEX_ENABLED else "")
+        + (SPECULATIVE_DRAFTS_PROMPT if SPECULATIVE_DRAFTS else "")
+    ),
     tools=[
-        AgentTool(agent=researcher_agent),
-        AgentTool(agent=blog_editor_agent),
+        CachedAgentTool(agent=researcher_agent, cache=research_cache),
+        *([] if STREAMING_EDITOR else [AgentTool(agent=blog_editor_agent)]),
+        *([create_article_and_image] if PARALLEL_ARTICLE_IMAGE else []),
+        *([revise_article] if PATCH_REVISIONS else []),
         generate_image,
+        select_image,
+        *([use_draft] if SPECULATIVE_DRAFTS else []),
+        *([find_similar_articles, reuse_article] if SIMILARITY_INDEX_ENABLED else []),
         get_current_datetime,
         load_artifacts
     ],
-    sub_agents=[],
-    before_model_callback=filter_image_data_from_history,
-    after_model_callback=callback_load_artifact
+    sub_agents=[blog_editor_agent] if STREAMING_EDITOR else [],
+    before_model_callback=[
+        route_model_call, filter_image_data_from_history, compact_history, start_model_span
+    ],
+    after_model_callback=[record_route_latency, end_model_span, callback_load_artifact],
+    before_tool_callback=[mark_tool_call, start_tool_span, cancel_speculation_on_choice, remember_research_request],
+    after_tool_callback=[end_tool_span, start_speculation, index_article, offload_tool_state, end_tool_call],
 )
 
 root_agent = blog_coordinator
@@ -0,0 +1,51 @@
+"""Artifact references sent in place of inline base64 image data.
+
+With ``IMAGE_TRANSPORT=reference`` the coordinator emits a short text part
+``artifact-ref:{...}`` naming the artifact and its version instead of a
+``data:image`` URI. Clients fetch the bytes once from the shared artifact
+store (the ``ARTIFACT_BUCKET`` GCS bucket, required on Agent Engine) and can
+cache them forever, since a version never changes.
+"""
+
+import json
+import os
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from google.adk.artifacts import BaseArtifactService
+
+IMAGE_TRANSPORT = os.getenv("IMAGE_TRANSPORT", "inline")
+ARTIFACT_REF_PREFIX = "artifact-ref:"
+
+
+def make_artifact_ref(app_name: str, user_id: str, session_id: str,
+                      filename: str, version: int, mime_type: str) -> str:
+    return ARTIFACT_REF_PREFIX + json.dumps({
+        "app_name": app_name,
+        "user_id": user_id,
+        "session_id": session_id,
+        "filename": filename,
+        "version": version,
+        "mime_type": mime_type,
+    }, ensure_ascii=False, separators=(",", ":"))
+
+
+def parse_artifact_ref(text: str) -> Optional[dict]:
+    """Return the reference encoded in ``text``, or None if it isn't one."""
+    if not text or not text.startswith(ARTIFACT_REF_PREFIX):
+        return None
+    try:
+        return json.loads(text[len(ARTIFACT_REF_PREFIX):])
+    except json.JSONDecodeError:
+        return None
+
+
+def build_artifact_service() -> "BaseArtifactService":
+    """Artifact store shared by the agent and its clients."""
+    from google.adk.artifacts import GcsArtifactService, InMemoryArtifactService
+
+    # Agent Engine では env_vars がインポート後に設定されるため、呼び出し時に読む
+    bucket = os.getenv("ARTIFACT_BUCKET")
+    if bucket:
+        return GcsArtifactService(bucket_name=bucket)
+    return InMemoryArtifactService()
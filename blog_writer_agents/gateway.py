@@ -0,0 +1,292 @@
+"""Shared gateway for Vertex AI calls made by the agents and tools.
+
+Every model call (through ``GatewayLlm``) and every Imagen call goes through
+``gateway``, which
+
+* coalesces identical in-flight requests (singleflight): concurrent callers
+  with the same key share one backend call and its result; model calls are
+  only shared within the same user and session,
+* waits for the per-model token bucket of ``rate_limit`` (``MODEL_RPM_LIMITS``)
+  before each attempt, and
+* retries quota and availability errors (429 / 503) with jittered
+  exponential backoff, up to ``GATEWAY_MAX_RETRIES`` times.
+
+Queueing delay (time waiting for the rate limit) and backoff are recorded
+as telemetry spans and summarized per model by ``gateway.stats()``.
+"""
+
+import asyncio
+import concurrent.futures
+import hashlib
+import logging
+import os
+import random
+import threading
+import weakref
+from collections import defaultdict
+from typing import Any, AsyncGenerator, Awaitable, Callable, Hashable, Optional, TypeVar
+
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.adk.models.registry import LLMRegistry
+
+from .rate_limit import acquire
+from .telemetry import TELEMETRY_ENABLED, current_call_scope, fail_model_span, telemetry
+
+GATEWAY_MAX_RETRIES = int(os.getenv("GATEWAY_MAX_RETRIES", "4"))
+GATEWAY_BACKOFF_BASE_SECONDS = float(os.getenv("GATEWAY_BACKOFF_BASE_SECONDS", "1.0"))
+GATEWAY_BACKOFF_MAX_SECONDS = float(os.getenv("GATEWAY_BACKOFF_MAX_SECONDS", "30"))
+GATEWAY_COALESCE = os.getenv("GATEWAY_COALESCE", "true").lower() == "true"
+
+# 再試行する HTTP ステータス（クォータ超過と一時的な利用不可）
+RETRYABLE_CODES = (429, 503)
+
+T = TypeVar("T")
+
+
+class _LeaderCancelled(Exception):
+    """The call that followers were waiting on was cancelled by its own caller."""
+
+
+def is_retryable(error: BaseException) -> bool:
+    return getattr(error, "code", None) in RETRYABLE_CODES or "RESOURCE_EXHAUSTED" in str(error)
+
+
+def backoff_delay(attempt: int, base: float = GATEWAY_BACKOFF_BASE_SECONDS,
+                  cap: float = GATEWAY_BACKOFF_MAX_SECONDS) -> float:
+    """Full-jitter exponential backoff for retry ``attempt`` (0-based)."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class CallGateway:
+    """Singleflight, rate limiting and retries shared by every event loop in the process."""
+
+    def __init__(self, max_retries: int = GATEWAY_MAX_RETRIES, coalesce: bool = GATEWAY_COALESCE,
+                 backoff_base: float = GATEWAY_BACKOFF_BASE_SECONDS,
+                 backoff_max: float = GATEWAY_BACKOFF_MAX_SECONDS):
+        self.max_retries = max_retries
+        self.coalesce_enabled = coalesce
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._lock = threading.Lock()
+        # AdkApp はクエリごとにイベントループが異なるため concurrent.futures.Future で結果を共有する
+        self._inflight: dict[Hashable, concurrent.futures.Future] = {}
+        self._stats: dict[str, dict[str, float]] = defaultdict(lambda: defaultdict(float))
+
+    def _count(self, model: Optional[str], name: str, value: float = 1) -> None:
+        with self._lock:
+            self._stats[model or "-"][name] += value
+
+    def _record_queue_wait(self, model: str, waited: float) -> None:
+        with self._lock:
+            stats = self._stats[model]
+            stats["attempts"] += 1
+            stats["queue_wait_s"] += waited
+            stats["max_queue_wait_s"] = max(stats["max_queue_wait_s"], waited)
+        if TELEMETRY_ENABLED:
+            telemetry.record("gateway_queue", model, waited)
+
+    async def coalesce(self, key: Optional[Hashable], fn: Callable[[], Awaitable[T]],
+                       model: Optional[str] = None) -> T:
+        """Run ``fn()``, or wait for the in-flight call with the same ``key``."""
+        if key is None or not self.coalesce_enabled:
+            return await fn()
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = concurrent.futures.Future()
+        if not leader:
+            self._count(model, "coalesced")
+            try:
+                # 待っている側が取り消されても、共有の呼び出しは取り消さない
+                return await asyncio.shield(asyncio.wrap_future(future))
+            except _LeaderCancelled:
+                return await self.coalesce(key, fn, model)
+
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                if self._inflight.get(key) is future:
+                    del self._inflight[key]
+
+    async def _wait_for_rate_limit(self, model: str) -> None:
+        waited = await acquire(model)
+        self._record_queue_wait(model, waited)
+
+    async def _backoff(self, model: str, attempt: int, error: BaseException) -> None:
+        delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+        self._count(model, "retries")
+        self._count(model, "backoff_s", delay)
+        logging.warning(f"{model} call failed ({error}); retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+        if TELEMETRY_ENABLED:
+            telemetry.record("gateway_backoff", model, delay)
+        await asyncio.sleep(delay)
+
+    def _should_retry(self, model: str, attempt: int, error: BaseException) -> bool:
+        if not is_retryable(error):
+            self._count(model, "errors")
+            return False
+        self._count(model, "retryable_errors")
+        if attempt >= self.max_retries:
+            self._count(model, "exhausted")
+            return False
+        return True
+
+    async def _call(self, model: str, fn: Callable[[], Awaitable[T]]) -> T:
+        for attempt in range(self.max_retries + 1):
+            await self._wait_for_rate_limit(model)
+            try:
+                result = await fn()
+            except Exception as e:
+                if not self._should_retry(model, attempt, e):
+                    raise
+                await self._backoff(model, attempt, e)
+            else:
+                self._count(model, "calls")
+                return result
+
+    async def call(self, model: str, fn: Callable[[], Awaitable[T]], key: Optional[Hashable] = None) -> T:
+        """Call ``fn()`` for ``model`` with rate limiting and retries.
+
+        Concurrent calls with the same ``key`` share a single call.
+        """
+        return await self.coalesce(key, lambda: self._call(model, fn), model)
+
+    async def stream(self, model: str, fn: Callable[[], AsyncGenerator[T, None]]) -> AsyncGenerator[T, None]:
+        """Stream ``fn()``; failures are retried only before the first item is received."""
+        for attempt in range(self.max_retries + 1):
+            await self._wait_for_rate_limit(model)
+            started = False
+            try:
+                async for item in fn():
+                    started = True
+                    yield item
+            except Exception as e:
+                # 途中まで送った応答はやり直せないため、そのまま失敗させる
+                if started or not self._should_retry(model, attempt, e):
+                    raise
+                await self._backoff(model, attempt, e)
+            else:
+                self._count(model, "calls")
+                return
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {model: dict(values) for model, values in self._stats.items()}
+        for values in stats.values():
+            if values.get("attempts"):
+                values["mean_queue_wait_s"] = values.get("queue_wait_s", 0.0) / values["attempts"]
+        return stats
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+
+gateway = CallGateway()
+
+# イベントループごとのモデル（モデル名 → BaseLlm）。エージェントはデプロイ時に
+# pickle されるため、GatewayLlm には持たせない
+_loop_llms: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, BaseLlm]]" = (
+    weakref.WeakKeyDictionary()
+)
+_llms_lock = threading.Lock()
+
+
+def request_key(llm_request: LlmRequest, scope: Optional[tuple[str, str]]) -> Optional[str]:
+    """Key identical model requests of one ``(user_id, session_id)`` by model, config and contents.
+
+    Returns None (no coalescing) when the scope is unknown, so that one user's
+    request is never answered with another user's response.
+    """
+    if scope is None:
+        return None
+    try:
+        payload = "\n".join([
+            *scope,
+            llm_request.model or "",
+            llm_request.config.model_dump_json(exclude_none=True) if llm_request.config else "",
+            *(content.model_dump_json(exclude_none=True) for content in llm_request.contents),
+        ])
+    except Exception:
+        # response_schema にクラスが入っている場合などは直列化できないため、まとめずに呼ぶ
+        return None
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class GatewayLlm(BaseLlm):
+    """Wraps a model so that its calls go through ``gateway``.
+
+    Unless a fixed ``inner`` model is given, the model is resolved through
+    ``LLMRegistry`` once per running event loop: its API client is bound to the
+    loop it was first used on, and ``AdkApp`` runs every query under its own
+    ``asyncio.run``. Calls served by the same loop share one client.
+    """
+
+    inner: Optional[BaseLlm] = None
+
+    def _llm(self) -> BaseLlm:
+        if self.inner is not None:
+            return self.inner
+        loop = asyncio.get_running_loop()
+        with _llms_lock:
+            llms = _loop_llms.setdefault(loop, {})
+            llm = llms.get(self.model)
+            if llm is None:
+                llm = llms[self.model] = LLMRegistry.new_llm(self.model)
+        return llm
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        try:
+            async for response in self._generate(llm_request, stream):
+                yield response
+        except Exception as e:
+            # after_model_callback は呼ばれないため、開始したスパンをここで閉じる
+            fail_model_span(e)
+            raise
+
+    async def _generate(self, llm_request: LlmRequest, stream: bool) -> AsyncGenerator[LlmResponse, None]:
+        model = llm_request.model or self.model
+        llm = self._llm()
+        if stream:
+            async for response in gateway.stream(
+                model, lambda: llm.generate_content_async(llm_request, stream=True)
+            ):
+                yield response
+            return
+
+        async def collect() -> list[LlmResponse]:
+            return [response async for response in llm.generate_content_async(llm_request)]
+
+        responses = await gateway.call(model, collect, key=request_key(llm_request, current_call_scope()))
+        for response in responses:
+            # まとめられた呼び出し同士で応答のオブジェクトを共有しないようにコピーする
+            yield response.model_copy(deep=True)
+
+    def connect(self, llm_request: LlmRequest) -> Any:
+        return self._llm().connect(llm_request)
+
+
+def gateway_llm(model: "str | BaseLlm") -> GatewayLlm:
+    """Return ``model`` wrapped with ``GatewayLlm``.
+
+    A model name is resolved per event loop; a ``BaseLlm`` instance (e.g. a
+    local fake) is used as is on every loop.
+    """
+    if isinstance(model, BaseLlm):
+        return GatewayLlm(model=model.model, inner=model)
+    # 存在しないモデル名は、最初の呼び出しではなく読み込み時にエラーにする
+    LLMRegistry.resolve(model)
+    return GatewayLlm(model=model)
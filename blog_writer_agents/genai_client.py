@@ -0,0 +1,81 @@
+"""Pool of GenAI clients shared by tools and sub-agents.
+
+A client's async transport (``client.aio``) is bound to the event loop it was
+first used on, and ``AdkApp`` runs every query under its own ``asyncio.run``.
+Clients are therefore pooled per running event loop: sessions served by the
+same loop share one client and its connection pool, and the entry goes away
+with the loop.
+"""
+
+import asyncio
+import os
+import threading
+import weakref
+from typing import TYPE_CHECKING, Optional
+
+from dotenv import load_dotenv
+
+if TYPE_CHECKING:
+    from google.genai import Client
+
+load_dotenv()
+
+# イベントループ（ループ外で使う場合は None）ごとのクライアント
+_loop_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[tuple, Client]]" = (
+    weakref.WeakKeyDictionary()
+)
+_clients: dict[tuple, "Client"] = {}
+# set_client で差し込んだクライアント（ループに関係なく使う）
+_overrides: dict[tuple, "Client"] = {}
+_lock = threading.Lock()
+
+
+def _key(project: Optional[str], location: Optional[str]) -> tuple:
+    return (
+        project or os.getenv("GOOGLE_CLOUD_PROJECT"),
+        location or os.getenv("GOOGLE_CLOUD_LOCATION"),
+    )
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def get_client(project: Optional[str] = None, location: Optional[str] = None) -> "Client":
+    """Return the Vertex AI client for ``(project, location)`` on the current event loop.
+
+    The client is created on first use on each loop and reused by every
+    session served by that loop. Use ``client.aio`` for calls made from
+    async tools.
+    """
+    key = _key(project, location)
+    client = _overrides.get(key)
+    if client is not None:
+        return client
+    loop = _running_loop()
+    with _lock:
+        pool = _clients if loop is None else _loop_clients.setdefault(loop, {})
+        client = pool.get(key)
+        if client is None:
+            from google.genai import Client
+
+            # Only Vertex AI supports image generation for now.
+            client = pool[key] = Client(vertexai=True, project=key[0], location=key[1])
+    return client
+
+
+def set_client(client, project: Optional[str] = None, location: Optional[str] = None) -> None:
+    """Install ``client`` for ``(project, location)`` on every loop, e.g. a local fake."""
+    with _lock:
+        _overrides[_key(project, location)] = client
+
+
+def reset_clients() -> None:
+    """Drop every pooled and installed client."""
+    with _lock:
+        _loop_clients.clear()
+        _clients.clear()
+        _overrides.clear()
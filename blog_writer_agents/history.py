@@ -0,0 +1,125 @@
+"""Token-budgeted compaction of the conversation sent to the coordinator."""
+
+import json
+import logging
+import os
+from typing import Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest, LlmResponse
+from google.genai import types
+
+from .telemetry import traced_callback
+
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "32000"))
+HISTORY_KEEP_TURNS = int(os.getenv("HISTORY_KEEP_TURNS", "2"))
+HISTORY_SUMMARY_CHARS = int(os.getenv("HISTORY_SUMMARY_CHARS", "400"))
+
+# サブエージェント名とその出力が保存されているセッション状態のキー
+SUB_AGENT_OUTPUT_KEYS = {
+    "researcher_agent": "researcher_agent_output",
+    "blog_editor_agent": "blog_editor_output",
+}
+
+
+def estimate_text_tokens(text: str) -> int:
+    """Rough token estimate: ~4 ASCII chars per token, ~1 token per CJK char."""
+    ascii_chars = sum(1 for c in text if c.isascii())
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
+
+def estimate_part_tokens(part: types.Part) -> int:
+    if part.text:
+        return estimate_text_tokens(part.text)
+    if part.function_call:
+        return estimate_text_tokens(json.dumps(part.function_call.args or {}, ensure_ascii=False)) + 8
+    if part.function_response:
+        return estimate_text_tokens(json.dumps(part.function_response.response or {}, ensure_ascii=False)) + 8
+    if part.inline_data and part.inline_data.data:
+        # 画像などのバイナリはおおよそのサイズで見積もる
+        return len(part.inline_data.data) // 4
+    return 0
+
+
+def estimate_content_tokens(content: types.Content) -> int:
+    return sum(estimate_part_tokens(part) for part in content.parts or [])
+
+
+def _summarize(text: str, limit: int = HISTORY_SUMMARY_CHARS) -> str:
+    if len(text) <= limit:
+        return text
+    head = text[:limit].rstrip()
+    return f"{head}…（以下 {len(text) - limit} 文字省略）"
+
+
+def _turn_starts(contents: list[types.Content]) -> list[int]:
+    """Indices of contents that start a user turn (user text, not tool results)."""
+    return [
+        i for i, content in enumerate(contents)
+        if content.role == "user" and any(part.text for part in content.parts or [])
+    ]
+
+
+def _compact_part(part: types.Part) -> int:
+    """Shrink ``part`` in place and return the number of tokens saved."""
+    before = estimate_part_tokens(part)
+    if part.function_response and part.function_response.name in SUB_AGENT_OUTPUT_KEYS:
+        response = part.function_response.response or {}
+        result = response.get("result")
+        if isinstance(result, str) and not response.get("compacted"):
+            part.function_response.response = {
+                "result": _summarize(result),
+                "compacted": True,
+                "state_key": SUB_AGENT_OUTPUT_KEYS[part.function_response.name],
+            }
+    elif part.text:
+        # ADK はコールバックより前に thought フラグを外すため、思考のパートもここで要約される
+        part.text = _summarize(part.text)
+    return before - estimate_part_tokens(part)
+
+
+def compact_contents(
+    contents: list[types.Content],
+    budget: int = HISTORY_TOKEN_BUDGET,
+    keep_turns: int = HISTORY_KEEP_TURNS,
+) -> tuple[int, int]:
+    """Compact older contents in place until the estimate fits ``budget``.
+
+    The last ``keep_turns`` user turns are kept verbatim. Older sub-agent
+    results are replaced with a short head of the text plus the state key
+    holding the full output, and older long texts are truncated, oldest first.
+    Returns ``(tokens_before, tokens_after)``.
+    """
+    sizes = [estimate_content_tokens(content) for content in contents]
+    total = before = sum(sizes)
+    if total <= budget:
+        return before, total
+
+    starts = _turn_starts(contents)
+    if len(starts) <= keep_turns:
+        return before, total
+    protected_from = starts[-keep_turns] if keep_turns else len(contents)
+
+    for content in contents[:protected_from]:
+        for part in content.parts or []:
+            total -= _compact_part(part)
+            if total <= budget:
+                return before, total
+    return before, total
+
+
+@traced_callback
+async def compact_history(
+    callback_context: CallbackContext,
+    llm_request: LlmRequest
+) -> Optional[LlmResponse]:
+    """古い会話履歴を圧縮してトークン予算内に収める"""
+    try:
+        before, after = compact_contents(llm_request.contents)
+        if after < before:
+            logging.info(f"Compacted history: ~{before} -> ~{after} tokens")
+        if after > HISTORY_TOKEN_BUDGET:
+            logging.warning(f"History still exceeds token budget: ~{after} > {HISTORY_TOKEN_BUDGET}")
+    except Exception as e:
+        logging.error(f"Error compacting history: {e}")
+    return None
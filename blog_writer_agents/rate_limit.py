@@ -0,0 +1,80 @@
+"""Per-model request rate limits shared by the agents and tools.
+
+Limits are requests per minute, configured with ``MODEL_RPM_LIMITS`` such as
+``gemini-2.5-pro=60,gemini-2.5-flash=300,imagen-3.0-generate-002=20`` or at
+runtime with ``set_model_rpm``. Models without a limit are not throttled.
+``gateway`` waits here before every model and Imagen call.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """Async token bucket refilled at ``rate`` tokens per second.
+
+    Tokens are reserved under a thread lock and the caller then sleeps until
+    its token is due, so one bucket can be shared by several event loops
+    (``AdkApp`` queries and background drafting each run their own loop).
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> float:
+        """Wait for a token and return the time spent waiting."""
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            wait = 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+
+def parse_limits(spec: str) -> dict[str, float]:
+    """Parse ``model=rpm,model=rpm`` into a dict."""
+    limits = {}
+    for item in filter(None, (s.strip() for s in spec.split(","))):
+        model, _, rpm = item.partition("=")
+        try:
+            limits[model.strip()] = float(rpm)
+        except ValueError:
+            logging.warning(f"Ignoring invalid rate limit {item!r}")
+    return limits
+
+
+_buckets: dict[str, TokenBucket] = {}
+
+
+def set_model_rpm(model: str, rpm: Optional[float]) -> None:
+    """Limit ``model`` to ``rpm`` requests per minute; ``None`` or 0 removes the limit."""
+    if rpm:
+        _buckets[model] = TokenBucket(rpm / 60.0)
+    else:
+        _buckets.pop(model, None)
+
+
+for _model, _rpm in parse_limits(os.getenv("MODEL_RPM_LIMITS", "")).items():
+    set_model_rpm(_model, _rpm)
+
+
+async def acquire(model: Optional[str]) -> float:
+    """Wait until a request to ``model`` is allowed; returns the wait in seconds."""
+    bucket = _buckets.get(model or "")
+    if bucket is None:
+        return 0.0
+    return await bucket.acquire()
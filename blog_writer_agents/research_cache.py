@@ -0,0 +1,280 @@
+"""Persistent TTL cache for researcher results.
+
+Results are keyed by the research keyword plus a freshness bucket derived
+from the current JST time, so a keyword asked twice within the same bucket is
+answered from local disk instead of a new grounded search.
+
+The keyword is the text the coordinator puts in 「」 (or 『』 / quotes) in its
+request to the researcher. A request without a quoted keyword falls back to
+the whole normalized request, so only identical wordings hit in that case.
+"""
+
+import asyncio
+import datetime
+import json
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import unicodedata
+from typing import Any, Optional
+
+from google.adk.tools import ToolContext
+from google.adk.tools.agent_tool import AgentTool
+from google.genai import types
+from typing_extensions import override
+
+from .gateway import gateway
+from .tools.get_current_datetime import now_jst
+
+RESEARCH_CACHE_ENABLED = os.getenv("RESEARCH_CACHE_ENABLED", "true").lower() == "true"
+RESEARCH_CACHE_PATH = os.getenv(
+    "RESEARCH_CACHE_PATH",
+    os.path.join(tempfile.gettempdir(), "blog_writer_research_cache.sqlite3"),
+)
+RESEARCH_CACHE_TTL_SECONDS = int(os.getenv("RESEARCH_CACHE_TTL_SECONDS", str(6 * 60 * 60)))
+RESEARCH_CACHE_MAX_BYTES = int(os.getenv("RESEARCH_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESEARCH_CACHE_BUCKET_HOURS = int(os.getenv("RESEARCH_CACHE_BUCKET_HOURS", "24"))
+
+# ツール引数の refresh が True の場合、またはセッション状態にこのキーが True で入っている場合はキャッシュを使わない
+BYPASS_STATE_KEY = "research_cache_bypass"
+REFRESH_ARG = "refresh"
+
+_DATETIME_PATTERN = re.compile(
+    r"\d{4}[-/年]\d{1,2}[-/月]\d{1,2}日?(?:[ T]?\d{1,2}:\d{2}(?::\d{2})?)?"
+)
+_QUOTED_PATTERN = re.compile(r"[「『\"“]([^」』\"”]+)[」』\"”]")
+_REFERENCE_PATTERN = re.compile(r"\[(\d+)\. ([^\]]+)\]\((https?://[^)\s]+)\)")
+
+
+def normalize_keyword(text: str) -> str:
+    """Normalize a researcher request so rephrasings of the same keyword match.
+
+    Width and case are folded, embedded timestamps (which the coordinator
+    passes along from ``get_current_datetime``) are dropped and whitespace
+    is collapsed.
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = _DATETIME_PATTERN.sub(" ", text)
+    return " ".join(text.split()).strip(" 、。,.!?！？")
+
+
+def extract_keyword(request: str) -> str:
+    """Return the cache keyword of a researcher request.
+
+    The quoted keywords (「キャンプ」) are used when present, so differently
+    worded requests for the same keyword share an entry; otherwise the whole
+    normalized request is the keyword.
+    """
+    quoted = [normalize_keyword(match) for match in _QUOTED_PATTERN.findall(request)]
+    quoted = [keyword for keyword in quoted if keyword]
+    if quoted:
+        return " ".join(quoted)
+    return normalize_keyword(request)
+
+
+def freshness_bucket(now: Optional[datetime.datetime] = None,
+                     hours: int = RESEARCH_CACHE_BUCKET_HOURS) -> str:
+    """Return the freshness bucket for ``now`` (JST), e.g. ``2025-06-01`` or ``2025-06-01/2``."""
+    now = now or now_jst()
+    if hours >= 24:
+        return now.strftime("%Y-%m-%d")
+    return f"{now:%Y-%m-%d}/{now.hour // hours}"
+
+
+def extract_references(text: str) -> list[dict]:
+    """Collect the ``[n. title](uri)`` citations added by the researcher callback."""
+    references = {}
+    for index, title, uri in _REFERENCE_PATTERN.findall(text):
+        references.setdefault(uri, {"index": int(index), "title": title, "uri": uri})
+    return list(references.values())
+
+
+class ResearchCache:
+    """SQLite-backed cache with TTL expiry and LRU eviction by total size."""
+
+    def __init__(self, path: str = RESEARCH_CACHE_PATH,
+                 ttl_seconds: int = RESEARCH_CACHE_TTL_SECONDS,
+                 max_bytes: int = RESEARCH_CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return the connection shared by every call; callers hold ``_lock``."""
+        if self._conn is None:
+            # 呼び出しごとに接続を開かず、1 つの接続をロックの下で使い回す
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS research_cache ("
+                " key TEXT PRIMARY KEY,"
+                " keyword TEXT NOT NULL,"
+                " bucket TEXT NOT NULL,"
+                " result TEXT NOT NULL,"
+                " references_json TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS research_cache_accessed ON research_cache (accessed_at)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def __getstate__(self) -> dict:
+        # デプロイ時にエージェントとともに pickle されるため、ロックと接続は持ち越さない
+        state = self.__dict__.copy()
+        state["_lock"] = None
+        state["_conn"] = None
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(keyword: str, bucket: str) -> str:
+        return f"{bucket}\x1f{keyword}"
+
+    def get(self, keyword: str, bucket: str) -> Optional[dict]:
+        key = self.make_key(keyword, bucket)
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT result, references_json, created_at FROM research_cache WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None or now - row[2] > self.ttl_seconds:
+                if row is not None:
+                    conn.execute("DELETE FROM research_cache WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            conn.execute("UPDATE research_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return {"result": row[0], "references": json.loads(row[1]), "created_at": row[2]}
+
+    def put(self, keyword: str, bucket: str, result: str, references: list[dict]) -> None:
+        references_json = json.dumps(references, ensure_ascii=False)
+        size = len(result.encode("utf-8")) + len(references_json.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO research_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.make_key(keyword, bucket), keyword, bucket, result, references_json, size, now, now),
+            )
+            conn.execute("DELETE FROM research_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM research_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in conn.execute(
+            "SELECT key, size FROM research_cache ORDER BY accessed_at"
+        ).fetchall():
+            conn.execute("DELETE FROM research_cache WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self) -> None:
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM research_cache")
+
+    def stats(self) -> dict:
+        with self._lock, self._connect() as conn:
+            entries, total = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM research_cache"
+            ).fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries,
+                "bytes": total, "max_bytes": self.max_bytes}
+
+
+class CachedAgentTool(AgentTool):
+    """``AgentTool`` that answers repeated requests from a ``ResearchCache``.
+
+    The cache is skipped when ``RESEARCH_CACHE_ENABLED`` is false, when the
+    model passes the optional ``refresh`` argument as true (the user asked
+    for the latest information), or when the session state has
+    ``research_cache_bypass`` set to True; fresh results are still written
+    back in the last two cases.
+
+    Concurrent requests for the same keyword share one research run through
+    ``gateway.coalesce``, whether or not the cache is enabled.
+    """
+
+    def __init__(self, agent, cache: ResearchCache, skip_summarization: bool = False):
+        super().__init__(agent=agent, skip_summarization=skip_summarization)
+        self._cache = cache
+
+    @override
+    def _get_declaration(self) -> types.FunctionDeclaration:
+        declaration = super()._get_declaration()
+        if declaration.parameters and declaration.parameters.properties is not None:
+            declaration.parameters.properties[REFRESH_ARG] = types.Schema(
+                type=types.Type.BOOLEAN,
+                description="True to ignore cached research results and search again.",
+            )
+        return declaration
+
+    @override
+    async def run_async(self, *, args: dict[str, Any], tool_context: ToolContext) -> Any:
+        refresh = bool(args.get(REFRESH_ARG))
+        args = {name: value for name, value in args.items() if name != REFRESH_ARG}
+        request = args.get("request")
+        if not isinstance(request, str):
+            return await super().run_async(args=args, tool_context=tool_context)
+
+        keyword = extract_keyword(request)
+        bucket = freshness_bucket()
+        bypass = refresh or bool(tool_context.state.get(BYPASS_STATE_KEY))
+        output_key = getattr(self.agent, "output_key", None)
+
+        if RESEARCH_CACHE_ENABLED and not bypass:
+            try:
+                cached = await asyncio.to_thread(self._cache.get, keyword, bucket)
+            except sqlite3.Error as e:
+                logging.error(f"Research cache read failed: {e}")
+                cached = None
+            if cached:
+                logging.info(f"Research cache hit: {keyword!r} ({bucket})")
+                if output_key:
+                    tool_context.state[output_key] = cached["result"]
+                return cached["result"]
+
+        # 同じキーワードのリサーチが他のセッションで実行中なら、その結果を待って共有する
+        result = await gateway.coalesce(
+            ("research", self.agent.name, keyword, bucket),
+            lambda: super(CachedAgentTool, self).run_async(args=args, tool_context=tool_context),
+            model=self.agent.name,
+        )
+        if output_key and isinstance(result, str):
+            tool_context.state[output_key] = result
+        if RESEARCH_CACHE_ENABLED and isinstance(result, str) and result:
+            try:
+                await asyncio.to_thread(
+                    self._cache.put, keyword, bucket, result, extract_references(result)
+                )
+            except sqlite3.Error as e:
+                logging.error(f"Research cache write failed: {e}")
+        return result
+
+
+research_cache = ResearchCache()
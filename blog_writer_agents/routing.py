@@ -0,0 +1,147 @@
+"""Per-turn model and thinking-budget routing.
+
+Short confirmations ("3番でお願いします", "OK") don't need ``gemini-2.5-pro``
+with thinking, so with ``MODEL_ROUTING=true`` each coordinator and editor
+model call is classified as ``simple``, ``standard`` or ``complex`` and sent
+to the model and thinking budget in ``ROUTING_POLICY``. Every decision is
+logged together with the observed model latency and recorded as a ``route``
+span (see ``telemetry``) so the thresholds can be tuned from real traffic.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest, LlmResponse
+from google.genai import types
+
+from .telemetry import telemetry
+
+MODEL_ROUTING = os.getenv("MODEL_ROUTING", "false").lower() == "true"
+ROUTING_FAST_MODEL = os.getenv("ROUTING_FAST_MODEL", "gemini-2.5-flash")
+# これ以下の文字数で、重い作業を示す語を含まない発話を「simple」とみなす
+ROUTING_SHORT_TURN_CHARS = int(os.getenv("ROUTING_SHORT_TURN_CHARS", "40"))
+# これを超える文字数の発話は「complex」とみなす
+ROUTING_LONG_TURN_CHARS = int(os.getenv("ROUTING_LONG_TURN_CHARS", "300"))
+
+# エージェント名 -> 複雑さ -> (モデル, thinking budget)。モデルが None の場合はエージェント既定のまま
+ROUTING_POLICY = {
+    "blog_coordinator": {
+        "simple": (ROUTING_FAST_MODEL, 0),
+        "standard": (ROUTING_FAST_MODEL, 1024),
+        "complex": (None, 1024),
+    },
+    "blog_editor_agent": {
+        "simple": (ROUTING_FAST_MODEL, 1024),
+        "standard": (None, 2048),
+        "complex": (None, 5120),
+    },
+}
+
+# 新しい作業（リサーチや記事作成）を依頼していることを示す語
+COMPLEX_KEYWORDS = ("リサーチ", "調べて", "ブログ記事", "記事を作成", "記事を書いて", "テーマ", "戦略", "ペルソナ")
+# 既存の記事への小さな修正を示す語
+REVISION_KEYWORDS = ("修正", "短く", "長く", "変更", "直して", "言い換え", "タイトル", "見出し", "表現")
+
+_decisions: dict[tuple, tuple[float, dict]] = {}
+_lock = threading.Lock()
+
+
+def _text(content: types.Content) -> str:
+    return "".join(part.text for part in content.parts or [] if part.text)
+
+
+def _has_function_response(content: types.Content) -> bool:
+    return any(part.function_response for part in content.parts or [])
+
+
+def classify_coordinator_turn(contents: list[types.Content]) -> tuple[str, str]:
+    """Return ``(tier, reason)`` for the coordinator's next model call."""
+    if not contents:
+        return "complex", "empty"
+    last = contents[-1]
+    if _has_function_response(last):
+        # ツール結果の要約・提示
+        return "standard", "tool_result"
+    text = _text(last).strip()
+    if any(keyword in text for keyword in COMPLEX_KEYWORDS):
+        return "complex", "keyword"
+    if len(text) > ROUTING_LONG_TURN_CHARS:
+        return "complex", "long_turn"
+    if len(text) <= ROUTING_SHORT_TURN_CHARS:
+        return "simple", "short_turn"
+    return "standard", "default"
+
+
+def classify_editor_turn(contents: list[types.Content]) -> tuple[str, str]:
+    """Return ``(tier, reason)`` from the request handed to the editor."""
+    # AgentTool から渡された依頼文（最初のユーザー発話）で判定する
+    request = next((_text(c) for c in contents if c.role == "user" and _text(c)), "")
+    if any(keyword in request for keyword in REVISION_KEYWORDS) and len(request) <= ROUTING_LONG_TURN_CHARS:
+        return "simple", "revision"
+    if len(request) <= ROUTING_SHORT_TURN_CHARS:
+        return "standard", "short_request"
+    return "complex", "new_article"
+
+
+CLASSIFIERS = {
+    "blog_coordinator": classify_coordinator_turn,
+    "blog_editor_agent": classify_editor_turn,
+}
+
+
+def apply_route(llm_request: LlmRequest, model: Optional[str], thinking_budget: int) -> None:
+    if model:
+        llm_request.model = model
+    config = llm_request.config
+    if config and config.thinking_config:
+        # プランナーの ThinkingConfig はエージェント間で共有されるため、書き換えずに差し替える
+        config.thinking_config = config.thinking_config.model_copy(update={"thinking_budget": thinking_budget})
+
+
+def _key(callback_context: CallbackContext) -> tuple:
+    return (callback_context.invocation_id, callback_context.agent_name)
+
+
+async def route_model_call(
+    callback_context: CallbackContext,
+    llm_request: LlmRequest
+) -> Optional[LlmResponse]:
+    """発話の複雑さに応じてモデルと thinking budget を選ぶ（before_model_callback の先頭に置く）"""
+    agent_name = callback_context.agent_name
+    if not MODEL_ROUTING or agent_name not in ROUTING_POLICY:
+        return None
+    try:
+        tier, reason = CLASSIFIERS[agent_name](llm_request.contents)
+        model, thinking_budget = ROUTING_POLICY[agent_name][tier]
+        apply_route(llm_request, model, thinking_budget)
+        decision = {"tier": tier, "reason": reason, "model": llm_request.model,
+                    "thinking_budget": thinking_budget}
+        logging.info(f"Routing {agent_name}: {decision}")
+        with _lock:
+            _decisions[_key(callback_context)] = (time.perf_counter(), decision)
+    except Exception as e:
+        logging.error(f"Error routing model call: {e}")
+    return None
+
+
+async def record_route_latency(
+    callback_context: CallbackContext,
+    llm_response: LlmResponse
+) -> Optional[LlmResponse]:
+    """ルーティングの判断と実際のレイテンシを記録する（after_model_callback の先頭に置く）"""
+    if llm_response.partial:
+        return None
+    with _lock:
+        started = _decisions.pop(_key(callback_context), None)
+    if started is None:
+        return None
+    start, decision = started
+    latency = time.perf_counter() - start
+    logging.info(f"Routed {callback_context.agent_name} call took {latency:.2f}s: {decision}")
+    telemetry.record("route", decision["tier"], latency, agent=callback_context.agent_name,
+                     invocation_id=callback_context.invocation_id, **decision)
+    return None
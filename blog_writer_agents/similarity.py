@@ -0,0 +1,365 @@
+"""Persistent near-duplicate index over past keywords, ideas and articles.
+
+Every article the coordinator produces (through a tool, a revision or the
+editor it transferred to) is stored with the research keyword (the 「」 term
+of the research request), the chosen idea and the citations of the research
+it was based on, one entry per user and session: a revision or a rerun in
+the same session replaces the entry instead of adding a near-duplicate of
+itself, and lookups only see the articles of the same user. Texts are turned
+into character shingles and MinHash signatures, and signatures are split into
+LSH bands stored in SQLite, so a lookup only compares against the entries
+that share a band bucket instead of scanning every stored article. Keywords
+are also indexed by term, so a short keyword finds articles whose keyword
+shares it.
+Everything runs offline and persists in ``SIMILARITY_INDEX_PATH``.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import sqlite3
+import struct
+import tempfile
+import threading
+import time
+import unicodedata
+from typing import Any, Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.tools import BaseTool, ToolContext
+from google.genai import types
+
+from .research_cache import extract_keyword, extract_references
+from .state_offload import in_tool_call, load_state_value
+
+SIMILARITY_INDEX_ENABLED = os.getenv("SIMILARITY_INDEX_ENABLED", "false").lower() == "true"
+SIMILARITY_INDEX_PATH = os.getenv(
+    "SIMILARITY_INDEX_PATH",
+    os.path.join(tempfile.gettempdir(), "blog_writer_similarity.sqlite3"),
+)
+SIMILARITY_THRESHOLD = float(os.getenv("SIMILARITY_THRESHOLD", "0.5"))
+# 記事本文は先頭のこの文字数だけでシグネチャを作る
+SIMILARITY_ARTICLE_CHARS = int(os.getenv("SIMILARITY_ARTICLE_CHARS", "3000"))
+
+# 索引の形式。変わったら古い索引は作り直す
+SCHEMA_VERSION = 3
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+# 種別ごとのシングル（文字 n-gram）の長さ。短いキーワードやアイデアは 2 文字単位で比べる
+SHINGLE_SIZES = {"keyword": 2, "idea": 2, "article": 3}
+# リサーチを依頼したキーワードを保持するセッション状態のキー
+RESEARCH_REQUEST_STATE_KEY = "research_request"
+ARTICLE_STATE_KEY = "blog_editor_output"
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_rng = random.Random(1)
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME)) for _ in range(NUM_PERM)]
+
+
+def shingles(text: str, size: int) -> set[str]:
+    """Character ``size``-grams of ``text`` with width, case and whitespace folded."""
+    text = "".join(unicodedata.normalize("NFKC", text).lower().split())
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def minhash(items: set[str]) -> tuple[int, ...]:
+    """MinHash signature of ``items`` with ``NUM_PERM`` permutations."""
+    if not items:
+        return (_MAX_HASH,) * NUM_PERM
+    hashes = [int.from_bytes(hashlib.blake2b(item.encode("utf-8"), digest_size=4).digest(), "little")
+              for item in items]
+    return tuple(
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def signature_similarity(a: tuple[int, ...], b: tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+def band_buckets(signature: tuple[int, ...]) -> list[int]:
+    """Hash each LSH band of ``signature`` into a signed 64-bit bucket id."""
+    buckets = []
+    for band in range(BANDS):
+        rows = struct.pack(f"<{ROWS}I", *signature[band * ROWS:(band + 1) * ROWS])
+        buckets.append(int.from_bytes(hashlib.blake2b(rows, digest_size=8).digest(), "little", signed=True))
+    return buckets
+
+
+def _prepare(kind: str, text: str) -> str:
+    if kind == "article":
+        return text[:SIMILARITY_ARTICLE_CHARS]
+    # 依頼文の「」で囲まれた語（なければ正規化した全文）で比べる
+    return extract_keyword(text)
+
+
+def keyword_terms(text: str) -> set[str]:
+    """Whitespace-separated terms of a keyword, e.g. ``{"キャンプ", "初心者"}``."""
+    return set(_prepare("keyword", text).split())
+
+
+class SimilarityIndex:
+    """SQLite-backed MinHash LSH index of generated articles."""
+
+    def __init__(self, path: str = SIMILARITY_INDEX_PATH, threshold: float = SIMILARITY_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return the connection shared by every call; callers hold ``_lock``."""
+        if self._conn is None:
+            # 呼び出しごとに接続を開かず、1 つの接続をロックの下で使い回す
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                # 利用者の分からない古い形式の記事は引き継がない
+                conn.executescript(
+                    "DROP TABLE IF EXISTS articles;"
+                    "DROP TABLE IF EXISTS signatures;"
+                    "DROP TABLE IF EXISTS bands;"
+                    "DROP TABLE IF EXISTS keyword_terms;"
+                    f"PRAGMA user_version = {SCHEMA_VERSION};"
+                )
+            conn.executescript(
+                "CREATE TABLE IF NOT EXISTS articles ("
+                " id INTEGER PRIMARY KEY,"
+                " user_id TEXT NOT NULL,"
+                " session_id TEXT NOT NULL,"
+                " keyword TEXT NOT NULL,"
+                " idea TEXT NOT NULL,"
+                " article TEXT NOT NULL,"
+                " references_json TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " UNIQUE (user_id, session_id));"
+                "CREATE TABLE IF NOT EXISTS signatures ("
+                " article_id INTEGER NOT NULL,"
+                " kind TEXT NOT NULL,"
+                " signature BLOB NOT NULL,"
+                " PRIMARY KEY (article_id, kind));"
+                "CREATE TABLE IF NOT EXISTS bands ("
+                " kind TEXT NOT NULL,"
+                " band INTEGER NOT NULL,"
+                " bucket INTEGER NOT NULL,"
+                " article_id INTEGER NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS bands_lookup ON bands (kind, band, bucket);"
+                "CREATE INDEX IF NOT EXISTS bands_article ON bands (article_id);"
+                # 短いキーワードは文字 n-gram では似ていると判定しにくいため、語の一致でも引く
+                "CREATE TABLE IF NOT EXISTS keyword_terms ("
+                " term TEXT NOT NULL,"
+                " article_id INTEGER NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS keyword_terms_lookup ON keyword_terms (term);"
+                "CREATE INDEX IF NOT EXISTS keyword_terms_article ON keyword_terms (article_id);"
+            )
+            self._conn = conn
+        return self._conn
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def add(self, user_id: str, session_id: str, keyword: str, idea: str, article: str,
+            references: list[dict]) -> int:
+        """Index the article of ``session_id``, replacing the one indexed earlier; returns its id.
+
+        An empty ``keyword`` or ``idea`` keeps the one indexed earlier for the
+        session, so a revision only replaces the article text.
+        """
+        texts = {"keyword": keyword, "idea": idea, "article": article}
+        signatures = {
+            kind: minhash(shingles(_prepare(kind, text), SHINGLE_SIZES[kind]))
+            for kind, text in texts.items() if text
+        }
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, keyword, idea FROM articles WHERE user_id = ? AND session_id = ?", (user_id, session_id)
+            ).fetchone()
+            if row is not None:
+                # 同じセッションの修正版や再実行は、以前の登録を置き換える
+                article_id, keyword, idea = row[0], keyword or row[1], idea or row[2]
+                for kind in signatures:
+                    conn.execute("DELETE FROM signatures WHERE article_id = ? AND kind = ?", (article_id, kind))
+                    conn.execute("DELETE FROM bands WHERE article_id = ? AND kind = ?", (article_id, kind))
+                if "keyword" in signatures:
+                    conn.execute("DELETE FROM keyword_terms WHERE article_id = ?", (article_id,))
+                conn.execute(
+                    "UPDATE articles SET keyword = ?, idea = ?, article = ?, references_json = ?, created_at = ?"
+                    " WHERE id = ?",
+                    (keyword, idea, article, json.dumps(references, ensure_ascii=False), time.time(), article_id),
+                )
+            else:
+                article_id = conn.execute(
+                    "INSERT INTO articles (user_id, session_id, keyword, idea, article, references_json, created_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (user_id, session_id, keyword, idea, article,
+                     json.dumps(references, ensure_ascii=False), time.time()),
+                ).lastrowid
+            for kind, signature in signatures.items():
+                conn.execute(
+                    "INSERT INTO signatures VALUES (?, ?, ?)",
+                    (article_id, kind, struct.pack(f"<{NUM_PERM}I", *signature)),
+                )
+                conn.executemany(
+                    "INSERT INTO bands VALUES (?, ?, ?, ?)",
+                    [(kind, band, bucket, article_id) for band, bucket in enumerate(band_buckets(signature))],
+                )
+            if "keyword" in signatures:
+                conn.executemany(
+                    "INSERT INTO keyword_terms VALUES (?, ?)", [(term, article_id) for term in keyword_terms(keyword)]
+                )
+        return article_id
+
+    def query(self, user_id: str, text: str, kinds: tuple[str, ...] = ("keyword", "idea"), limit: int = 3,
+              exclude_session_id: Optional[str] = None) -> list[dict]:
+        """Articles of ``user_id`` whose ``kinds`` texts are near-duplicates of ``text``.
+
+        ``text`` is normalized like the indexed requests, so a bare keyword
+        (``キャンプ``), a quoted one (``「キャンプ」``) or a full request match
+        alike. Keywords also match on shared terms (``キャンプ 初心者``).
+        ``exclude_session_id`` leaves out the article of the session asking, so
+        it is not reported as a duplicate of itself.
+        """
+        scores: dict[int, tuple[float, str]] = {}
+
+        def consider(article_id: int, similarity: float, kind: str) -> None:
+            if similarity >= self.threshold and similarity > scores.get(article_id, (0.0, ""))[0]:
+                scores[article_id] = (similarity, kind)
+
+        with self._lock, self._connect() as conn:
+            terms = keyword_terms(text) if "keyword" in kinds else set()
+            if terms:
+                rows = conn.execute(
+                    "SELECT DISTINCT articles.id, articles.keyword FROM keyword_terms"
+                    " JOIN articles ON articles.id = keyword_terms.article_id"
+                    f" WHERE keyword_terms.term IN ({', '.join('?' * len(terms))})"
+                    " AND articles.user_id = ? AND articles.session_id IS NOT ?",
+                    (*terms, user_id, exclude_session_id),
+                )
+                for article_id, keyword in rows.fetchall():
+                    stored = keyword_terms(keyword)
+                    consider(article_id, len(terms & stored) / len(terms | stored), "keyword")
+            for kind in kinds:
+                signature = minhash(shingles(_prepare(kind, text), SHINGLE_SIZES[kind]))
+                candidates = set()
+                for band, bucket in enumerate(band_buckets(signature)):
+                    candidates.update(row[0] for row in conn.execute(
+                        "SELECT bands.article_id FROM bands JOIN articles ON articles.id = bands.article_id"
+                        " WHERE bands.kind = ? AND bands.band = ? AND bands.bucket = ?"
+                        " AND articles.user_id = ? AND articles.session_id IS NOT ?",
+                        (kind, band, bucket, user_id, exclude_session_id),
+                    ))
+                for article_id in candidates:
+                    row = conn.execute(
+                        "SELECT signature FROM signatures WHERE article_id = ? AND kind = ?", (article_id, kind)
+                    ).fetchone()
+                    consider(article_id, signature_similarity(signature, struct.unpack(f"<{NUM_PERM}I", row[0])), kind)
+            best = sorted(scores.items(), key=lambda item: item[1][0], reverse=True)[:limit]
+            matches = []
+            for article_id, (similarity, kind) in best:
+                keyword, idea, article, references_json, created_at = conn.execute(
+                    "SELECT keyword, idea, article, references_json, created_at FROM articles WHERE id = ?",
+                    (article_id,),
+                ).fetchone()
+                matches.append({
+                    "article_id": article_id, "similarity": round(similarity, 2), "matched_on": kind,
+                    "keyword": keyword, "idea": idea, "article": article,
+                    "references": json.loads(references_json), "created_at": created_at,
+                })
+        return matches
+
+    def get(self, user_id: str, article_id: int) -> Optional[dict]:
+        """The article ``article_id`` if it belongs to ``user_id``."""
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT keyword, idea, article, references_json, created_at FROM articles"
+                " WHERE id = ? AND user_id = ?",
+                (article_id, user_id),
+            ).fetchone()
+        if row is None:
+            return None
+        keyword, idea, article, references_json, created_at = row
+        return {"article_id": article_id, "keyword": keyword, "idea": idea, "article": article,
+                "references": json.loads(references_json), "created_at": created_at}
+
+    def stats(self) -> dict:
+        with self._lock, self._connect() as conn:
+            articles = conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+        return {"articles": articles, "path": self.path}
+
+
+similarity_index = SimilarityIndex()
+
+
+def _article_from_tool(tool: BaseTool, args: dict, tool_response: Any) -> tuple[str, str]:
+    """Return ``(idea, article)`` produced by an article-writing tool call."""
+    if tool.name == "blog_editor_agent" and isinstance(tool_response, str):
+        return args.get("request", ""), tool_response
+    if tool.name in ("create_article_and_image", "use_draft") and isinstance(tool_response, dict):
+        idea = args.get("article_request") or tool_response.get("idea") or ""
+        return idea, tool_response.get("article") or ""
+    return "", ""
+
+
+async def _index(context: CallbackContext, idea: str, article: Optional[str] = None) -> None:
+    """Index ``article`` (by default the one in session state) of the session of ``context``."""
+    try:
+        if article is None:
+            article = await load_state_value(context, ARTICLE_STATE_KEY)
+        if not article or not isinstance(article, str):
+            return
+        research = await load_state_value(context, "researcher_agent_output") or ""
+        session = context._invocation_context.session
+        await asyncio.to_thread(
+            similarity_index.add, session.user_id, session.id,
+            context.state.get(RESEARCH_REQUEST_STATE_KEY, ""), idea, article, extract_references(research),
+        )
+    except Exception as e:
+        # 索引への登録に失敗しても、記事はできているためターンは失敗させない
+        logging.error(f"Failed to index article: {e}")
+
+
+async def remember_research_request(tool: BaseTool, args: dict, tool_context: ToolContext) -> Optional[dict]:
+    """リサーチを依頼したキーワードを、記事を索引に登録するときのために残す"""
+    if SIMILARITY_INDEX_ENABLED and tool.name == "researcher_agent" and args.get("request"):
+        tool_context.state[RESEARCH_REQUEST_STATE_KEY] = extract_keyword(args["request"])
+    return None
+
+
+async def index_article(tool: BaseTool, args: dict, tool_context: ToolContext,
+                        tool_response: Any) -> Optional[dict]:
+    """作成・修正された記事をキーワード・アイデア・出典とともに類似度索引に登録する"""
+    if not SIMILARITY_INDEX_ENABLED:
+        return None
+    if tool.name == "revise_article":
+        # 修正後の記事は状態（成果物に移されている場合もある）から読む。アイデアは以前の登録のまま
+        if isinstance(tool_response, dict) and tool_response.get("status") == "success":
+            await _index(tool_context, "")
+        return None
+    idea, article = _article_from_tool(tool, args, tool_response)
+    if article:
+        await _index(tool_context, idea, article)
+    return None
+
+
+async def index_agent_output(callback_context: CallbackContext) -> Optional[types.Content]:
+    """委譲されて直接実行された編集者の記事を類似度索引に登録する
+
+    ツールとして呼ばれた場合はコーディネーターの index_article が登録する。
+    """
+    if SIMILARITY_INDEX_ENABLED and not in_tool_call(callback_context):
+        user_content = callback_context.user_content
+        idea = "".join(part.text or "" for part in user_content.parts or []) if user_content else ""
+        await _index(callback_context, idea)
+    return None
@@ -0,0 +1,227 @@
+"""Speculative background drafting of the top research ideas.
+
+With ``SPECULATIVE_DRAFTS=true`` the coordinator starts drafting articles for
+the first ``SPECULATIVE_TOP_K`` ideas as soon as ``researcher_agent``
+returns, while the user is still choosing. When the user picks one of them
+the ``use_draft`` tool returns the finished (or nearly finished) draft; the
+other drafts are cancelled and discarded as soon as a choice is made.
+
+Drafts run on a dedicated event loop thread so they outlive the request that
+started them (``AdkApp`` runs every query in its own short-lived loop), with
+at most ``SPECULATIVE_CONCURRENCY`` running at once. ``SPECULATIVE_MAX_DRAFTS_PER_HOUR``
+caps how many drafts the process may start, bounding the extra model cost.
+Drafts are held in process memory, so on a multi-worker deployment a choice
+handled by another worker simply falls back to the normal editor call.
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Optional
+
+from google.adk.agents import BaseAgent
+from google.adk.memory import InMemoryMemoryService
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.adk.tools import BaseTool, ToolContext
+from google.genai import types
+
+from .sub_agents.blog_editor import blog_editor_agent
+
+SPECULATIVE_DRAFTS = os.getenv("SPECULATIVE_DRAFTS", "false").lower() == "true"
+SPECULATIVE_TOP_K = int(os.getenv("SPECULATIVE_TOP_K", "3"))
+SPECULATIVE_CONCURRENCY = int(os.getenv("SPECULATIVE_CONCURRENCY", "2"))
+SPECULATIVE_MAX_DRAFTS_PER_HOUR = int(os.getenv("SPECULATIVE_MAX_DRAFTS_PER_HOUR", "30"))
+# 選ばれた下書きが生成中の場合に待つ最大秒数
+SPECULATIVE_WAIT_SECONDS = float(os.getenv("SPECULATIVE_WAIT_SECONDS", "120"))
+# 先行生成中のアイデア（番号 -> アイデア）を保持するセッション状態のキー
+SPECULATION_STATE_KEY = "speculative_drafts"
+
+_IDEA_PATTERN = re.compile(r"^\s*(?:[-*]\s*)?(?:\*\*)?(\d{1,2})[.．)）](?:\*\*)?\s*(.+)$")
+_CITATION_PATTERN = re.compile(r"\s*\[\d+\. [^\]]+\]\([^)]*\)")
+
+
+def extract_ideas(text: str, limit: int) -> list[tuple[int, str]]:
+    """Return up to ``limit`` numbered ``(number, idea)`` items from ``text``."""
+    ideas = []
+    seen = set()
+    for line in (text or "").splitlines():
+        match = _IDEA_PATTERN.match(line)
+        if not match:
+            continue
+        number = int(match.group(1))
+        idea = _CITATION_PATTERN.sub("", match.group(2)).replace("**", "").strip()
+        if number in seen or not idea:
+            continue
+        seen.add(number)
+        ideas.append((number, idea))
+        if len(ideas) >= limit:
+            break
+    return ideas
+
+
+def draft_request(idea: str) -> str:
+    return f"次のテーマでブログ記事を作成してください。\n\nテーマ: {idea}"
+
+
+class SpeculativeDrafter:
+    """Runs ``agent`` for candidate ideas in the background, per session."""
+
+    def __init__(self, agent: BaseAgent, concurrency: int = SPECULATIVE_CONCURRENCY,
+                 max_drafts_per_hour: int = SPECULATIVE_MAX_DRAFTS_PER_HOUR, max_sessions: int = 256):
+        self.agent = agent
+        self.concurrency = concurrency
+        self.max_drafts_per_hour = max_drafts_per_hour
+        self.max_sessions = max_sessions
+        self.started = 0
+        self.used = 0
+        self.cancelled = 0
+        self.capped = 0
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._launches: deque = deque()
+        self._drafts: OrderedDict[str, dict[int, concurrent.futures.Future]] = OrderedDict()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._semaphore = asyncio.Semaphore(self.concurrency)
+                threading.Thread(target=self._loop.run_forever, daemon=True, name="speculative-drafts").start()
+            return self._loop
+
+    def _reserve(self) -> bool:
+        """Count a draft against the hourly cap; False once the cap is reached."""
+        now = time.monotonic()
+        while self._launches and now - self._launches[0] > 3600:
+            self._launches.popleft()
+        if len(self._launches) >= self.max_drafts_per_hour:
+            self.capped += 1
+            return False
+        self._launches.append(now)
+        return True
+
+    async def _draft(self, idea: str, state: dict) -> str:
+        async with self._semaphore:
+            runner = Runner(
+                app_name=self.agent.name,
+                agent=self.agent,
+                session_service=InMemorySessionService(),
+                memory_service=InMemoryMemoryService(),
+            )
+            session = await runner.session_service.create_session(
+                app_name=self.agent.name, user_id="speculative", state=state
+            )
+            last_event = None
+            async for event in runner.run_async(
+                user_id=session.user_id,
+                session_id=session.id,
+                new_message=types.Content(role="user", parts=[types.Part.from_text(text=draft_request(idea))]),
+            ):
+                last_event = event
+            if not last_event or not last_event.content or not last_event.content.parts:
+                return ""
+            return "\n".join(part.text for part in last_event.content.parts if part.text)
+
+    def start(self, session_id: str, ideas: list[tuple[int, str]], state: dict) -> dict[int, str]:
+        """Start drafting ``ideas`` for ``session_id``; returns the ideas started."""
+        self.cancel(session_id)
+        loop = self._ensure_loop()
+        started = {}
+        with self._lock:
+            drafts = {}
+            for number, idea in ideas:
+                if not self._reserve():
+                    logging.info("Speculative draft cap reached; skipping remaining ideas")
+                    break
+                drafts[number] = asyncio.run_coroutine_threadsafe(self._draft(idea, dict(state)), loop)
+                started[number] = idea
+                self.started += 1
+            if drafts:
+                self._drafts[session_id] = drafts
+                while len(self._drafts) > self.max_sessions:
+                    _, stale = self._drafts.popitem(last=False)
+                    self._cancel_futures(stale.values())
+        return started
+
+    def _cancel_futures(self, futures) -> None:
+        for future in futures:
+            if future.cancel():
+                self.cancelled += 1
+
+    def cancel(self, session_id: str) -> None:
+        """Cancel and discard every draft of ``session_id``."""
+        with self._lock:
+            drafts = self._drafts.pop(session_id, {})
+        self._cancel_futures(drafts.values())
+
+    async def take(self, session_id: str, number: int, timeout: float = SPECULATIVE_WAIT_SECONDS) -> Optional[str]:
+        """Return the draft for idea ``number`` and cancel the others."""
+        with self._lock:
+            drafts = self._drafts.pop(session_id, {})
+        future = drafts.pop(number, None)
+        self._cancel_futures(drafts.values())
+        if future is None:
+            return None
+        try:
+            article = await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            future.cancel()
+            return None
+        except (asyncio.CancelledError, concurrent.futures.CancelledError):
+            # 下書き側が取り消された場合のみ握りつぶし、このツール自体の取り消しは伝播させる
+            if future.cancelled():
+                return None
+            raise
+        except Exception as e:
+            logging.error(f"Speculative draft failed: {e}")
+            return None
+        if article:
+            self.used += 1
+        return article or None
+
+    def pending(self, session_id: str) -> list[int]:
+        with self._lock:
+            return sorted(self._drafts.get(session_id, {}))
+
+    def stats(self) -> dict:
+        return {"started": self.started, "used": self.used, "cancelled": self.cancelled,
+                "capped": self.capped, "sessions": len(self._drafts)}
+
+
+speculative_drafter = SpeculativeDrafter(blog_editor_agent)
+
+# 記事作成がこれらのツールで始まった場合は、先行生成した下書きを破棄する
+_EDITOR_TOOL_NAMES = ("blog_editor_agent", "create_article_and_image", "transfer_to_agent")
+
+
+async def cancel_speculation_on_choice(tool: BaseTool, args: dict, tool_context: ToolContext) -> Optional[dict]:
+    """記事作成が通常の経路で始まったら、未使用の下書きを取り消す"""
+    if SPECULATIVE_DRAFTS and tool.name in _EDITOR_TOOL_NAMES and tool_context.state.get(SPECULATION_STATE_KEY):
+        speculative_drafter.cancel(tool_context._invocation_context.session.id)
+        tool_context.state[SPECULATION_STATE_KEY] = {}
+    return None
+
+
+async def start_speculation(tool: BaseTool, args: dict, tool_context: ToolContext,
+                            tool_response: Any) -> Optional[dict]:
+    """リサーチ結果が返ったら、上位のアイデアの記事を先行して生成し始める"""
+    if not SPECULATIVE_DRAFTS or tool.name != "researcher_agent" or not isinstance(tool_response, str):
+        return None
+    try:
+        ideas = extract_ideas(tool_response, SPECULATIVE_TOP_K)
+        if ideas:
+            started = speculative_drafter.start(
+                tool_context._invocation_context.session.id, ideas, tool_context.state.to_dict()
+            )
+            tool_context.state[SPECULATION_STATE_KEY] = {str(number): idea for number, idea in started.items()}
+            logging.info(f"Started speculative drafts for ideas {sorted(started)}")
+    except Exception as e:
+        logging.error(f"Error starting speculative drafts: {e}")
+    return None
@@ -0,0 +1,189 @@
+"""Moves large session-state values into versioned artifacts.
+
+With ``STATE_OFFLOAD_ENABLED=true``, string values larger than
+``STATE_OFFLOAD_MIN_BYTES`` written to session state (the researcher's idea
+list, the editor's article, ...) are saved as an artifact
+``state_{key}.md`` and the state keeps only a small handle::
+
+    {"$artifact": "state_blog_editor_output.md", "version": 3, "id": "9f0c...", "bytes": 18234, "preview": "..."}
+
+Values are offloaded by the coordinator's ``after_tool_callback`` once a tool
+or an ``AgentTool`` has written them, so the text an ``AgentTool`` returns to
+the coordinator is left untouched. Agents that also run on their own (the
+editor after ``transfer_to_agent``, the sectioned editor) offload their
+output in ``offload_agent_output``, which does nothing inside a tool call.
+
+Session reads and writes therefore stay small however many drafts a session
+produces. ``load_state_value`` and ``load_session_value`` resolve a handle
+back into the text on first use and keep recently loaded values in memory.
+Use a shared artifact store (``ARTIFACT_BUCKET``) when deployed, since the
+handles outlive the worker that wrote them.
+"""
+
+import logging
+import os
+import uuid
+from typing import Any, Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.tools import BaseTool, ToolContext
+from google.genai import types
+
+from .thumbnails import ThumbnailCache
+
+STATE_OFFLOAD_ENABLED = os.getenv("STATE_OFFLOAD_ENABLED", "false").lower() == "true"
+STATE_OFFLOAD_MIN_BYTES = int(os.getenv("STATE_OFFLOAD_MIN_BYTES", "4096"))
+STATE_OFFLOAD_CACHE_BYTES = int(os.getenv("STATE_OFFLOAD_CACHE_BYTES", str(16 * 1024 * 1024)))
+
+HANDLE_KEY = "$artifact"
+PREVIEW_CHARS = 200
+# app: / user: はセッションをまたぐため、temp: は保存されないため対象外
+_SKIPPED_PREFIXES = ("app:", "user:", "temp:")
+# ツール呼び出しの中（AgentTool のサブエージェントを含む）であることを示す状態。
+# temp: のためセッションには保存されない。同じ呼び出しの後続のエージェントからは
+# 見えるため、ツールの終了時に戻す
+TOOL_CALL_STATE_KEY = "temp:in_tool_call"
+
+# 読み込んだ値のキャッシュ（バージョンごとに内容は不変）
+_loaded = ThumbnailCache(max_bytes=STATE_OFFLOAD_CACHE_BYTES)
+
+
+def artifact_filename(key: str) -> str:
+    return f"state_{key}.md"
+
+
+def is_handle(value: Any) -> bool:
+    return isinstance(value, dict) and HANDLE_KEY in value
+
+
+def should_offload(key: str, value: Any, min_bytes: int = STATE_OFFLOAD_MIN_BYTES) -> bool:
+    return (
+        isinstance(value, str)
+        and not key.startswith(_SKIPPED_PREFIXES)
+        and len(value.encode("utf-8")) > min_bytes
+    )
+
+
+async def _save_handle(context: CallbackContext, key: str, value: str) -> dict:
+    filename = artifact_filename(key)
+    data = value.encode("utf-8")
+    version = await context.save_artifact(filename, types.Part.from_bytes(data=data, mime_type="text/markdown"))
+    handle = {
+        HANDLE_KEY: filename,
+        "version": version,
+        # 読み込んだ値のキャッシュのキー（セッションをまたいで一意）
+        "id": uuid.uuid4().hex,
+        "bytes": len(data),
+        "preview": value[:PREVIEW_CHARS],
+    }
+    # 書いた本人がすぐ読み直しても成果物を読み込まずに済むようにする
+    _loaded.put((handle["id"], filename, version), value)
+    return handle
+
+
+def in_tool_call(context: CallbackContext) -> bool:
+    """Whether ``context`` runs inside a tool call, e.g. an agent called through ``AgentTool``."""
+    return bool(context.state.get(TOOL_CALL_STATE_KEY))
+
+
+async def offload_state(context: CallbackContext, keys=None) -> list[str]:
+    """Replace large state values with artifact handles.
+
+    ``keys`` defaults to the values written by the tool call of ``context``
+    (a ``ToolContext``).
+    """
+    offloaded = []
+    for key in list(keys if keys is not None else context.actions.state_delta):
+        value = context.state.get(key)
+        if not should_offload(key, value):
+            continue
+        context.state[key] = await _save_handle(context, key, value)
+        offloaded.append(key)
+    if offloaded:
+        logging.info(f"Offloaded state to artifacts: {offloaded}")
+    return offloaded
+
+
+async def _resolve(value: Any, load) -> Any:
+    if not is_handle(value):
+        return value
+    key = (value.get("id"), value[HANDLE_KEY], value["version"])
+    cached = _loaded.get(key) if key[0] else None
+    if cached is not None:
+        return cached
+    artifact = await load(value[HANDLE_KEY], value["version"])
+    if not artifact or not artifact.inline_data:
+        logging.error(f"Offloaded state artifact is missing: {value[HANDLE_KEY]} v{value['version']}")
+        return value.get("preview", "")
+    text = artifact.inline_data.data.decode("utf-8")
+    if key[0]:
+        _loaded.put(key, text)
+    return text
+
+
+async def load_state_value(context: CallbackContext, key: str, default: Any = None) -> Any:
+    """``context.state.get(key)``, loading the artifact if the value was offloaded."""
+    return await _resolve(
+        context.state.get(key, default),
+        lambda filename, version: context.load_artifact(filename, version=version),
+    )
+
+
+async def save_state_value(context: CallbackContext, key: str, value: Any) -> None:
+    """``context.state[key] = value``, saving the value as an artifact if it is large.
+
+    The counterpart of ``load_state_value`` for tools that write a large value
+    themselves, such as a revised article.
+    """
+    if STATE_OFFLOAD_ENABLED and should_offload(key, value):
+        value = await _save_handle(context, key, value)
+    context.state[key] = value
+
+
+async def load_session_value(artifact_service, session, key: str, default: Any = None) -> Any:
+    """Read ``key`` from a fetched ``Session``, loading offloaded values."""
+    return await _resolve(
+        session.state.get(key, default),
+        lambda filename, version: artifact_service.load_artifact(
+            app_name=session.app_name, user_id=session.user_id, session_id=session.id,
+            filename=filename, version=version,
+        ),
+    )
+
+
+async def offload_tool_state(tool: BaseTool, args: dict, tool_context: ToolContext,
+                             tool_response: Any) -> Optional[dict]:
+    """ツールが書き込んだ大きな状態（サブエージェントの出力など）を成果物に移す"""
+    if STATE_OFFLOAD_ENABLED:
+        try:
+            await offload_state(tool_context)
+        except Exception as e:
+            logging.error(f"Error offloading state: {e}")
+    return None
+
+
+async def mark_tool_call(tool: BaseTool, args: dict, tool_context: ToolContext) -> Optional[dict]:
+    """ツール（AgentTool のサブエージェントを含む）の中で実行されていることを状態に記録する"""
+    tool_context.state[TOOL_CALL_STATE_KEY] = True
+    return None
+
+
+async def end_tool_call(tool: BaseTool, args: dict, tool_context: ToolContext,
+                        tool_response: Any) -> Optional[dict]:
+    """ツール呼び出しの終了を記録する（after_tool_callback の最後に置く）"""
+    tool_context.state[TOOL_CALL_STATE_KEY] = False
+    return None
+
+
+async def offload_agent_output(callback_context: CallbackContext) -> Optional[types.Content]:
+    """委譲されて直接実行されたエージェントが書き込んだ大きな状態を成果物に移す
+
+    AgentTool として呼ばれた場合は、最後のイベントが出力のまま返るよう何もしない
+    （コーディネーターの offload_tool_state が移す）。
+    """
+    if STATE_OFFLOAD_ENABLED and not in_tool_call(callback_context):
+        try:
+            await offload_state(callback_context, keys=list(callback_context.state.to_dict()))
+        except Exception as e:
+            logging.error(f"Error offloading agent output: {e}")
+    return None
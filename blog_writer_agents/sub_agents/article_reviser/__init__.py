@@ -0,0 +1,5 @@
+"""Exports for the article reviser sub-agents."""
+
+from .agent import revision_planner_agent, section_rewriter_agent
+
+__all__ = ["revision_planner_agent", "section_rewriter_agent"]
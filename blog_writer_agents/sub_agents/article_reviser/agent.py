@@ -0,0 +1,56 @@
+"""revision_planner_agent / section_rewriter_agent: section-level edits of an existing article"""
+
+from google.adk import Agent
+from google.adk.planners import BuiltInPlanner
+from google.genai import types
+from pydantic import BaseModel, Field
+
+from . import prompt
+from ...gateway import gateway_llm
+from ...telemetry import end_model_span, start_model_span
+
+PLANNER_MODEL = "gemini-2.5-flash"
+REWRITER_MODEL = "gemini-2.5-pro"
+
+
+class SectionEdit(BaseModel):
+    section_id: int = Field(description="書き換えるセクションの番号")
+    directive: str = Field(description="そのセクションの具体的な修正指示")
+
+
+class RevisionPlan(BaseModel):
+    edits: list[SectionEdit] = Field(description="書き換えるセクションと修正指示の一覧")
+
+
+revision_planner_agent = Agent(
+    model=gateway_llm(PLANNER_MODEL),
+    name="revision_planner_agent",
+    description="記事の修正依頼から、書き換えるセクションと修正指示を決めます。",
+    planner=BuiltInPlanner(
+        thinking_config=types.ThinkingConfig(
+            thinking_budget=0,
+        )
+    ),
+    instruction=prompt.REVISION_PLANNER_PROMPT,
+    output_schema=RevisionPlan,
+    disallow_transfer_to_parent=True,
+    disallow_transfer_to_peers=True,
+    before_model_callback=[start_model_span],
+    after_model_callback=[end_model_span],
+)
+
+section_rewriter_agent = Agent(
+    model=gateway_llm(REWRITER_MODEL),
+    name="section_rewriter_agent",
+    description="記事の 1 セクションを修正指示に従って書き換えます。",
+    planner=BuiltInPlanner(
+        thinking_config=types.ThinkingConfig(
+            thinking_budget=1024,
+        )
+    ),
+    instruction=prompt.SECTION_REWRITER_PROMPT,
+    disallow_transfer_to_parent=True,
+    disallow_transfer_to_peers=True,
+    before_model_callback=[start_model_span],
+    after_model_callback=[end_model_span],
+)
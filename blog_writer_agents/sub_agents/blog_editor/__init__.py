@@ -1,5 +1,10 @@
 """Exports for the blog editor sub-agent."""
 
 from .agent import blog_editor_agent
+from .sectioned import SECTIONED_EDITOR, build_sectioned_editor
+
+if SECTIONED_EDITOR:
+    # 構成案を作ってから見出しごとに並行して書く編集者に置き換える
+    blog_editor_agent = build_sectioned_editor(blog_editor_agent)
 
 __all__ = ["blog_editor_agent"]
@@ -6,11 +6,16 @@ from google.adk.planners import BuiltInPlanner
 from google.genai import types
 
 from . import prompt
+from ...gateway import gateway_llm
+from ...routing import record_route_latency, route_model_call
+from ...similarity import index_agent_output
+from ...state_offload import offload_agent_output
+from ...telemetry import end_model_span, start_model_span
 
 MODEL = "gemini-2.5-pro"
 
 blog_editor_agent = Agent(
-    model=MODEL,
+    model=gateway_llm(MODEL),
     name="blog_editor_agent",
     planner=BuiltInPlanner(
         thinking_config=types.ThinkingConfig(
@@ -20,4 +25,11 @@ blog_editor_agent = Agent(
     instruction=prompt.BLOG_CREATE_PROMPT,
     output_key="blog_editor_output",
     tools=[google_search],
+    # サブエージェントとして委譲された場合も、記事を出力したら次のターンはルートに戻す
+    disallow_transfer_to_parent=True,
+    disallow_transfer_to_peers=True,
+    before_model_callback=[route_model_call, start_model_span],
+    after_model_callback=[record_route_latency, end_model_span],
+    # transfer_to_agent で委譲された場合（AgentTool の中では何もしない）
+    after_agent_callback=[index_agent_output, offload_agent_output],
 )
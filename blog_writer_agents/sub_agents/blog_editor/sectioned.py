@@ -0,0 +1,219 @@
+"""Sectioned blog editor: outline first, then the sections written concurrently.
+
+With ``SECTIONED_EDITOR=true`` the package exports this agent as
+``blog_editor_agent``. ``article_outline_agent`` produces the title, a style
+brief shared by every writer, the headings with a key point each and the
+direction of the CTA. The sections and the introduction/CTA are then written
+at the same time, at most ``SECTIONED_EDITOR_CONCURRENCY`` at once, and merged
+in outline order. Article latency becomes roughly one outline call plus the
+slowest section instead of growing with the length of the article.
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import os
+from typing import AsyncGenerator, Optional
+
+from google.adk.agents import BaseAgent, LlmAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event, EventActions
+from google.adk.planners import BuiltInPlanner
+from google.adk.tools import google_search
+from google.genai import types
+from pydantic import BaseModel, Field
+
+from . import prompt
+from .agent import MODEL
+from ...gateway import gateway_llm
+from ...similarity import index_agent_output
+from ...state_offload import offload_agent_output
+from ...telemetry import end_model_span, start_model_span
+
+SECTIONED_EDITOR = os.getenv("SECTIONED_EDITOR", "false").lower() == "true"
+SECTIONED_EDITOR_CONCURRENCY = int(os.getenv("SECTIONED_EDITOR_CONCURRENCY", "4"))
+SECTIONED_EDITOR_MAX_SECTIONS = int(os.getenv("SECTIONED_EDITOR_MAX_SECTIONS", "8"))
+# 構成案（見出しごとの位置の特定に使う）を保持するセッション状態のキー
+OUTLINE_STATE_KEY = "blog_editor_outline"
+
+
+class OutlineSection(BaseModel):
+    heading: str = Field(description="見出し")
+    key_point: str = Field(description="この見出しで伝える要点")
+
+
+class ArticleOutline(BaseModel):
+    title: str = Field(description="SEOを意識した記事のタイトル")
+    style_brief: str = Field(description="全ライターが共有する文体の指示")
+    sections: list[OutlineSection] = Field(description="記事の流れに沿った見出しの一覧")
+    cta: str = Field(description="読者に行動を促すCTAの方向性")
+
+
+class ArticleFrame(BaseModel):
+    introduction: str = Field(description="タイトルの直後に置く導入文")
+    call_to_action: str = Field(description="記事の最後に置くCTAを含む締めくくり")
+
+
+def _model_callbacks() -> dict:
+    return {
+        "before_model_callback": [start_model_span],
+        "after_model_callback": [end_model_span],
+    }
+
+
+article_outline_agent = LlmAgent(
+    model=gateway_llm(MODEL),
+    name="article_outline_agent",
+    planner=BuiltInPlanner(thinking_config=types.ThinkingConfig(thinking_budget=2048)),
+    instruction=prompt.OUTLINE_PROMPT.format(max_sections=SECTIONED_EDITOR_MAX_SECTIONS),
+    output_schema=ArticleOutline,
+    disallow_transfer_to_parent=True,
+    disallow_transfer_to_peers=True,
+    **_model_callbacks(),
+)
+
+# 見出しごとに構成案を埋め込んだ指示でコピーして使う
+article_section_writer = LlmAgent(
+    model=gateway_llm(MODEL),
+    name="article_section_writer",
+    planner=BuiltInPlanner(thinking_config=types.ThinkingConfig(thinking_budget=1024)),
+    instruction="",
+    tools=[google_search],
+    include_contents="none",
+    disallow_transfer_to_parent=True,
+    disallow_transfer_to_peers=True,
+    **_model_callbacks(),
+)
+
+article_frame_writer = LlmAgent(
+    model=gateway_llm(MODEL),
+    name="article_frame_writer",
+    planner=BuiltInPlanner(thinking_config=types.ThinkingConfig(thinking_budget=512)),
+    instruction="",
+    output_schema=ArticleFrame,
+    include_contents="none",
+    disallow_transfer_to_parent=True,
+    disallow_transfer_to_peers=True,
+    **_model_callbacks(),
+)
+
+
+def _outline_text(outline: ArticleOutline) -> str:
+    return "\n".join(f"{i}. {s.heading}: {s.key_point}" for i, s in enumerate(outline.sections, start=1))
+
+
+def _with_instruction(agent: LlmAgent, name: str, instruction: str) -> LlmAgent:
+    # 構成案に含まれる波括弧がセッション状態の参照として展開されないよう、関数で指示を渡す
+    return agent.model_copy(update={"name": name, "instruction": lambda _: instruction})
+
+
+def _strip_heading(text: str, heading: str) -> str:
+    """Drop a leading heading line the writer may have repeated."""
+    lines = text.strip().splitlines()
+    if lines and lines[0].lstrip().startswith("#") and heading in lines[0]:
+        lines = lines[1:]
+    return "\n".join(lines).strip()
+
+
+def merge_article(outline: ArticleOutline, frame: Optional[ArticleFrame], sections: list[str]) -> str:
+    """Assemble the article in outline order."""
+    parts = [f"# {outline.title}"]
+    if frame and frame.introduction:
+        parts.append(frame.introduction.strip())
+    for section, body in zip(outline.sections, sections):
+        parts.append(f"## {section.heading}\n\n{_strip_heading(body, section.heading)}")
+    if frame and frame.call_to_action:
+        parts.append(frame.call_to_action.strip())
+    return "\n\n".join(parts)
+
+
+def _final_text(events: list[Event]) -> str:
+    for event in reversed(events):
+        if event.content and event.content.parts and not event.partial:
+            text = "".join(part.text for part in event.content.parts if part.text and not part.thought)
+            if text:
+                return text
+    return ""
+
+
+class SectionedEditorAgent(BaseAgent):
+    """Writes the article from an outline with the sections generated concurrently."""
+
+    outline_agent: LlmAgent
+    section_writer: LlmAgent
+    frame_writer: LlmAgent
+    fallback_agent: BaseAgent
+    output_key: str = "blog_editor_output"
+    concurrency: int = SECTIONED_EDITOR_CONCURRENCY
+
+    async def _collect(self, agent: LlmAgent, ctx: InvocationContext,
+                       semaphore: Optional[asyncio.Semaphore] = None) -> str:
+        """Run ``agent`` to completion and return its final text.
+
+        Intermediate events are not forwarded; the merged article is the only
+        event this agent emits.
+        """
+        async with semaphore or contextlib.nullcontext():
+            return _final_text([event async for event in agent.run_async(ctx)])
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        try:
+            outline = ArticleOutline.model_validate_json(await self._collect(self.outline_agent, ctx))
+        except ValueError as e:
+            logging.error(f"Invalid article outline: {e}")
+            outline = None
+        if outline is None or not outline.sections:
+            # 構成案を作れなかった場合は 1 回の生成で記事全体を書く
+            async for event in self.fallback_agent.run_async(ctx):
+                yield event
+            return
+        outline.sections = outline.sections[:SECTIONED_EDITOR_MAX_SECTIONS]
+
+        outline_text = _outline_text(outline)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        frame_writer = _with_instruction(self.frame_writer, self.frame_writer.name, prompt.FRAME_PROMPT.format(
+            title=outline.title, style_brief=outline.style_brief, outline=outline_text, cta=outline.cta,
+        ))
+        section_writers = [
+            _with_instruction(self.section_writer, f"{self.section_writer.name}_{i}", prompt.SECTION_PROMPT.format(
+                title=outline.title, style_brief=outline.style_brief, outline=outline_text,
+                number=i, heading=section.heading, key_point=section.key_point,
+            ))
+            for i, section in enumerate(outline.sections, start=1)
+        ]
+        # 導入と CTA は構成案だけで書けるため、本文と同時に書く
+        frame_text, *sections = await asyncio.gather(
+            self._collect(frame_writer, ctx, semaphore),
+            *(self._collect(writer, ctx, semaphore) for writer in section_writers),
+        )
+        try:
+            frame = ArticleFrame.model_validate_json(frame_text)
+        except ValueError as e:
+            logging.error(f"Invalid introduction/CTA: {e}")
+            frame = None
+
+        article = merge_article(outline, frame, sections)
+        yield Event(
+            invocation_id=ctx.invocation_id,
+            author=self.name,
+            branch=ctx.branch,
+            content=types.Content(role="model", parts=[types.Part.from_text(text=article)]),
+            actions=EventActions(state_delta={
+                self.output_key: article,
+                OUTLINE_STATE_KEY: json.loads(outline.model_dump_json()),
+            }),
+        )
+
+
+def build_sectioned_editor(fallback_agent: BaseAgent) -> SectionedEditorAgent:
+    return SectionedEditorAgent(
+        name=fallback_agent.name,
+        description=fallback_agent.description,
+        outline_agent=article_outline_agent,
+        section_writer=article_section_writer,
+        frame_writer=article_frame_writer,
+        # 単一生成の編集者は構成案を作れなかった場合の代替として使う
+        fallback_agent=fallback_agent,
+        after_agent_callback=[index_agent_output, offload_agent_output],
+    )
@@ -10,11 +10,16 @@ from google.genai import types
 from typing import Optional
 
 from . import prompt
+from .citations import inject_citations
+from ...gateway import gateway_llm
+from ...state_offload import offload_agent_output
+from ...telemetry import end_model_span, start_model_span, traced_callback
 
 logging.basicConfig(level=logging.INFO, force=True)
 MODEL = "gemini-2.5-flash"
 
 
+@traced_callback
 def grounding_metadata_callback(
     callback_context: CallbackContext, llm_response: LlmResponse
 ) -> Optional[LlmResponse]:
@@ -45,34 +50,8 @@ def grounding_metadata_callback(
 
             logging.info(f"[Callback] grounding_chunks: {grounding_chunks}")
 
-            references = {}
-            for i, chunk in enumerate(grounding_chunks):
-                web = getattr(chunk, 'web', None)
-                if web:
-                    uri = getattr(web, 'uri', None)
-                    title = getattr(web, 'title', None)
-                    if uri and title:
-                        references[uri] = {"index": i + 1, "title": title, "uri": uri}
-
-            modified_text = ""
-            for line in original_text.split("\n"):
-                modified_line = line
-                if hasattr(llm_response.grounding_metadata, 'grounding_supports'):
-                    for support in llm_response.grounding_metadata.grounding_supports:
-                        segment = getattr(support, 'segment', None)
-                        segment_text = getattr(segment, 'text', None)
-                        if segment_text and segment_text in line:
-                            for chunk_index in support.grounding_chunk_indices:
-                                chunk = grounding_chunks[chunk_index]
-                                web = getattr(chunk, 'web', None)
-                                if web:
-                                    uri = getattr(web, 'uri', None)
-                                    if uri in references:
-                                        ref = references[uri]
-                                        # 表示例: [1. Wikipedia](https://example.com)
-                                        ref_tag = f"[{ref['index']}. {ref['title']}]({ref['uri']})"
-                                        modified_line = modified_line.replace(segment_text, f"{segment_text} {ref_tag}")
-                modified_text += f"{modified_line}\n"
+            grounding_supports = getattr(grounding_metadata, 'grounding_supports', None) or []
+            modified_text = inject_citations(original_text, grounding_supports, grounding_chunks)
 
             modified_parts[0].text = modified_text
 
@@ -104,7 +83,7 @@ def grounding_metadata_callback(
 
 
 researcher_agent = Agent(
-    model=MODEL,
+    model=gateway_llm(MODEL),
     planner=BuiltInPlanner(
         thinking_config=types.ThinkingConfig(
             thinking_budget=1024,
@@ -114,5 +93,8 @@ researcher_agent = Agent(
     instruction=prompt.RESEARCHER_PROMPT,
     output_key="researcher_agent_output",
     tools=[google_search],
-    after_model_callback=grounding_metadata_callback,
+    before_model_callback=[start_model_span],
+    after_model_callback=[end_model_span, grounding_metadata_callback],
+    # ワークフローなどで直接実行された場合（AgentTool の中では何もしない）
+    after_agent_callback=offload_agent_output,
 )
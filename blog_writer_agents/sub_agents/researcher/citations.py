@@ -0,0 +1,94 @@
+"""Offset-based citation injection for grounded researcher responses."""
+
+from typing import Optional
+
+
+def build_reference_tags(grounding_chunks: list) -> list[Optional[str]]:
+    """Precompute the citation tag for each grounding chunk index.
+
+    Chunks sharing a URI share the same reference number, matching the
+    numbering the researcher has always shown (the last chunk wins).
+    """
+    references = {}
+    for i, chunk in enumerate(grounding_chunks):
+        web = getattr(chunk, 'web', None)
+        if web:
+            uri = getattr(web, 'uri', None)
+            title = getattr(web, 'title', None)
+            if uri and title:
+                references[uri] = {"index": i + 1, "title": title, "uri": uri}
+
+    tags: list[Optional[str]] = []
+    for chunk in grounding_chunks:
+        web = getattr(chunk, 'web', None)
+        uri = getattr(web, 'uri', None) if web else None
+        ref = references.get(uri)
+        # 表示例: [1. Wikipedia](https://example.com)
+        tags.append(f"[{ref['index']}. {ref['title']}]({ref['uri']})" if ref else None)
+    return tags
+
+
+def _segment_end(data: bytes, segment, part_index: int) -> Optional[int]:
+    """Return the UTF-8 byte offset right after ``segment`` in ``data``."""
+    if (getattr(segment, 'part_index', None) or 0) != part_index:
+        return None
+    segment_text = getattr(segment, 'text', None)
+    segment_bytes = segment_text.encode('utf-8') if segment_text else b""
+    start = getattr(segment, 'start_index', None) or 0
+    end = getattr(segment, 'end_index', None)
+
+    if end is not None and 0 <= start <= end <= len(data):
+        if not segment_bytes or data[start:end] == segment_bytes:
+            return end
+    # オフセットが欠落・不一致の場合はテキスト検索にフォールバック
+    if segment_bytes:
+        found = data.find(segment_bytes)
+        if found >= 0:
+            return found + len(segment_bytes)
+    return None
+
+
+def inject_citations(
+    text: str,
+    grounding_supports: list,
+    grounding_chunks: list,
+    part_index: int = 0,
+) -> str:
+    """Insert reference tags after each grounded segment in a single pass.
+
+    Segment offsets are UTF-8 byte offsets as returned by the Gemini API.
+    Each segment is tagged once, and a chunk is cited at most once per
+    insertion point.
+    """
+    if not text or not grounding_supports:
+        return text
+
+    data = text.encode('utf-8')
+    tags = build_reference_tags(grounding_chunks)
+
+    insertions: dict[int, list[str]] = {}
+    for support in grounding_supports:
+        segment = getattr(support, 'segment', None)
+        if segment is None:
+            continue
+        end = _segment_end(data, segment, part_index)
+        if end is None:
+            continue
+        pending = insertions.setdefault(end, [])
+        for chunk_index in getattr(support, 'grounding_chunk_indices', None) or []:
+            if 0 <= chunk_index < len(tags):
+                tag = tags[chunk_index]
+                if tag and tag not in pending:
+                    pending.append(tag)
+
+    pieces = []
+    cursor = 0
+    for offset in sorted(insertions):
+        if not insertions[offset]:
+            continue
+        pieces.append(data[cursor:offset])
+        pieces.append((" " + " ".join(insertions[offset])).encode('utf-8'))
+        cursor = offset
+    pieces.append(data[cursor:])
+    # マルチバイト文字の途中にオフセットが来た場合でも壊れないようにする
+    return b"".join(pieces).decode('utf-8', errors='replace')
@@ -0,0 +1,362 @@
+"""Per-step timing spans and metrics for the coordinator, sub-agents and tools.
+
+Spans are recorded for every model call (with token counts, thinking budget
+and payload sizes), every tool call (``AgentTool`` sub-agents,
+``generate_image`` ...) and every model callback. They are aggregated into
+Prometheus metrics and can be exported as:
+
+* JSON lines appended to ``TELEMETRY_JSONL_PATH``
+* a Prometheus text endpoint on ``TELEMETRY_PROMETHEUS_PORT``
+* structured INFO log lines (``TELEMETRY_LOG_SPANS=true``) on the
+  ``blog_writer_agents.telemetry`` logger, which end up in Cloud Logging when
+  running on Agent Engine
+
+Model calls that raise are recorded with ``status="error"`` by ``GatewayLlm``;
+other spans that are never finished (e.g. a tool that raised) are dropped
+after ``TELEMETRY_OPEN_SPAN_TTL_SECONDS``.
+"""
+
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest, LlmResponse
+from google.adk.tools import BaseTool, ToolContext
+from google.genai import types
+
+TELEMETRY_ENABLED = os.getenv("TELEMETRY_ENABLED", "true").lower() == "true"
+TELEMETRY_JSONL_PATH = os.getenv("TELEMETRY_JSONL_PATH")
+TELEMETRY_PROMETHEUS_PORT = os.getenv("TELEMETRY_PROMETHEUS_PORT")
+TELEMETRY_LOG_SPANS = os.getenv("TELEMETRY_LOG_SPANS", "false").lower() == "true"
+TELEMETRY_OPEN_SPAN_TTL_SECONDS = float(os.getenv("TELEMETRY_OPEN_SPAN_TTL_SECONDS", "600"))
+
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _payload_size(value: Any) -> int:
+    """Approximate size of a request, response or tool payload.
+
+    Sums string and ``bytes`` lengths instead of serializing the payload, so a
+    long history with inline images costs a walk over its parts rather than a
+    JSON dump on every model call.
+    """
+    if value is None:
+        return 0
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(len(str(key)) + _payload_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(_payload_size(item) for item in value)
+    if isinstance(value, types.Content):
+        return sum(_part_size(part) for part in value.parts or ())
+    if isinstance(value, (int, float, bool)):
+        return len(str(value))
+    return 0
+
+
+def _part_size(part: types.Part) -> int:
+    size = len(part.text or "")
+    if part.inline_data and part.inline_data.data:
+        size += len(part.inline_data.data)
+    if part.function_call:
+        size += _payload_size(part.function_call.args)
+    if part.function_response:
+        size += _payload_size(part.function_response.response)
+    return size
+
+
+def _span_logger() -> logging.Logger:
+    """Logger for span lines, emitting at INFO even when the root logger is at WARNING."""
+    logger = logging.getLogger("blog_writer_agents.telemetry")
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Telemetry:
+    """Collects spans, aggregates metrics and exports them."""
+
+    def __init__(self, jsonl_path: Optional[str] = TELEMETRY_JSONL_PATH,
+                 log_spans: bool = TELEMETRY_LOG_SPANS, keep_recent: int = 1000,
+                 open_span_ttl: float = TELEMETRY_OPEN_SPAN_TTL_SECONDS):
+        self.jsonl_path = jsonl_path
+        self.log_spans = log_spans
+        self.open_span_ttl = open_span_ttl
+        self._logger = _span_logger() if log_spans else None
+        self.recent: deque = deque(maxlen=keep_recent)
+        self._lock = threading.Lock()
+        self._open: dict[tuple, tuple[float, dict]] = {}
+        self._histograms: dict[tuple, list] = {}
+        self._counters: dict[tuple, float] = defaultdict(float)
+
+    # --- spans ---
+
+    def start(self, key: tuple, **attrs) -> None:
+        now = time.perf_counter()
+        with self._lock:
+            # 例外で終了しなかったスパンが残り続けないよう、古いものを捨てる
+            expired = [k for k, (started, _) in self._open.items() if now - started > self.open_span_ttl]
+            for k in expired:
+                del self._open[k]
+            self._open[key] = (now, attrs)
+        if expired:
+            logging.debug(f"Dropped {len(expired)} unfinished telemetry spans")
+
+    def finish(self, key: tuple, kind: str, name: str, **attrs) -> Optional[dict]:
+        with self._lock:
+            started = self._open.pop(key, None)
+        if started is None:
+            return None
+        start, start_attrs = started
+        return self.record(kind, name, time.perf_counter() - start, **start_attrs, **attrs)
+
+    def fail(self, key: tuple, kind: str, name: str, error: BaseException, **attrs) -> Optional[dict]:
+        """Finish the span ``key`` of a call that raised ``error``."""
+        return self.finish(key, kind, name, status="error", error=type(error).__name__, **attrs)
+
+    def record(self, kind: str, name: str, duration: float, **attrs) -> dict:
+        span = {"ts": time.time(), "kind": kind, "name": name,
+                "duration_ms": round(duration * 1000, 3), **attrs}
+        labels = (("kind", kind), ("name", name), ("agent", attrs.get("agent", "")))
+        with self._lock:
+            self.recent.append(span)
+            histogram = self._histograms.setdefault(labels, [0] * len(DURATION_BUCKETS) + [0, 0.0])
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    histogram[i] += 1
+            histogram[-2] += 1
+            histogram[-1] += duration
+            for token_type in ("prompt", "output", "thoughts"):
+                tokens = attrs.get(f"{token_type}_tokens")
+                if tokens:
+                    self._counters[("blog_writer_tokens_total", labels + (("type", token_type),))] += tokens
+            for direction in ("request", "response"):
+                size = attrs.get(f"{direction}_bytes")
+                if size:
+                    self._counters[("blog_writer_payload_bytes_total", labels + (("direction", direction),))] += size
+        self._export(span)
+        return span
+
+    @contextmanager
+    def span(self, kind: str, name: str, **attrs):
+        """Time the ``with`` block; attributes can be added to the yielded dict."""
+        start = time.perf_counter()
+        try:
+            yield attrs
+        finally:
+            if TELEMETRY_ENABLED:
+                self.record(kind, name, time.perf_counter() - start, **attrs)
+
+    def _export(self, span: dict) -> None:
+        line = json.dumps(span, ensure_ascii=False, default=str)
+        if self._logger:
+            self._logger.info(f"telemetry_span {line}")
+        if self.jsonl_path:
+            try:
+                with self._lock, open(self.jsonl_path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+            except OSError as e:
+                logging.error(f"Failed to write telemetry span: {e}")
+
+    # --- Prometheus ---
+
+    def prometheus_text(self) -> str:
+        lines = [
+            "# HELP blog_writer_span_duration_seconds Duration of agent steps.",
+            "# TYPE blog_writer_span_duration_seconds histogram",
+        ]
+        with self._lock:
+            histograms = {k: list(v) for k, v in self._histograms.items()}
+            counters = dict(self._counters)
+        for labels, values in sorted(histograms.items()):
+            base = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+            for bound, count in zip(DURATION_BUCKETS, values):
+                lines.append(f'blog_writer_span_duration_seconds_bucket{{{base},le="{bound}"}} {count}')
+            lines.append(f'blog_writer_span_duration_seconds_bucket{{{base},le="+Inf"}} {values[-2]}')
+            lines.append(f"blog_writer_span_duration_seconds_count{{{base}}} {values[-2]}")
+            lines.append(f"blog_writer_span_duration_seconds_sum{{{base}}} {values[-1]:.6f}")
+        for metric, help_text in (("blog_writer_tokens_total", "Tokens used by model calls."),
+                                  ("blog_writer_payload_bytes_total", "Serialized payload sizes.")):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for (name, labels), value in sorted(counters.items()):
+                if name == metric:
+                    label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+                    lines.append(f"{metric}{{{label_text}}} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def serve_prometheus(self, port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+        """Serve ``/metrics`` in a daemon thread."""
+        telemetry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                body = telemetry.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True, name="telemetry-metrics").start()
+        return server
+
+
+telemetry = Telemetry()
+
+if TELEMETRY_ENABLED and TELEMETRY_PROMETHEUS_PORT:
+    try:
+        telemetry.serve_prometheus(int(TELEMETRY_PROMETHEUS_PORT))
+    except OSError as e:
+        logging.error(f"Failed to start Prometheus endpoint: {e}")
+
+
+def _context_attrs(callback_context) -> dict:
+    ctx = callback_context._invocation_context
+    return {"agent": callback_context.agent_name,
+            "invocation_id": callback_context.invocation_id,
+            "session_id": ctx.session.id}
+
+
+def traced_callback(func):
+    """Record a ``callback`` span for every call of an ADK model callback."""
+    if not TELEMETRY_ENABLED:
+        return func
+
+    def _record(callback_context, start: float) -> None:
+        telemetry.record("callback", func.__name__, time.perf_counter() - start,
+                         **_context_attrs(callback_context))
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def wrapper(callback_context, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(callback_context, *args, **kwargs)
+            finally:
+                _record(callback_context, start)
+    else:
+        @functools.wraps(func)
+        def wrapper(callback_context, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(callback_context, *args, **kwargs)
+            finally:
+                _record(callback_context, start)
+    return wrapper
+
+
+def _model_key(callback_context: CallbackContext) -> tuple:
+    return ("model", callback_context.invocation_id, callback_context.agent_name)
+
+
+# before_model_callback とモデル呼び出しは同じタスクで実行されるため、失敗時に閉じるスパンをここで受け渡す
+_current_model_span: contextvars.ContextVar[Optional[tuple[tuple, dict]]] = contextvars.ContextVar(
+    "current_model_span", default=None
+)
+# 同じく、モデルを呼び出している利用者とセッションを GatewayLlm に渡す
+_current_call_scope: contextvars.ContextVar[Optional[tuple[str, str]]] = contextvars.ContextVar(
+    "current_call_scope", default=None
+)
+
+
+def current_call_scope() -> Optional[tuple[str, str]]:
+    """``(user_id, session_id)`` of the model call being made, set by ``start_model_span``."""
+    return _current_call_scope.get()
+
+
+async def start_model_span(
+    callback_context: CallbackContext,
+    llm_request: LlmRequest
+) -> Optional[LlmResponse]:
+    """モデル呼び出しの計測を開始する（before_model_callback の最後に置く）"""
+    ctx = callback_context._invocation_context
+    _current_call_scope.set((ctx.user_id, ctx.session.id))
+    if TELEMETRY_ENABLED:
+        config = llm_request.config
+        thinking = getattr(config, "thinking_config", None) if config else None
+        key = _model_key(callback_context)
+        _current_model_span.set((key, _context_attrs(callback_context)))
+        telemetry.start(
+            key,
+            model=llm_request.model,
+            thinking_budget=getattr(thinking, "thinking_budget", None),
+            request_bytes=_payload_size(llm_request.contents),
+            request_contents=len(llm_request.contents),
+        )
+    return None
+
+
+async def end_model_span(
+    callback_context: CallbackContext,
+    llm_response: LlmResponse
+) -> Optional[LlmResponse]:
+    """モデル呼び出しの計測を終了する（after_model_callback の最初に置く）"""
+    if TELEMETRY_ENABLED and not llm_response.partial:
+        usage = llm_response.usage_metadata
+        telemetry.finish(
+            _model_key(callback_context), "model", "generate_content",
+            **_context_attrs(callback_context),
+            prompt_tokens=getattr(usage, "prompt_token_count", None),
+            output_tokens=getattr(usage, "candidates_token_count", None),
+            thoughts_tokens=getattr(usage, "thoughts_token_count", None),
+            response_bytes=_payload_size(llm_response.content),
+        )
+    return None
+
+
+def fail_model_span(error: BaseException) -> None:
+    """Record the current model call as failed; called by ``GatewayLlm`` when the call raises."""
+    current = _current_model_span.get()
+    if TELEMETRY_ENABLED and current:
+        key, attrs = current
+        telemetry.fail(key, "model", "generate_content", error, **attrs)
+
+
+def _tool_key(tool_context: ToolContext, tool: BaseTool) -> tuple:
+    return ("tool", tool_context.invocation_id, tool_context.function_call_id or tool.name)
+
+
+async def start_tool_span(tool: BaseTool, args: dict, tool_context: ToolContext) -> Optional[dict]:
+    """ツール呼び出し（AgentTool や generate_image）の計測を開始する"""
+    if TELEMETRY_ENABLED:
+        telemetry.start(_tool_key(tool_context, tool), request_bytes=_payload_size(args))
+    return None
+
+
+async def end_tool_span(tool: BaseTool, args: dict, tool_context: ToolContext,
+                        tool_response: Any) -> Optional[dict]:
+    """ツール呼び出しの計測を終了する"""
+    if TELEMETRY_ENABLED:
+        telemetry.finish(
+            _tool_key(tool_context, tool), "tool", tool.name,
+            **_context_attrs(tool_context),
+            response_bytes=_payload_size(tool_response),
+        )
+    return None
@@ -0,0 +1,179 @@
+"""Image renditions, thumbnail encoding and a bounded LRU cache for thumbnails."""
+
+import base64
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+THUMBNAIL_WIDTH = 500
+THUMBNAIL_QUALITY = 70
+OG_IMAGE_SIZE = (1200, 630)
+OG_IMAGE_QUALITY = 85
+WEBP_QUALITY = 80
+# 縮小時に reduce で先に縮める比率（Pillow の reducing_gap）
+REDUCING_GAP = 2.0
+THUMBNAIL_CACHE_MAX_BYTES = int(
+    os.getenv("THUMBNAIL_CACHE_MAX_BYTES", str(32 * 1024 * 1024))
+)
+
+# 生成時に作成して配信に使うレンディション: 種別 -> (ファイル名の接尾辞, MIME タイプ)
+RENDITIONS = {
+    "thumb": (".thumb.jpg", "image/jpeg"),
+    "webp": (".webp", "image/webp"),
+    "og": (".og.jpg", "image/jpeg"),
+}
+
+
+def artifact_name(image_file_name: str, candidate: Optional[int] = None,
+                  rendition: Optional[str] = None) -> str:
+    """Return the artifact filename for a candidate and/or rendition.
+
+    ``artifact_name("image.png", 2, "thumb")`` is ``image_2.thumb.jpg``;
+    without a candidate the name refers to the selected image.
+    """
+    stem, ext = os.path.splitext(image_file_name)
+    if candidate is not None:
+        stem = f"{stem}_{candidate}"
+    if rendition:
+        return stem + RENDITIONS[rendition][0]
+    return stem + ext
+
+
+def _thumbnail_jpeg(img: "Image.Image") -> bytes:
+    # reducing_gap を指定すると、まず整数倍の縮小（reduce）で荒く縮めてから補間する
+    img = img.resize((THUMBNAIL_WIDTH, int(img.height * (THUMBNAIL_WIDTH / img.width))),
+                     reducing_gap=REDUCING_GAP)
+    return _jpeg_bytes(img)
+
+
+def _jpeg_bytes(img: "Image.Image", quality: int = THUMBNAIL_QUALITY) -> bytes:
+    jpg_buffer = BytesIO()
+    img.save(jpg_buffer, 'JPEG', quality=quality)
+    return jpg_buffer.getvalue()
+
+
+def render_renditions(image_bytes: bytes) -> dict[str, bytes]:
+    """Decode an image once and encode every rendition in ``RENDITIONS``."""
+    # Pillow は画像を扱うときだけ読み込む
+    from PIL import Image
+
+    img = Image.open(BytesIO(image_bytes)).convert('RGB')
+    renditions = {"thumb": _thumbnail_jpeg(img)}
+
+    webp_buffer = BytesIO()
+    img.save(webp_buffer, 'WEBP', quality=WEBP_QUALITY)
+    renditions["webp"] = webp_buffer.getvalue()
+
+    # OGP 画像は 1200x630 に中央を切り抜く
+    og_width, og_height = OG_IMAGE_SIZE
+    scale = max(og_width / img.width, og_height / img.height)
+    resized = img.resize((round(img.width * scale), round(img.height * scale)), reducing_gap=REDUCING_GAP)
+    left = (resized.width - og_width) // 2
+    top = (resized.height - og_height) // 2
+    og_buffer = BytesIO()
+    resized.crop((left, top, left + og_width, top + og_height)).save(
+        og_buffer, 'JPEG', quality=OG_IMAGE_QUALITY
+    )
+    renditions["og"] = og_buffer.getvalue()
+    return renditions
+
+
+def to_data_uri(data: bytes, mime_type: str = "image/jpeg") -> str:
+    return f'data:{mime_type};base64,{base64.b64encode(data).decode("utf-8")}'
+
+
+def encode_thumbnail(image_bytes: bytes) -> str:
+    """Convert an image to a 500px JPEG and return it as a data URI.
+
+    JPEG sources are decoded at reduced scale via ``Image.draft``; other
+    formats are shrunk with ``reduce`` before the colour conversion, so the
+    full-size image is converted only when it is already small.
+    """
+    from PIL import Image
+
+    img = Image.open(BytesIO(image_bytes))
+    # JPEG はデコード時に 1/2〜1/8 に縮小して読み込む（他の形式では何もしない）
+    img.draft('RGB', (THUMBNAIL_WIDTH, THUMBNAIL_WIDTH * img.height // img.width))
+    if img.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+        # パレット画像などはそのままでは補間できないため先に変換する
+        img = img.convert('RGB')
+    factor = int(img.width // (THUMBNAIL_WIDTH * REDUCING_GAP))
+    if factor > 1:
+        img = img.reduce(factor)
+    img = img.resize((THUMBNAIL_WIDTH, int(img.height * (THUMBNAIL_WIDTH / img.width))))
+    return to_data_uri(_jpeg_bytes(img.convert('RGB')))
+
+
+def content_hash(image_bytes: bytes) -> str:
+    """Return a stable cache key component for artifacts without a version."""
+    return "sha256:" + hashlib.sha256(image_bytes).hexdigest()
+
+
+class ThumbnailCache:
+    """LRU cache of encoded thumbnails bounded by total encoded size.
+
+    Keys are ``(session_id, filename, version)`` tuples, where ``version`` is
+    the artifact version number or a content hash when no version is known.
+    """
+
+    def __init__(self, max_bytes: int = THUMBNAIL_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size = 0
+        self._entries: "OrderedDict[tuple, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[str]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: tuple, value: str) -> None:
+        size = len(value)
+        if size > self.max_bytes:
+            logging.warning(f"Thumbnail for {key} exceeds cache cap ({size} bytes), not cached.")
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = value
+            self._size += size
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+            }
+
+
+thumbnail_cache = ThumbnailCache()
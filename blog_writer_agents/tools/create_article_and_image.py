@@ -0,0 +1,46 @@
+import asyncio
+import logging
+
+from google.adk.tools import ToolContext
+from google.adk.tools.agent_tool import AgentTool
+
+from ..sub_agents.blog_editor import blog_editor_agent
+from .generate_image import generate_image
+
+_editor_tool = AgentTool(agent=blog_editor_agent)
+
+
+async def create_article_and_image(article_request: str, image_prompt: str, tool_context: ToolContext):
+    """Writes the blog article and generates its eye-catch images in parallel.
+
+    Args:
+        article_request: The chosen theme and the direction for the article,
+            passed to the blog editor.
+        image_prompt: An English Imagen prompt based on the chosen theme and
+            brand image. It must not depend on the finished article.
+    """
+    # 画像はテーマとブランドだけで決まるため、記事の完成を待たずに同時に生成する
+    article, image = await asyncio.gather(
+        _editor_tool.run_async(args={"request": article_request}, tool_context=tool_context),
+        generate_image(image_prompt, tool_context),
+        return_exceptions=True,
+    )
+    result = {}
+    if isinstance(article, BaseException):
+        logging.error(f"Article generation failed: {article}")
+        result["article_error"] = str(article)
+        article = None
+    if isinstance(image, BaseException):
+        logging.error(f"Image generation failed: {image}")
+        image = {"status": "failed", "detail": str(image)}
+    if image.get("status") != "success":
+        # 記事だけ完成した場合は partial とし、画像の失敗理由を返して画像だけ作り直せるようにする
+        result["image_error"] = image.get("detail") or "Image generation failed."
+
+    if not article:
+        status = "failed"
+    elif "image_error" in result:
+        status = "partial"
+    else:
+        status = "success"
+    return {"status": status, "article": article, "image": image, **result}
@@ -1,38 +1,120 @@
+import asyncio
 import os
 
-from dotenv import load_dotenv
 from google.adk.tools import ToolContext
-from google.genai import Client, types
+from google.genai import types
+
+from ..genai_client import get_client
+from ..gateway import gateway, is_retryable
+from ..telemetry import telemetry
+from ..thumbnails import RENDITIONS, artifact_name, render_renditions
+from ..transcode import transcode, transcode_executor
+
+MODEL_IMAGE = "imagen-3.0-generate-002"
+IMAGE_CANDIDATES = int(os.getenv("IMAGE_CANDIDATES", "3"))
+
+# 選択中の候補番号を保持するセッション状態のキー
+SELECTED_CANDIDATE_STATE_KEY = "selected_image_candidate"
+
+
+async def _save_image(tool_context: ToolContext, image_name: str, candidate,
+                      image_bytes: bytes, renditions: dict[str, bytes]) -> None:
+    """Save the PNG and its renditions under the names for ``candidate``."""
+    saves = [tool_context.save_artifact(
+        artifact_name(image_name, candidate),
+        types.Part.from_bytes(data=image_bytes, mime_type="image/png"),
+    )]
+    for rendition, data in renditions.items():
+        saves.append(tool_context.save_artifact(
+            artifact_name(image_name, candidate, rendition),
+            types.Part.from_bytes(data=data, mime_type=RENDITIONS[rendition][1]),
+        ))
+    await asyncio.gather(*saves)
 
 
 async def generate_image(prompt: str, tool_context: ToolContext):
-    """Generates an image based on the prompt."""
-    MODEL_IMAGE = "imagen-3.0-generate-002"
-
-    load_dotenv()
-
-    # Only Vertex AI supports image generation for now.
-    client = Client(
-        vertexai=True,
-        project=os.getenv("GOOGLE_CLOUD_PROJECT"),
-        location=os.getenv("GOOGLE_CLOUD_LOCATION"),
-    )
-
-    response = client.models.generate_images(
-        model=MODEL_IMAGE,
-        prompt=prompt,
-        config={"number_of_images": 1},
-    )
+    """Generates candidate images based on the prompt.
+
+    Every candidate is stored as its own artifact together with a thumbnail,
+    WebP and OG-image rendition. Candidate 1 is selected; use `select_image`
+    to switch to another candidate without generating again.
+    """
+    client = get_client()
+    # Imagen の応答を待つ間に変換用のワーカーを起動しておく
+    transcode_executor.prestart()
+
+    # Use the async API so the Imagen round-trip doesn't block the event loop.
+    # The gateway rate-limits and retries quota errors, and concurrent calls
+    # with the same prompt share one request.
+    with telemetry.span("step", "imagen_generate", agent=tool_context.agent_name, model=MODEL_IMAGE,
+                        request_bytes=len(prompt.encode("utf-8"))) as span:
+        try:
+            response = await gateway.call(
+                MODEL_IMAGE,
+                lambda: client.aio.models.generate_images(
+                    model=MODEL_IMAGE,
+                    prompt=prompt,
+                    config={"number_of_images": IMAGE_CANDIDATES},
+                ),
+                key=("generate_images", MODEL_IMAGE, prompt, IMAGE_CANDIDATES),
+            )
+        except Exception as e:
+            if not is_retryable(e):
+                raise
+            return {"status": "failed", "detail": f"Imagen quota is exhausted; try again later. ({e})"}
+        span["images"] = len(response.generated_images or [])
     if not response.generated_images:
         return {"status": "failed"}
-    image_bytes = response.generated_images[0].image.image_bytes
     image_name = os.getenv("IMAGE_FILE_NAME", "image.png")
-    await tool_context.save_artifact(
-        image_name,
-        types.Part.from_bytes(data=image_bytes, mime_type="image/png"),
-    )
+
+    images = [generated.image.image_bytes for generated in response.generated_images]
+    with telemetry.span("step", "render_renditions", agent=tool_context.agent_name,
+                        request_bytes=sum(len(data) for data in images)) as span:
+        renditions = await asyncio.gather(*(transcode(render_renditions, data) for data in images))
+        span["response_bytes"] = sum(len(data) for r in renditions for data in r.values())
+
+    with telemetry.span("step", "save_artifacts", agent=tool_context.agent_name):
+        await asyncio.gather(
+            *(_save_image(tool_context, image_name, i, image_bytes, image_renditions)
+              for i, (image_bytes, image_renditions) in enumerate(zip(images, renditions), start=1)),
+            _save_image(tool_context, image_name, None, images[0], renditions[0]),
+        )
+    candidates = [
+        {"candidate": i, "filename": artifact_name(image_name, i)}
+        for i in range(1, len(images) + 1)
+    ]
+    tool_context.state[SELECTED_CANDIDATE_STATE_KEY] = 1
+
+    return {
+        "status": "success",
+        "detail": (
+            f"{len(candidates)} candidate images generated and stored in artifacts. "
+            "Candidate 1 is selected; call select_image to choose another one."
+        ),
+        "filename": image_name,
+        "candidates": candidates,
+    }
+
+
+async def select_image(candidate: int, tool_context: ToolContext):
+    """Selects one of the candidate images from the last generate_image call."""
+    image_name = os.getenv("IMAGE_FILE_NAME", "image.png")
+    image = await tool_context.load_artifact(artifact_name(image_name, candidate))
+    if not image:
+        return {"status": "failed", "detail": f"Candidate {candidate} does not exist."}
+
+    names = {rendition: artifact_name(image_name, candidate, rendition) for rendition in RENDITIONS}
+    loaded = await asyncio.gather(*(tool_context.load_artifact(name) for name in names.values()))
+    renditions = {
+        rendition: part.inline_data.data
+        for rendition, part in zip(names, loaded) if part and part.inline_data
+    }
+    if len(renditions) < len(RENDITIONS):
+        renditions = await transcode(render_renditions, image.inline_data.data)
+    await _save_image(tool_context, image_name, None, image.inline_data.data, renditions)
+    tool_context.state[SELECTED_CANDIDATE_STATE_KEY] = candidate
     return {
         "status": "success",
-        "detail": "Image generated successfully and stored in artifacts.",
+        "detail": f"Candidate {candidate} is now the selected image.",
         "filename": image_name,
     }
@@ -2,9 +2,15 @@ import datetime
 import pytz
 from google.adk.tools import ToolContext
 
+JST = pytz.timezone("Asia/Tokyo")
+
+
+def now_jst() -> datetime.datetime:
+    """Return the current time in JST."""
+    return datetime.datetime.now(JST)
+
 
 async def get_current_datetime(_: str, tool_context: ToolContext):
     """Return the current date and time in JST."""
-    jst = pytz.timezone("Asia/Tokyo")
-    now = datetime.datetime.now(jst).strftime("%Y-%m-%d %H:%M:%S")
+    now = now_jst().strftime("%Y-%m-%d %H:%M:%S")
     return {"current_datetime": now}
@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import re
+from dataclasses import dataclass
+
+from google.adk.tools import ToolContext
+from google.adk.tools.agent_tool import AgentTool
+
+from ..state_offload import load_state_value, save_state_value
+from ..sub_agents.article_reviser import revision_planner_agent, section_rewriter_agent
+from ..sub_agents.blog_editor.sectioned import OUTLINE_STATE_KEY
+
+ARTICLE_STATE_KEY = "blog_editor_output"
+PREVIEW_CHARS = 80
+
+_HEADING = re.compile(r"^#{1,2}\s")
+_FENCE = re.compile(r"^\s*(```|~~~)")
+
+_planner_tool = AgentTool(agent=revision_planner_agent)
+_rewriter_tool = AgentTool(agent=section_rewriter_agent)
+
+
+@dataclass
+class Section:
+    heading: str
+    text: str
+
+
+def split_sections(article: str) -> list[Section]:
+    """Split an article at its level-1/2 headings outside code fences.
+
+    Section 0 holds the title and the introduction (everything before the
+    first ``##``), so joining the texts with blank lines restores the article.
+    """
+    sections: list[list[str]] = [[]]
+    in_fence = False
+    for line in article.strip().splitlines():
+        if _FENCE.match(line):
+            in_fence = not in_fence
+        elif not in_fence and line.startswith("## ") and any(s.strip() for s in sections[-1]):
+            sections.append([])
+        sections[-1].append(line)
+    result = []
+    for lines in sections:
+        text = "\n".join(lines).strip()
+        heading = next((line.lstrip("#").strip() for line in lines if _HEADING.match(line)), "")
+        result.append(Section(heading=heading, text=text))
+    return result
+
+
+def join_sections(sections: list[Section]) -> str:
+    return "\n\n".join(section.text for section in sections if section.text)
+
+
+def section_map(sections: list[Section]) -> str:
+    """A compact list of the sections for the planner instead of the full article."""
+    lines = []
+    for i, section in enumerate(sections):
+        body = " ".join(line for line in section.text.splitlines() if not _HEADING.match(line)).strip()
+        lines.append(f"{i}. 見出し: {section.heading or '（なし）'} / 抜粋: {body[:PREVIEW_CHARS]} / {len(section.text)} 文字")
+    return "\n".join(lines)
+
+
+async def revise_article(instruction: str, tool_context: ToolContext):
+    """Applies a revision request to the current article by rewriting only the affected sections.
+
+    Use this instead of the blog editor when the user asks to change part of
+    an article that has already been written (e.g. shorten the introduction,
+    change the CTA, rewrite one heading). Only the rewritten sections are
+    returned.
+
+    Args:
+        instruction: The user's revision request, in their own words.
+    """
+    article = await load_state_value(tool_context, ARTICLE_STATE_KEY)
+    if not article:
+        return {"status": "failed", "detail": "There is no article to revise; write one with the blog editor first."}
+    sections = split_sections(article)
+
+    # 記事の全文ではなく、見出しと抜粋の一覧だけで書き換える場所を決める
+    request = f"# 修正依頼\n{instruction}\n\n# セクション一覧\n{section_map(sections)}"
+    plan = await _planner_tool.run_async(args={"request": request}, tool_context=tool_context)
+    edits = {}
+    for edit in plan.get("edits", []) if isinstance(plan, dict) else []:
+        if 0 <= edit["section_id"] < len(sections):
+            # 同じセクションへの複数の指示はまとめて 1 回で書き換える
+            edits[edit["section_id"]] = "\n".join(filter(None, [edits.get(edit["section_id"]), edit["directive"]]))
+    if not edits:
+        return {"status": "no_change", "detail": "No section needs to change for this request."}
+
+    # 分割生成した記事の場合は、同じ文体の指示で書き換える
+    outline = tool_context.state.get(OUTLINE_STATE_KEY) or {}
+    style = f"\n\n# 文体の指示\n{outline['style_brief']}" if outline.get("style_brief") else ""
+    # 書き換えるセクションだけをモデルに渡し、並行して書き換える
+    rewritten = await asyncio.gather(*(
+        _rewriter_tool.run_async(args={"request": (
+            f"# 修正指示\n{directive}\n\n# 元の依頼\n{instruction}{style}\n\n# セクション\n{sections[section_id].text}"
+        )}, tool_context=tool_context)
+        for section_id, directive in edits.items()
+    ))
+    changes = []
+    for section_id, text in zip(edits, rewritten):
+        if not text or not text.strip():
+            logging.error(f"Section rewrite returned no text for section {section_id}")
+            continue
+        sections[section_id] = Section(heading=split_sections(text)[0].heading or sections[section_id].heading,
+                                       text=text.strip())
+        changes.append({"section_id": section_id, "heading": sections[section_id].heading, "text": text.strip()})
+    if not changes:
+        return {"status": "failed", "detail": "The sections could not be rewritten."}
+
+    revised = join_sections(sections)
+    await save_state_value(tool_context, ARTICLE_STATE_KEY, revised)
+    logging.info(
+        f"Revised sections {[c['section_id'] for c in changes]}: "
+        f"{sum(len(c['text']) for c in changes)} of {len(revised)} chars regenerated"
+    )
+    return {
+        "status": "success",
+        "changes": changes,
+        "unchanged_sections": len(sections) - len(changes),
+        "article_chars": len(revised),
+    }
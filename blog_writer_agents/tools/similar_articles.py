@@ -0,0 +1,51 @@
+import asyncio
+
+from google.adk.tools import ToolContext
+
+from ..similarity import similarity_index
+
+EXCERPT_CHARS = 200
+
+
+async def find_similar_articles(query: str, tool_context: ToolContext):
+    """Finds previously written articles whose keyword or idea is a near-duplicate of the query.
+
+    Args:
+        query: The keyword or theme the user asked for.
+    """
+    session = tool_context._invocation_context.session
+    matches = await asyncio.to_thread(
+        similarity_index.query, session.user_id, query, exclude_session_id=session.id
+    )
+    return {
+        "status": "success",
+        "matches": [
+            {
+                "article_id": match["article_id"],
+                "similarity": match["similarity"],
+                "keyword": match["keyword"],
+                "idea": match["idea"],
+                "excerpt": match["article"][:EXCERPT_CHARS],
+                "references": match["references"],
+            }
+            for match in matches
+        ],
+    }
+
+
+async def reuse_article(article_id: int, tool_context: ToolContext):
+    """Loads a previously written article so it can be shown or revised instead of starting over."""
+    match = await asyncio.to_thread(
+        similarity_index.get, tool_context._invocation_context.session.user_id, article_id
+    )
+    if not match:
+        return {"status": "failed", "detail": f"Article {article_id} does not exist."}
+
+    # ブログ編集者が書いた場合と同じキーに保存し、以降の修正の起点にする
+    tool_context.state["blog_editor_output"] = match["article"]
+    return {
+        "status": "success",
+        "idea": match["idea"],
+        "article": match["article"],
+        "references": match["references"],
+    }
@@ -0,0 +1,21 @@
+from google.adk.tools import ToolContext
+
+from ..speculation import SPECULATION_STATE_KEY, speculative_drafter
+
+
+async def use_draft(idea_number: int, tool_context: ToolContext):
+    """Returns the article drafted in advance for the chosen research idea.
+
+    Call this first when the user picks an idea by number. If the status is
+    `not_available`, write the article with the blog editor as usual.
+    """
+    drafts = tool_context.state.get(SPECULATION_STATE_KEY) or {}
+    idea = drafts.get(str(idea_number))
+    tool_context.state[SPECULATION_STATE_KEY] = {}
+    article = await speculative_drafter.take(tool_context._invocation_context.session.id, idea_number)
+    if not idea or not article:
+        return {"status": "not_available"}
+
+    # ブログ編集者が書いた場合と同じキーに保存する
+    tool_context.state["blog_editor_output"] = article
+    return {"status": "success", "idea": idea, "article": article}
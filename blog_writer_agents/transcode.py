@@ -0,0 +1,183 @@
+"""Runs Pillow transcoding off the agent event loop.
+
+Decoding and re-encoding images is CPU-bound and holds the GIL for most of
+its duration, so running it inline in an ``async`` callback (or even on a
+thread) stalls every other session served by the same worker. ``transcode``
+submits the work to a shared process pool instead (``TRANSCODE_EXECUTOR=process``,
+the default), falling back to a thread pool when processes are unavailable.
+
+At most ``TRANSCODE_MAX_PENDING`` jobs are submitted at once; further callers
+wait for a free slot without blocking their event loop, so a burst of image
+turns queues here rather than piling decoded images up in the workers.
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional, TypeVar
+
+TRANSCODE_EXECUTOR = os.getenv("TRANSCODE_EXECUTOR", "process")
+TRANSCODE_WORKERS = int(os.getenv("TRANSCODE_WORKERS", str(min(4, os.cpu_count() or 1))))
+TRANSCODE_MAX_PENDING = int(os.getenv("TRANSCODE_MAX_PENDING", str(TRANSCODE_WORKERS * 4)))
+
+T = TypeVar("T")
+
+
+def _ready() -> bool:
+    # ワーカーの起動時に Pillow を読み込んでおく
+    import PIL.Image  # noqa: F401
+
+    return True
+
+
+class TranscodeExecutor:
+    """Bounded process (or thread) pool shared by every event loop in the process."""
+
+    def __init__(self, kind: str = TRANSCODE_EXECUTOR, workers: int = TRANSCODE_WORKERS,
+                 max_pending: int = TRANSCODE_MAX_PENDING):
+        if kind not in ("process", "thread"):
+            raise ValueError(f"Unknown TRANSCODE_EXECUTOR: {kind!r}")
+        self.kind = kind
+        self.workers = workers
+        self.max_pending = max_pending
+        self.submitted = 0
+        self.queued = 0
+        self.max_queue_wait = 0.0
+        self._pending = 0
+        # 空きを待っている呼び出し元。AdkApp はクエリごとにイベントループが異なるため
+        # asyncio.Semaphore ではなく concurrent.futures.Future で起こす
+        self._waiters: deque[concurrent.futures.Future] = deque()
+        self._lock = threading.Lock()
+        self._executor: Optional[concurrent.futures.Executor] = None
+        self._prestarted = False
+
+    def _get_executor(self) -> concurrent.futures.Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.kind == "process":
+                    try:
+                        # ワーカースレッドを持つプロセスを fork しないよう spawn で起動する
+                        self._executor = concurrent.futures.ProcessPoolExecutor(
+                            max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                        )
+                    except (OSError, NotImplementedError, ImportError) as e:
+                        logging.warning(f"Process pool unavailable ({e}); transcoding on threads")
+                        self.kind = "thread"
+                if self._executor is None:
+                    self._executor = concurrent.futures.ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix="transcode"
+                    )
+            return self._executor
+
+    async def _acquire(self) -> None:
+        with self._lock:
+            if self._pending < self.max_pending:
+                self._pending += 1
+                return
+            waiter = concurrent.futures.Future()
+            self._waiters.append(waiter)
+            self.queued += 1
+        start = time.perf_counter()
+        try:
+            await asyncio.wrap_future(waiter)
+        except asyncio.CancelledError:
+            if waiter.cancel():
+                with self._lock:
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+            else:
+                # 取り消しと同時に枠を譲られていた場合は返す
+                self._release()
+            raise
+        self.max_queue_wait = max(self.max_queue_wait, time.perf_counter() - start)
+
+    def _release(self) -> None:
+        with self._lock:
+            while self._waiters:
+                # 枠を次の呼び出し元にそのまま引き継ぐ
+                waiter = self._waiters.popleft()
+                if waiter.set_running_or_notify_cancel():
+                    waiter.set_result(None)
+                    break
+            else:
+                self._pending -= 1
+
+    def _fall_back_to_threads(self, error: Exception) -> None:
+        with self._lock:
+            if self.kind != "process":
+                return
+            logging.error(f"Transcode process pool failed ({error}); falling back to threads")
+            broken, self._executor, self.kind = self._executor, None, "thread"
+        if broken is not None:
+            broken.shutdown(wait=False, cancel_futures=True)
+
+    def prestart(self) -> list[concurrent.futures.Future]:
+        """Start the workers in the background, e.g. while waiting for Imagen.
+
+        Spawned workers import Pillow and this package before their first job,
+        which would otherwise be added to the first image turn of the process.
+        If the workers cannot start (for example when ``__main__`` is stdin and
+        cannot be re-imported by a spawned process), the executor falls back to
+        threads instead of failing the first transcode.
+        """
+        with self._lock:
+            started = self._prestarted
+            self._prestarted = True
+        if started:
+            return []
+        futures = [self._get_executor().submit(_ready) for _ in range(self.workers)]
+        for future in futures:
+            future.add_done_callback(self._check_started)
+        return futures
+
+    def _check_started(self, future: concurrent.futures.Future) -> None:
+        # 起動に失敗したプールは、最初の変換を待たずにスレッドに切り替える
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            self._fall_back_to_threads(future.exception())
+
+    async def run(self, fn: Callable[..., T], *args) -> T:
+        """Run ``fn(*args)`` on the pool; ``fn`` and its arguments must be picklable."""
+        await self._acquire()
+        try:
+            self.submitted += 1
+            loop = asyncio.get_running_loop()
+            try:
+                return await loop.run_in_executor(self._get_executor(), fn, *args)
+            except BrokenProcessPool as e:
+                self._fall_back_to_threads(e)
+                return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self._release()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "kind": self.kind,
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "waiting": len(self._waiters),
+                "submitted": self.submitted,
+                "queued": self.queued,
+                "max_queue_wait_s": round(self.max_queue_wait, 4),
+            }
+
+
+transcode_executor = TranscodeExecutor()
+
+
+async def transcode(fn: Callable[..., T], *args) -> T:
+    """Run an image transcoding function on the shared ``transcode_executor``."""
+    return await transcode_executor.run(fn, *args)
@@ -0,0 +1,134 @@
+"""Fixed research -> article -> eye-catch workflow without coordinator model calls.
+
+``workflow_agent`` runs the same components as ``blog_coordinator``
+(``researcher_agent``, ``blog_editor_agent``, ``generate_image`` and
+``get_current_datetime``) as an ADK workflow: the user message is the
+keyword, idea ``WORKFLOW_PICK`` of the research result is chosen
+automatically and, with ``WORKFLOW_MODE=parallel`` (the default), the
+article and the eye-catch image are generated at the same time. Only the
+researcher and the editor call a model. Select it with ``ROOT_AGENT=workflow``.
+"""
+
+import os
+from typing import AsyncGenerator
+
+from google.adk.agents import BaseAgent, ParallelAgent, SequentialAgent
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event, EventActions
+from google.adk.tools import ToolContext
+from google.genai import types
+
+from .artifact_refs import IMAGE_TRANSPORT, make_artifact_ref
+from .speculation import extract_ideas
+from .state_offload import load_state_value
+from .sub_agents.blog_editor import blog_editor_agent
+from .sub_agents.researcher import researcher_agent
+from .thumbnails import artifact_name, to_data_uri
+from .tools.generate_image import generate_image
+from .tools.get_current_datetime import get_current_datetime
+
+WORKFLOW_MODE = os.getenv("WORKFLOW_MODE", "parallel")
+# リサーチ結果から自動で選ぶアイデアの番号
+WORKFLOW_PICK = int(os.getenv("WORKFLOW_PICK", "1"))
+# 選ばれたアイデアを保持するセッション状態のキー
+SELECTED_IDEA_STATE_KEY = "selected_idea"
+
+IMAGE_PROMPT_TEMPLATE = (
+    "An eye-catching header illustration for a blog article titled \"{idea}\". "
+    "Modern, clean and vibrant composition with a clear focal point, soft natural lighting, "
+    "high detail, no text or letters."
+)
+
+
+def _text_event(ctx: InvocationContext, author: str, text: str, **actions) -> Event:
+    return Event(
+        invocation_id=ctx.invocation_id,
+        author=author,
+        branch=ctx.branch,
+        content=types.Content(role="model", parts=[types.Part.from_text(text=text)]),
+        actions=EventActions(**actions),
+    )
+
+
+class DatetimeStep(BaseAgent):
+    """Adds the current JST date and time to the conversation for the researcher."""
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        result = await get_current_datetime("", ToolContext(ctx))
+        yield _text_event(ctx, self.name, f"現在の日時: {result['current_datetime']}")
+
+
+class PickIdeaStep(BaseAgent):
+    """Chooses idea ``WORKFLOW_PICK`` from the researcher's output."""
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        research = await load_state_value(CallbackContext(ctx), researcher_agent.output_key, "")
+        ideas = extract_ideas(research, WORKFLOW_PICK)
+        if ideas:
+            _, idea = ideas[-1]
+        else:
+            # 番号付きのリストにならなかった場合はユーザーのキーワードをそのまま使う
+            idea = "".join(part.text for part in ctx.user_content.parts if part.text).strip()
+        yield _text_event(
+            ctx, self.name, f"次のテーマでブログ記事を作成してください。\n\nテーマ: {idea}",
+            state_delta={SELECTED_IDEA_STATE_KEY: idea},
+        )
+
+
+class EyeCatchStep(BaseAgent):
+    """Generates the eye-catch image for the selected idea with ``generate_image``."""
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        tool_context = ToolContext(ctx)
+        idea = ctx.session.state.get(SELECTED_IDEA_STATE_KEY, "")
+        result = await generate_image(IMAGE_PROMPT_TEMPLATE.format(idea=idea), tool_context)
+        if result.get("status") != "success":
+            event = _text_event(ctx, self.name, "アイキャッチ画像を生成できませんでした。")
+            event.actions = tool_context.actions
+            yield event
+            return
+
+        thumbnail_name = artifact_name(result["filename"], rendition="thumb")
+        if IMAGE_TRANSPORT == "reference":
+            image_text = make_artifact_ref(
+                ctx.app_name, ctx.user_id, ctx.session.id, thumbnail_name,
+                tool_context.actions.artifact_delta[thumbnail_name], "image/jpeg",
+            )
+        else:
+            thumbnail = await tool_context.load_artifact(thumbnail_name)
+            image_text = to_data_uri(thumbnail.inline_data.data)
+        event = _text_event(ctx, self.name, "アイキャッチ画像を生成しました。")
+        event.content.parts.append(types.Part.from_text(text=image_text))
+        event.actions = tool_context.actions
+        yield event
+
+
+def _detached(agent: BaseAgent) -> BaseAgent:
+    # ADK のエージェントは親を 1 つしか持てないため、コーディネーターの配下とは別のインスタンスを使う
+    return agent.model_copy(update={"parent_agent": None})
+
+
+def build_workflow_agent(mode: str = WORKFLOW_MODE) -> SequentialAgent:
+    """Build the workflow; ``mode`` is ``sequential`` or ``parallel``."""
+    article = _detached(blog_editor_agent)
+    eye_catch = EyeCatchStep(name="eye_catch_image")
+    if mode == "parallel":
+        content_steps = [ParallelAgent(name="article_and_image", sub_agents=[article, eye_catch])]
+    elif mode == "sequential":
+        content_steps = [article, eye_catch]
+    else:
+        raise ValueError(f"Unknown WORKFLOW_MODE: {mode!r}")
+    return SequentialAgent(
+        name="blog_workflow",
+        description="キーワードからリサーチ、記事作成、アイキャッチ生成までを固定の手順で実行するワークフローです。",
+        sub_agents=[
+            DatetimeStep(name="current_datetime"),
+            _detached(researcher_agent),
+            PickIdeaStep(name="pick_idea"),
+            *content_steps,
+        ],
+    )
+
+
+workflow_agent = build_workflow_agent()
@@ -5,15 +5,20 @@ import os
 import vertexai
 from absl import app, flags
 from dotenv import load_dotenv
-from blog_writer_agents.agent import root_agent
+from blog_writer_agents import ROOT_AGENTS, get_root_agent
+from blog_writer_agents.adk_app import BlogWriterApp
+from blog_writer_agents.artifact_refs import build_artifact_service
 from vertexai import agent_engines
-from vertexai.preview import reasoning_engines
 
 FLAGS = flags.FLAGS
 flags.DEFINE_string("project_id", None, "GCP project ID.")
 flags.DEFINE_string("location", None, "GCP location.")
 flags.DEFINE_string("bucket", None, "GCP bucket.")
 flags.DEFINE_string("resource_id", None, "ReasoningEngine resource ID.")
+flags.DEFINE_enum(
+    "root_agent", None, list(ROOT_AGENTS),
+    "Agent to deploy: the interactive coordinator or the fixed workflow. Defaults to $ROOT_AGENT.",
+)
 
 flags.DEFINE_bool("list", False, "List all agents.")
 flags.DEFINE_bool("create", False, "Creates a new agent.")
@@ -23,11 +28,43 @@ flags.mark_bool_flags_as_mutual_exclusive(["create", "delete"])
 
 def create() -> None:
     """新しいエージェントを作成"""
-    env_vars = {"IMAGE_FILE_NAME": os.getenv("IMAGE_FILE_NAME", "image.png")}
-
-    adk_app = reasoning_engines.AdkApp(
+    root_agent_kind = FLAGS.root_agent or os.getenv("ROOT_AGENT", "coordinator")
+    root_agent = get_root_agent(root_agent_kind)
+    env_vars = {
+        "ROOT_AGENT": root_agent_kind,
+        "WORKFLOW_MODE": os.getenv("WORKFLOW_MODE", "parallel"),
+        "WORKFLOW_PICK": os.getenv("WORKFLOW_PICK", "1"),
+        "IMAGE_FILE_NAME": os.getenv("IMAGE_FILE_NAME", "image.png"),
+        "STREAMING_EDITOR": os.getenv("STREAMING_EDITOR", "false"),
+        "SECTIONED_EDITOR": os.getenv("SECTIONED_EDITOR", "false"),
+        "IMAGE_CANDIDATES": os.getenv("IMAGE_CANDIDATES", "3"),
+        "IMAGE_TRANSPORT": os.getenv("IMAGE_TRANSPORT", "inline"),
+        "MODEL_ROUTING": os.getenv("MODEL_ROUTING", "false"),
+        "PARALLEL_ARTICLE_IMAGE": os.getenv("PARALLEL_ARTICLE_IMAGE", "false"),
+        "PATCH_REVISIONS": os.getenv("PATCH_REVISIONS", "false"),
+        "SPECULATIVE_DRAFTS": os.getenv("SPECULATIVE_DRAFTS", "false"),
+        "SIMILARITY_INDEX_ENABLED": os.getenv("SIMILARITY_INDEX_ENABLED", "false"),
+        "STATE_OFFLOAD_ENABLED": os.getenv("STATE_OFFLOAD_ENABLED", "false"),
+        "TRANSCODE_EXECUTOR": os.getenv("TRANSCODE_EXECUTOR", "process"),
+        "GATEWAY_MAX_RETRIES": os.getenv("GATEWAY_MAX_RETRIES", "4"),
+        "GATEWAY_COALESCE": os.getenv("GATEWAY_COALESCE", "true"),
+        # Agent Engine ではスパンをログに出力し、Cloud Logging で集計する
+        "TELEMETRY_ENABLED": os.getenv("TELEMETRY_ENABLED", "true"),
+        "TELEMETRY_LOG_SPANS": os.getenv("TELEMETRY_LOG_SPANS", "true"),
+    }
+    if os.getenv("MODEL_RPM_LIMITS"):
+        env_vars["MODEL_RPM_LIMITS"] = os.getenv("MODEL_RPM_LIMITS")
+    app_kwargs = {}
+    if os.getenv("ARTIFACT_BUCKET"):
+        # クライアントが画像を直接取得できるよう、成果物を GCS に保存する
+        env_vars["ARTIFACT_BUCKET"] = os.getenv("ARTIFACT_BUCKET")
+        app_kwargs["artifact_service_builder"] = build_artifact_service
+
+    # run_config を dict で受け付けるテンプレート（STREAMING_EDITOR の SSE 用）
+    adk_app = BlogWriterApp(
         agent=root_agent,
         enable_tracing=True,
+        **app_kwargs,
     )
 
     remote_agent = agent_engines.create(
@@ -111,6 +148,10 @@ def main(argv: list[str]) -> None:
     if FLAGS.list:
         list_agents()
     elif FLAGS.create:
+        if os.getenv("IMAGE_TRANSPORT", "inline") == "reference" and not os.getenv("ARTIFACT_BUCKET"):
+            # 成果物参照はクライアントと共有する GCS バケットがないと画像を取得できない
+            print("ARTIFACT_BUCKET is required for IMAGE_TRANSPORT=reference")
+            return
         create()
     elif FLAGS.delete:
         if not FLAGS.resource_id:
@@ -1,11 +1,9 @@
 import os
 import streamlit as st
 from dotenv import load_dotenv
-import vertexai
-from vertexai import agent_engines
-from vertexai.preview import reasoning_engines
 import logging
 import asyncio
+import concurrent.futures
 
 # Python 3.12 introduced ``asyncio.wrap_async_iterable`` for turning a
 # synchronous iterator into an asynchronous one.  Earlier Python versions do
@@ -20,13 +18,18 @@ else:
                 yield item
         return _gen()
 
-from blog_writer_agents.agent import root_agent
+# vertexai やローカルのエージェントは重いため、使うときに読み込む
+from blog_writer_agents.artifact_refs import build_artifact_service
+from ui_support import EventRecorder, SessionIndex, StreamRenderer, event_summary, parse_session_ids
 
 logging.basicConfig(level=logging.INFO, force=True)
 load_dotenv()
 
 
+@st.cache_resource
 def init_vertexai():
+    import vertexai
+
     project_id = os.getenv("GOOGLE_CLOUD_PROJECT")
     location = os.getenv("GOOGLE_CLOUD_LOCATION")
     vertexai.init(project=project_id, location=location)
@@ -58,19 +61,39 @@ agent_id, user_id = sidebar_inputs()
 init_vertexai()
 
 ENV = os.getenv("ENV", "local")
+# true の場合、記事を SSE で逐次受信して表示する
+STREAMING_EDITOR = os.getenv("STREAMING_EDITOR", "false").lower() == "true"
+SESSION_LIST_TTL_SECONDS = float(os.getenv("SESSION_LIST_TTL_SECONDS", "30"))
+# ストリーミング表示の再描画レート上限
+UI_RENDER_FPS = float(os.getenv("UI_RENDER_FPS", "8"))
+# 指定するとストリームのイベントを JSON Lines で記録する（ベンチマーク用）
+UI_RECORD_EVENTS = os.getenv("UI_RECORD_EVENTS")
 
 # Agent取得
 
 
+@st.cache_resource
+def get_artifact_service():
+    # 成果物参照モードで画像を取得するための成果物ストア（ローカル実行時はエージェントと共有）
+    return build_artifact_service()
+
+
 @st.cache_resource
 def get_remote_agent(agent_id):
     try:
         if ENV == "local":
-            return reasoning_engines.AdkApp(
-                agent=root_agent,
+            from blog_writer_agents import get_root_agent
+            from blog_writer_agents.adk_app import BlogWriterApp
+
+            return BlogWriterApp(
+                # ROOT_AGENT=workflow の場合は固定手順のワークフローを使う
+                agent=get_root_agent(),
                 enable_tracing=True,
+                artifact_service_builder=get_artifact_service,
             )
         else:
+            from vertexai import agent_engines
+
             return agent_engines.get(agent_id)
     except Exception as e:
         st.error(f"Agent取得エラー: {e}")
@@ -80,30 +103,59 @@ def get_remote_agent(agent_id):
 remote_agent = get_remote_agent(agent_id)
 
 
+def run_outside_loop(coro):
+    # handle_user_input（asyncio.run の中）から呼ばれるため、別スレッドのイベントループで実行して結果を待つ
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coro).result()
+
+
+# 成果物参照から画像を取得（バージョンごとに内容は不変なのでキャッシュする）
+@st.cache_data(max_entries=256, show_spinner=False)
+def fetch_artifact_bytes(app_name, user_id, session_id, filename, version):
+    artifact = run_outside_loop(get_artifact_service().load_artifact(
+        app_name=app_name,
+        user_id=user_id,
+        session_id=session_id,
+        filename=filename,
+        version=version,
+    ))
+    return artifact.inline_data.data if artifact and artifact.inline_data else None
+
+
+def show_artifact(ref):
+    data = fetch_artifact_bytes(
+        ref["app_name"], ref["user_id"], ref["session_id"], ref["filename"], ref["version"]
+    )
+    if data:
+        st.image(data, use_container_width=True)
+
+
 # ユーザーに紐づくセッション一覧取得
-async def fetch_session_ids(user_id: str):
-    try:
-        response = remote_agent.list_sessions(user_id=user_id)
-        # response may be an object or a plain dictionary depending on environment
-        sessions = None
-        if isinstance(response, dict):
-            sessions = response.get("sessions", response)
-        else:
-            sessions = getattr(response, "sessions", response)
+def fetch_session_ids(user_id: str):
+    response = remote_agent.list_sessions(user_id=user_id)
+    return parse_session_ids(response)
 
-        session_ids = []
-        for s in sessions:
-            if isinstance(s, dict):
-                session_ids.append(s.get("id") or s.get("session_id") or s.get("name"))
-            else:
-                session_ids.append(getattr(s, "id", getattr(s, "session_id", None)))
-        return [sid for sid in session_ids if sid]
-    except Exception as e:
-        st.sidebar.error(f"セッション一覧取得エラー: {e}")
-        return []
+
+@st.cache_resource
+def get_session_index(agent_id):
+    # リラン毎に list_sessions を呼ばないよう、プロセス内で共有するキャッシュ
+    return SessionIndex(fetch_session_ids, ttl_seconds=SESSION_LIST_TTL_SECONDS)
+
+
+session_index = get_session_index(agent_id)
 
 # 既存セッション一覧の取得と選択
-session_list = asyncio.run(fetch_session_ids(user_id))
+if st.sidebar.button("セッション一覧を更新"):
+    session_index.refresh(user_id, wait=True)
+session_list = session_index.get(user_id)
+if not session_index.is_loaded(user_id):
+    st.sidebar.caption("セッション一覧を読み込み中...")
+if error := session_index.last_error(user_id):
+    st.sidebar.error(f"セッション一覧取得エラー: {error}")
+if st.session_state.get("session_id") and st.session_state["session_id"] not in session_list:
+    # 作成直後でまだ一覧に反映されていないセッションも選択肢に含める
+    if st.session_state.get("last_user_id") == user_id:
+        session_list.append(st.session_state["session_id"])
 options = ["新規セッション"] + session_list
 index = 0
 if "session_id" in st.session_state and st.session_state["session_id"] in session_list:
@@ -133,6 +185,7 @@ async def manage_session(user_id, agent_id, selected_session_id=None):
                     st.session_state["session_id"] = session.id
                 else:
                     st.session_state["session_id"] = session["id"]
+                session_index.invalidate(user_id, st.session_state["session_id"])
 
             st.session_state["last_agent_id"] = agent_id
             st.session_state["last_user_id"] = user_id
@@ -159,34 +212,39 @@ async def handle_user_input(prompt):
         st.markdown(prompt)
     # Agentへ問い合わせ
     try:
-        full_response = ""
+        stream_kwargs = {}
+        if STREAMING_EDITOR:
+            # Agent Engine にはシリアライズできる dict で渡し、BlogWriterApp が RunConfig に変換する
+            stream_kwargs["run_config"] = {"streaming_mode": "sse"}
+        recorder_file = open(UI_RECORD_EVENTS, "a", encoding="utf-8") if UI_RECORD_EVENTS else None
+        recorder = EventRecorder(recorder_file) if recorder_file else None
         with st.chat_message("assistant"):
             message_placeholder = st.empty()
+            renderer = StreamRenderer(
+                paint=message_placeholder.markdown,
+                show_image=lambda uri: st.image(uri, use_container_width=True),
+                max_fps=UI_RENDER_FPS,
+                show_artifact=show_artifact,
+            )
             stream = _wrap_async_iterable(
                 remote_agent.stream_query(
                     user_id=user_id,
                     session_id=st.session_state["session_id"],
                     message=prompt,
+                    **stream_kwargs,
                 )
             )
-            async for event in stream:
-                logging.info(f"Received event: {str(event)}")
-                for i, part in enumerate(event["content"]["parts"]):
-                    if "text" in part:
-                        if part["text"].startswith("data:image"):
-                            st.image(part["text"], use_container_width=True)
-                        else:
-                            full_response += part["text"] + " "
-                        message_placeholder.markdown(full_response + "▌")
-                    if "function_call" in part:
-                        message_placeholder.markdown(
-                            full_response + f"\n\n🔧 tool_calling: {str(part['function_call'])}"
-                        )
-                    if "function_response" in part:
-                        message_placeholder.markdown(
-                            full_response + f"\n\n🔨 tool_response: {str(part['function_response'])}"
-                        )
-            message_placeholder.markdown(full_response)
+            try:
+                async for event in stream:
+                    # 画像の base64 などのペイロードはログに出さない
+                    logging.info(f"Received event: {event_summary(event)}")
+                    if recorder:
+                        recorder.record(event)
+                    renderer.handle_event(event)
+            finally:
+                if recorder_file:
+                    recorder_file.close()
+            full_response = renderer.finish()
         st.session_state["messages"].append({"role": "assistant", "content": full_response})
     except Exception as e:
         st.error(f"エージェント応答エラー: {e}")
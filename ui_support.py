@@ -0,0 +1,224 @@
+"""Helpers for the Streamlit UI that don't depend on a running script."""
+
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, TextIO
+
+from blog_writer_agents.artifact_refs import ARTIFACT_REF_PREFIX, parse_artifact_ref
+
+
+def parse_session_ids(response) -> list[str]:
+    """Extract session IDs from a ``list_sessions`` response."""
+    # response may be an object or a plain dictionary depending on environment
+    if isinstance(response, dict):
+        sessions = response.get("sessions", response)
+    else:
+        sessions = getattr(response, "sessions", response)
+
+    session_ids = []
+    for s in sessions:
+        if isinstance(s, dict):
+            session_ids.append(s.get("id") or s.get("session_id") or s.get("name"))
+        else:
+            session_ids.append(getattr(s, "id", getattr(s, "session_id", None)))
+    return [sid for sid in session_ids if sid]
+
+
+class SessionIndex:
+    """Per-user cache of session IDs with TTL and background refresh.
+
+    ``get`` never blocks on the network: it returns whatever is cached (an
+    empty list the first time) and schedules a refresh when the entry is
+    missing or older than ``ttl_seconds``.
+    """
+
+    def __init__(self, fetch: Callable[[str], list[str]], ttl_seconds: float = 30.0):
+        self._fetch = fetch
+        self.ttl_seconds = ttl_seconds
+        self._entries: dict[str, tuple[list[str], Optional[float]]] = {}
+        self._errors: dict[str, str] = {}
+        self._inflight: set[str] = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="session-index")
+
+    def get(self, user_id: str) -> list[str]:
+        with self._lock:
+            session_ids, fetched_at = self._entries.get(user_id, ([], None))
+        if fetched_at is None or time.monotonic() - fetched_at > self.ttl_seconds:
+            self.refresh(user_id)
+        return list(session_ids)
+
+    def is_loaded(self, user_id: str) -> bool:
+        with self._lock:
+            return user_id in self._entries
+
+    def last_error(self, user_id: str) -> Optional[str]:
+        with self._lock:
+            return self._errors.get(user_id)
+
+    def refresh(self, user_id: str, wait: bool = False) -> None:
+        """Fetch the session list for ``user_id`` in the background."""
+        with self._lock:
+            if user_id in self._inflight and not wait:
+                return
+            self._inflight.add(user_id)
+        future = self._executor.submit(self._load, user_id)
+        if wait:
+            future.result()
+
+    def _load(self, user_id: str) -> None:
+        try:
+            session_ids = self._fetch(user_id)
+        except Exception as e:
+            logging.error(f"Failed to list sessions for {user_id}: {e}")
+            with self._lock:
+                self._errors[user_id] = str(e)
+                self._inflight.discard(user_id)
+            return
+        with self._lock:
+            self._entries[user_id] = (session_ids, time.monotonic())
+            self._errors.pop(user_id, None)
+            self._inflight.discard(user_id)
+
+    def invalidate(self, user_id: str, created_session_id: Optional[str] = None) -> None:
+        """Mark ``user_id``'s list stale, optionally adding a just-created session."""
+        with self._lock:
+            session_ids, _ = self._entries.get(user_id, ([], None))
+            if created_session_id and created_session_id not in session_ids:
+                session_ids = session_ids + [created_session_id]
+            # 取得時刻を消して次回の get で再取得させる
+            self._entries[user_id] = (session_ids, None)
+        self.refresh(user_id)
+
+
+def event_summary(event: dict) -> dict:
+    """Return loggable metadata for a ``stream_query`` event, without payloads."""
+    parts = []
+    for part in (event.get("content") or {}).get("parts") or []:
+        if "text" in part:
+            text = part["text"] or ""
+            if text.startswith("data:image"):
+                kind = "image"
+            elif text.startswith(ARTIFACT_REF_PREFIX):
+                kind = "artifact_ref"
+            else:
+                kind = "text"
+            parts.append(f"{kind}({len(text)})")
+        elif "function_call" in part:
+            parts.append(f"function_call:{(part['function_call'] or {}).get('name')}")
+        elif "function_response" in part:
+            parts.append(f"function_response:{(part['function_response'] or {}).get('name')}")
+        else:
+            parts.append("other")
+    return {
+        "id": event.get("id"),
+        "author": event.get("author"),
+        "partial": event.get("partial", False),
+        "parts": parts,
+    }
+
+
+class StreamRenderer:
+    """Buffers streamed text and repaints at a bounded rate.
+
+    Text chunks are kept in a list and joined only when painting. A repaint
+    happens when ``1 / max_fps`` seconds have passed since the last one or
+    at least ``min_delta_chars`` new characters arrived, so long articles
+    cost a bounded number of markdown renders instead of one per event.
+    """
+
+    CURSOR = "▌"
+
+    def __init__(self, paint: Callable[[str], None], show_image: Callable[[str], None],
+                 max_fps: float = 8.0, min_delta_chars: int = 4096,
+                 clock: Callable[[], float] = time.monotonic,
+                 show_artifact: Optional[Callable[[dict], None]] = None):
+        self._paint = paint
+        self._show_image = show_image
+        self._show_artifact = show_artifact
+        self._interval = 1.0 / max_fps if max_fps > 0 else 0.0
+        self._min_delta_chars = min_delta_chars
+        self._clock = clock
+        self._chunks: list[str] = []
+        # SSE ストリーミング時の部分テキスト（最終イベントで確定版に置き換える）
+        self._partial: list[str] = []
+        self._status = ""
+        self._last_paint = float("-inf")
+        self._pending_chars = 0
+        self._dirty = False
+        self.paints = 0
+
+    @property
+    def text(self) -> str:
+        return "".join(self._chunks) + "".join(self._partial)
+
+    def handle_event(self, event: dict) -> None:
+        is_partial = event.get("partial", False)
+        for part in (event.get("content") or {}).get("parts") or []:
+            if "text" in part:
+                text = part["text"] or ""
+                if text.startswith("data:image"):
+                    self._show_image(text)
+                    continue
+                ref = parse_artifact_ref(text)
+                if ref:
+                    if self._show_artifact:
+                        self._show_artifact(ref)
+                    continue
+                if is_partial:
+                    self._partial.append(text)
+                else:
+                    self._partial.clear()
+                    self._chunks.append(text)
+                    self._chunks.append(" ")
+                self._status = ""
+                self._pending_chars += len(text)
+            elif "function_call" in part:
+                self._status = f"\n\n🔧 tool_calling: {str(part['function_call'])}"
+            elif "function_response" in part:
+                self._status = f"\n\n🔨 tool_response: {str(part['function_response'])}"
+            else:
+                continue
+            self._dirty = True
+        self._maybe_paint()
+
+    def _maybe_paint(self) -> None:
+        if not self._dirty:
+            return
+        now = self._clock()
+        if now - self._last_paint < self._interval and self._pending_chars < self._min_delta_chars:
+            return
+        self._paint(self.text + (self._status or self.CURSOR))
+        self._last_paint = now
+        self._pending_chars = 0
+        self._dirty = False
+        self.paints += 1
+
+    def finish(self) -> str:
+        """Paint the final text without the cursor and return it."""
+        self._chunks.extend(self._partial)
+        self._partial.clear()
+        text = self.text
+        self._paint(text)
+        self.paints += 1
+        return text
+
+
+class EventRecorder:
+    """Appends ``stream_query`` events to a JSON-lines file for later replay."""
+
+    def __init__(self, stream: TextIO):
+        self._stream = stream
+
+    def record(self, event: dict) -> None:
+        self._stream.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+        self._stream.flush()
+
+
+def load_events(path: str) -> list[dict]:
+    """Load events written by ``EventRecorder``."""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]